@@ -0,0 +1,285 @@
+"""Content-addressed, compressed backup store for config versions.
+
+Layout under the backup directory:
+
+    objects/ab/ab12...ef.gz   one gzip'd chunk per distinct camera (and one for
+                              the non-camera part), named by sha256 of its JSON
+    index.jsonl               append-only, one line per version:
+                              {"id", "ts", "size", "cameras", "manifest", "stored"}
+
+A version's manifest is itself a chunk, either full
+{"rest": <hash>, "cameras": [[key, hash], ...]} or a delta against the previous
+manifest {"base", "depth", "rest", "set": [[key, hash], ...], "del": [key, ...]}
+(a full one is written every MAX_DELTA_DEPTH versions or when the camera order
+changes). Unchanged cameras hash to the same chunk, so each is stored once no
+matter how many versions reference it. Listing reads the in-memory index only;
+restoring reads at most MAX_DELTA_DEPTH small manifests plus one chunk per camera.
+
+Durability: put() writes every new chunk of a version to a temp file, then
+fsyncs them one after another, renames them into place, fsyncs the directories
+it wrote into once and only then appends the index line with an fsync. A chunk
+only ever appears under its final name with complete contents (so the dedup
+check can trust it), and a version is only listed once every chunk it
+references is on disk.
+"""
+from __future__ import annotations
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .storage import atomic_write, cleanup_tmp, fsync_dir
+
+INDEX_NAME = "index.jsonl"
+MAX_DELTA_DEPTH = 32
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class BackupStore:
+    def __init__(self, root: Path, max_versions: int = 5000) -> None:
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / INDEX_NAME
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = self._read_index()
+        self._by_id: Dict[str, Dict[str, Any]] = {e["id"]: e for e in self._entries}
+        # camera key -> (camera object, chunk hash, raw size) of the last put();
+        # frozen cameras shared between versions are not re-serialized
+        self._memo: Dict[str, Tuple[Any, str, int]] = {}
+        # (manifest hash, depth, resolved {key: hash}) of the last put()
+        self._last: Optional[Tuple[str, int, Dict[str, str]]] = None
+        self._seq = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def put(self, cfg: Dict[str, Any], version_id: Optional[str] = None) -> Dict[str, Any]:
+        """Store one config version and return its index entry."""
+        with self._lock:
+            dirty: Set[Path] = set()
+            # final chunk path -> temp file, renamed only once it is fsynced
+            pending: Dict[Path, Path] = {}
+            try:
+                entry, memo, last = self._stage(cfg, version_id, dirty, pending)
+                self._commit_chunks(pending)
+            except BaseException:
+                for tmp in pending.values():
+                    tmp.unlink(missing_ok=True)
+                raise
+            self._memo = memo
+            self._last = last
+            for d in sorted(dirty):
+                fsync_dir(d)
+            self._append_index(entry)
+            self._entries.append(entry)
+            self._by_id[entry["id"]] = entry
+            # prune in batches so the chunk sweep is amortized over many puts
+            if len(self._entries) > self.max_versions + max(1, self.max_versions // 10):
+                self._prune()
+            return entry
+
+    def load(self, version_id: str) -> Optional[Dict[str, Any]]:
+        """Rebuild a stored version, or None if unknown/unreadable."""
+        # under the lock: _prune() rewrites the index and unlinks chunks
+        with self._lock:
+            entry = self._by_id.get(version_id)
+            if entry is None:
+                return None
+            try:
+                rest_hash, cams, _ = self._resolve(entry["manifest"])
+                cfg = dict(self._get_chunk(rest_hash))
+                cfg["cameras"] = {key: self._get_chunk(h) for key, h in cams.items()}
+                return cfg
+            except Exception:
+                return None
+
+    def ids(self) -> List[str]:
+        """Version ids, oldest first."""
+        return [e["id"] for e in self._entries]
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._entries)
+
+    def latest(self) -> Optional[str]:
+        return self._entries[-1]["id"] if self._entries else None
+
+    def __contains__(self, version_id: str) -> bool:
+        return version_id in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _stage(self, cfg: Dict[str, Any], version_id: Optional[str],
+               dirty: Set[Path], pending: Dict[Path, Path]
+               ) -> Tuple[Dict[str, Any], Dict[str, Tuple[Any, str, int]], Tuple[str, int, Dict[str, str]]]:
+        """Write the version's new chunks to temp files (see _put_chunk).
+        Returns (index entry, camera memo, last-manifest state); put() adopts
+        the latter two only once the chunks are committed."""
+        cams = cfg.get("cameras") or {}
+        rest = {k: v for k, v in cfg.items() if k != "cameras"}
+        rest_hash, size, stored = self._put_chunk(rest, dirty, pending)
+        resolved: Dict[str, str] = {}
+        memo: Dict[str, Tuple[Any, str, int]] = {}
+        for key, cam in cams.items():
+            hit = self._memo.get(key)
+            if hit is not None and hit[0] is cam:
+                _, h, n = hit
+            else:
+                h, n, w = self._put_chunk(cam, dirty, pending)
+                stored += w
+            size += n
+            memo[key] = (cam, h, n)
+            resolved[key] = h
+        manifest, depth = self._manifest_for(rest_hash, resolved)
+        manifest_hash, _, w = self._put_chunk(manifest, dirty, pending)
+        stored += w
+        entry = {
+            "id": version_id or self._new_id(),
+            "ts": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "size": size,
+            "cameras": len(resolved),
+            "manifest": manifest_hash,
+            "stored": stored,
+        }
+        return entry, memo, (manifest_hash, depth, resolved)
+
+    def _new_id(self) -> str:
+        self._seq += 1
+        ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        return f"v{ts}-{self._seq:04d}"
+
+    def _manifest_for(self, rest_hash: str, resolved: Dict[str, str]) -> Tuple[Dict[str, Any], int]:
+        """Delta against the previous manifest when cheap, otherwise a full one."""
+        if self._last is not None and self._last[1] < MAX_DELTA_DEPTH:
+            base_hash, depth, prev = self._last
+            dropped = [k for k in prev if k not in resolved]
+            expected = [k for k in prev if k in resolved] + [k for k in resolved if k not in prev]
+            if expected == list(resolved):
+                changed = [[k, h] for k, h in resolved.items() if prev.get(k) != h]
+                return {"base": base_hash, "depth": depth + 1, "rest": rest_hash, "set": changed, "del": dropped}, depth + 1
+        return {"rest": rest_hash, "cameras": [[k, h] for k, h in resolved.items()]}, 0
+
+    def _resolve(self, manifest_hash: str) -> Tuple[str, Dict[str, str], List[str]]:
+        """Follow a delta chain. Returns (rest hash, {key: hash}, manifest hashes on the chain)."""
+        chain = [manifest_hash]
+        stack = [self._get_chunk(manifest_hash)]
+        rest_hash = stack[0]["rest"]
+        while "base" in stack[-1]:
+            chain.append(stack[-1]["base"])
+            stack.append(self._get_chunk(chain[-1]))
+        cams = {k: h for k, h in stack.pop()["cameras"]}
+        while stack:
+            delta = stack.pop()
+            for k in delta["del"]:
+                cams.pop(k, None)
+            for k, h in delta["set"]:
+                cams[k] = h
+        return rest_hash, cams, chain
+
+    def _chunk_path(self, h: str) -> Path:
+        return self.objects / h[:2] / f"{h}.gz"
+
+    def _put_chunk(self, obj: Any, dirty: Set[Path], pending: Dict[Path, Path]) -> Tuple[str, int, int]:
+        """Stage `obj` unless an identical chunk exists. Returns (hash, raw size, bytes written).
+        The data goes to a temp file recorded in `pending` (final path -> temp);
+        _commit_chunks() fsyncs and renames it, and the directories written into
+        are added to `dirty` (put() fsyncs them once)."""
+        raw = _dumps(obj)
+        h = hashlib.sha256(raw).hexdigest()
+        p = self._chunk_path(h)
+        if p in pending:
+            return h, len(raw), 0
+        try:
+            if p.stat().st_size > 0:
+                return h, len(raw), 0
+        except FileNotFoundError:
+            pass
+        if not p.parent.is_dir():
+            p.parent.mkdir(exist_ok=True)
+            dirty.add(self.objects)
+        data = gzip.compress(raw, compresslevel=6, mtime=0)
+        tmp = p.with_name(f".{p.name}.{os.getpid()}.tmp")
+        pending[p] = tmp
+        tmp.write_bytes(data)
+        dirty.add(p.parent)
+        return h, len(raw), len(data)
+
+    def _commit_chunks(self, pending: Dict[Path, Path]) -> None:
+        """fsync every staged chunk, then rename them into place. Syncing only
+        after all of them are written lets the kernel write them back together
+        instead of one flush per chunk; renaming afterwards means a chunk under
+        its final name is never empty or truncated."""
+        for tmp in pending.values():
+            fd = os.open(tmp, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        for p, tmp in pending.items():
+            os.replace(tmp, p)
+        pending.clear()
+
+    def _get_chunk(self, h: str) -> Any:
+        return json.loads(gzip.decompress(self._chunk_path(h).read_bytes()))
+
+    def _read_index(self) -> List[Dict[str, Any]]:
+        entries: List[Dict[str, Any]] = []
+        if not self.index_path.exists():
+            return entries
+        good = 0
+        with self.index_path.open("rb+") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    entries.pop()
+                    break
+                good += len(line)
+            # drop a torn last line left by a crash so new appends start clean
+            f.truncate(good)
+        return entries
+
+    def _append_index(self, entry: Dict[str, Any]) -> None:
+        with self.index_path.open("ab") as f:
+            f.write(_dumps(entry) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _prune(self) -> None:
+        """Drop the oldest versions and every chunk no remaining version uses."""
+        drop = len(self._entries) - self.max_versions
+        for e in self._entries[:drop]:
+            self._by_id.pop(e["id"], None)
+        del self._entries[:drop]
+        atomic_write(self.index_path, b"".join(_dumps(e) + b"\n" for e in self._entries))
+
+        live = set()
+        for e in self._entries:
+            try:
+                rest_hash, cams, chain = self._resolve(e["manifest"])
+            except Exception:
+                continue
+            live.update(chain)
+            live.add(rest_hash)
+            live.update(cams.values())
+        for sub in self.objects.iterdir():
+            if not sub.is_dir():
+                continue
+            cleanup_tmp(sub)
+            for p in sub.glob("*.gz"):
+                if p.name[:-3] not in live:
+                    p.unlink(missing_ok=True)
@@ -0,0 +1,174 @@
+"""Camera selectors and field patches for bulk edits.
+
+A selector picks cameras by explicit key, by key range (`cam1..cam200`,
+numeric suffix, inclusive) and/or by a filter such as
+`ffmpeg.fps < 10 and enabled == true`. A field patch is a set of dotted-path
+assignments/removals, compiled once into a tree so that every selected camera
+is rewritten in a single copy-on-write pass: only the objects on a patched path
+are copied, and a camera whose values do not change is kept as the same object.
+"""
+from __future__ import annotations
+import json
+import operator
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_UNSET = object()   # leaf marker: remove the field
+_SUFFIX = re.compile(r"^(.*?)(\d+)$")
+_RANGE = re.compile(r"^(.*?)(\d+)\.\.(?:(.*?))?(\d+)$")
+_CLAUSE = re.compile(r"^\s*([\w\-]+(?:\.[\w\-]+)*)\s*(==|!=|<=|>=|<|>)\s*(.+?)\s*$")
+_AND = re.compile(r"\s+and\s+", re.IGNORECASE)
+_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+_ORDERING = {"<", "<=", ">", ">="}
+
+
+class BulkError(ValueError):
+    """Malformed selector or patch (HTTP 400)."""
+
+
+def _split(path: str) -> Tuple[str, ...]:
+    parts = tuple(path.split("."))
+    if not path or not all(parts):
+        raise BulkError(f"invalid field path '{path}'")
+    return parts
+
+
+# -----------------------------------------------------------------------------
+# Selection
+# -----------------------------------------------------------------------------
+def parse_range(spec: str) -> Tuple[str, int, int]:
+    """'cam1..cam200' (or 'cam1..200') -> ('cam', 1, 200)."""
+    m = _RANGE.match(spec.strip())
+    if not m or (m.group(3) and m.group(3) != m.group(1)):
+        raise BulkError(f"invalid key range '{spec}' (expected e.g. cam1..cam200)")
+    lo, hi = int(m.group(2)), int(m.group(4))
+    if lo > hi:
+        raise BulkError(f"empty key range '{spec}'")
+    return m.group(1), lo, hi
+
+
+def _literal(text: str) -> Tuple[Any, bool]:
+    """Operand -> (value, bare): JSON if it parses, else a string; `bare` is
+    True for unquoted text that is not JSON (e.g. `enabled == yes`)."""
+    try:
+        return json.loads(text), False
+    except ValueError:
+        quoted = len(text) >= 2 and text[0] == text[-1] and text[0] in "'\""
+        return text.strip("'\""), not quoted
+
+
+def compile_filter(expr: str) -> Callable[[Any], bool]:
+    """'ffmpeg.fps < 10 and enabled == true' -> predicate over a camera.
+    Clauses are joined with `and`; a missing field or an incomparable value
+    makes the clause false. A stray operator character in the operand or an
+    ordering comparison against unquoted non-JSON text is a BulkError."""
+    clauses = []
+    for part in _AND.split(expr.strip()):
+        m = _CLAUSE.match(part)
+        if not m:
+            raise BulkError(f"invalid filter clause '{part}' (expected e.g. ffmpeg.fps < 10)")
+        op, operand = m.group(2), m.group(3)
+        if operand[0] in "<>=!":
+            raise BulkError(f"invalid filter clause '{part}' (unexpected '{operand[0]}' after {op})")
+        value, bare = _literal(operand)
+        if bare and op in _ORDERING:
+            raise BulkError(f"invalid filter clause '{part}' ({op} needs a number or a quoted string)")
+        clauses.append((_split(m.group(1)), _OPS[op], value))
+
+    def pred(cam: Any) -> bool:
+        for path, op, value in clauses:
+            node = cam
+            for t in path:
+                if not isinstance(node, dict) or t not in node:
+                    return False
+                node = node[t]
+            try:
+                if not op(node, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    return pred
+
+
+def select_cameras(
+    cams: Dict[str, Any],
+    keys: Optional[Iterable[str]] = None,
+    ranges: Optional[Iterable[str]] = None,
+    where: Optional[str] = None,
+) -> Tuple[List[str], List[str]]:
+    """Return (selected keys in config order, explicit keys that do not exist).
+
+    keys/ranges are combined as a union; `where` then narrows it (or, on its
+    own, filters all cameras).
+    """
+    keys = list(dict.fromkeys(keys or []))
+    spans = [parse_range(r) for r in ranges or []]
+    pred = compile_filter(where) if where else None
+    missing = [k for k in keys if k not in cams]
+    wanted = set(keys)
+    explicit = bool(keys or spans)
+
+    selected = []
+    for k, cam in cams.items():
+        if explicit and k not in wanted:
+            m = _SUFFIX.match(k) if spans else None
+            if not m:
+                continue
+            n = int(m.group(2))
+            if not any(m.group(1) == p and lo <= n <= hi for p, lo, hi in spans):
+                continue
+        if pred is not None and not pred(cam):
+            continue
+        selected.append(k)
+    return selected, missing
+
+
+# -----------------------------------------------------------------------------
+# Field patches
+# -----------------------------------------------------------------------------
+def compile_patch(set_fields: Optional[Dict[str, Any]] = None, unset: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """{'ffmpeg.fps': 10}, ['zones'] -> {'ffmpeg': {'fps': 10}, 'zones': _UNSET}.
+    Leaves are stored wrapped in a 1-tuple to tell them apart from subtrees."""
+    tree: Dict[str, Any] = {}
+    items = [(p, (v,)) for p, v in (set_fields or {}).items()] + [(p, (_UNSET,)) for p in unset or []]
+    for path, leaf in items:
+        parts = _split(path)
+        node = tree
+        for t in parts[:-1]:
+            child = node.setdefault(t, {})
+            if isinstance(child, tuple):
+                raise BulkError(f"conflicting field paths at '{path}'")
+            node = child
+        if parts[-1] in node:
+            raise BulkError(f"conflicting field paths at '{path}'")
+        node[parts[-1]] = leaf
+    return tree
+
+
+def apply_patch(obj: Any, tree: Dict[str, Any]) -> Any:
+    """Return `obj` with the compiled patch applied; `obj` itself if nothing changes."""
+    base = obj if isinstance(obj, dict) else {}
+    out = None
+    for k, sub in tree.items():
+        if isinstance(sub, tuple):
+            value = sub[0]
+            if value is _UNSET:
+                if k not in base:
+                    continue
+                out = out if out is not None else dict(base)
+                del out[k]
+                continue
+            if k in base and base[k] == value and type(base[k]) is type(value):
+                continue
+        else:
+            value = apply_patch(base.get(k), sub)
+            if k in base and value is base[k]:
+                continue
+        out = out if out is not None else dict(base)
+        out[k] = value
+    return obj if out is None else out
@@ -1,101 +1,259 @@
 from __future__ import annotations
+import atexit
 import json
+import logging
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .backup_store import BackupStore
+from .diff import diff_configs
+from .metrics import timed
+from .snapshot import ConfigSnapshot, FrozenDict, freeze
+from .storage import atomic_write, cleanup_tmp
+
+logger = logging.getLogger("hotreload")
 
 class ConfigManager:
     """Minimal, robust manager that works with plain dict configs.
     - Persists to data/config.json
-    - Keeps up to 5 rotating backups in data/backups/
+    - Keeps deep, deduplicated backup history in data/backups/ (see backup_store.py)
     - Provides apply(), get_running_config(), list_backups(), rollback(), reset_to_disk()
-    - Diff is simplified (before/after) but stable for preview
+    - Diff is path-level (RFC 6902 style ops + per-camera summary), see diff.py
+    - The running config is an immutable, versioned snapshot (see snapshot.py);
+      readers share it without copying
+    - Persistence is write-behind: applies that land within `commit_window`
+      seconds are group-committed as one atomic write and one backup.
+      Pass durable=True (or call flush()) to wait until a version is on disk.
+    - add_listener(fn) calls fn(old_snapshot, new_snapshot) for every new
+      version, in order, under the commit lock (keep it cheap)
     """
 
-    def __init__(self, data_dir: Path) -> None:
+    def __init__(self, data_dir: Path, commit_window: float = 0.25) -> None:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.backup_dir = self.data_dir / "backups"
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         self.config_path = self.data_dir / "config.json"
-        self._max_backups = 5
-        self._running: Dict[str, Any] = self._read_disk() or self._default()
+        self.commit_window = commit_window
+        # leftovers of a write interrupted by a crash
+        cleanup_tmp(self.data_dir)
+        cleanup_tmp(self.backup_dir)
+        self._store = BackupStore(self.backup_dir)
+        self._import_legacy_backups()
+        self._snapshot = ConfigSnapshot(1, freeze(self._read_disk() or self._default()))
+
+        # Write-behind state, guarded by _cond
+        self._cond = threading.Condition()
+        self._pending: Optional[ConfigSnapshot] = None   # newest version not yet on disk
+        self._flush_now = False
+        self._writing = False
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[ConfigSnapshot, ConfigSnapshot], None]] = []
+
         # Ensure persisted on first boot
-        self._persist(self._running)
+        self._persist(self._snapshot)
+        self._persisted_version = self._snapshot.version
+        self._disk_snapshot = self._snapshot   # what data/config.json holds
+        atexit.register(self.close)
 
     # ------------------------------------------------------------------
     # Public API used by FastAPI app
     # ------------------------------------------------------------------
-    def get_running_config(self) -> Dict[str, Any]:
-        # Deep copy via JSON to guarantee plain types
-        return json.loads(json.dumps(self._running))
+    @property
+    def _running(self) -> FrozenDict:
+        return self._snapshot.data
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def backup_count(self) -> int:
+        """Versions in the backup store (no flush, unlike list_backups)."""
+        return len(self._store)
+
+    def add_listener(self, fn: Callable[[ConfigSnapshot, ConfigSnapshot], None]) -> None:
+        self._listeners.append(fn)
+
+    def get_running_config(self) -> FrozenDict:
+        """Read-only view of the running config, shared between callers.
+        Build changes on a shallow copy; untouched subtrees can be passed back as-is.
+        """
+        return self._snapshot.data
 
     def diff_configs(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
-        return {"before": old, "after": new}
+        return diff_configs(old, new)
 
-    def apply(self, new_cfg: Any, workers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def apply(self, new_cfg: Any, workers: Optional[Dict[str, Any]] = None, durable: bool = False) -> Dict[str, Any]:
         """Accept dict or model-like and make it the running config.
-        The 'workers' arg is accepted for compatibility and ignored here.
+        The 'workers' arg is accepted for compatibility and ignored here;
+        workers follow committed versions via add_listener (workers/reconciler.py).
+        With durable=True, return only once the new version is on disk.
         """
         new_dict = self._to_dict(new_cfg)
-        # rotate backup of current running
-        self._rotate_backup()
-        # set and persist
-        self._running = json.loads(json.dumps(new_dict))
-        self._persist(self._running)
-        return {"applied": True, "path": str(self.config_path)}
-
-    def list_backups(self) -> List[str]:
-        files = sorted([p.name for p in self.backup_dir.glob("*.json")])
-        # only keep tail for display as well
-        return files[-self._max_backups:]
+        version = self._commit(new_dict)
+        persisted = self.flush(version) if durable else False
+        return {"applied": True, "path": str(self.config_path), "version": version, "persisted": persisted}
+
+    def apply_config(self, new_cfg: Dict[str, Any], durable: bool = False) -> Dict[str, Any]:
+        return self.apply(new_cfg, durable=durable)
+
+    def flush(self, version: Optional[int] = None, timeout: Optional[float] = 10.0) -> bool:
+        """Commit pending writes now and wait until `version` (default: the
+        running one) is on disk. Returns False on timeout or write failure."""
+        with self._cond:
+            target = self._snapshot.version if version is None else version
+            if self._persisted_version >= target:
+                return True
+            self._flush_now = True
+            self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: self._persisted_version >= target or (self._pending is None and not self._writing),
+                timeout,
+            )
+            return self._persisted_version >= target
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer thread."""
+        # the exit hook holds a reference; drop it so a closed manager can be freed
+        atexit.unregister(self.close)
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer:
+            self._writer.join(timeout=5)
+            self._writer = None
+
+    def list_backups(self, limit: Optional[int] = None) -> List[str]:
+        """Backup version ids, oldest first (served from the store index)."""
+        self.flush()
+        ids = self._store.ids()
+        return ids[-limit:] if limit else ids
+
+    def backup_entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Index entries: {id, ts, size, cameras, manifest, stored}, oldest first."""
+        self.flush()
+        entries = self._store.entries()
+        return entries[-limit:] if limit else entries
 
     def rollback(self, name: Optional[str] = None) -> bool:
         try:
-            if name:
-                target = self.backup_dir / name
-            else:
-                files = sorted(self.backup_dir.glob("*.json"))
-                if not files:
-                    return False
-                target = files[-1]
-            if not target.exists():
+            # pending commits may still add a backup; settle them first
+            self.flush()
+            if name and name not in self._store and name.endswith(".json"):
+                name = name[:-5]   # legacy file name -> imported version id
+            name = name or self._store.latest()
+            if not name:
                 return False
-            data = json.loads(target.read_text())
-            self._running = data
-            self._persist(self._running)
-            return True
+            data = self._store.load(name)
+            if not data:
+                return False
+            return self.flush(self._commit(data))
         except Exception:
             return False
 
     def reset_to_disk(self) -> bool:
-        data = self._read_disk()
-        if not data:
-            return False
-        self._running = data
-        self._persist(self._running)
+        """Reload data/config.json, dropping applies that are not on disk yet."""
+        with self._cond:
+            self._pending = None
+            self._cond.wait_for(lambda: not self._writing)
+            data = self._read_disk()
+            if not data:
+                return False
+            self._advance(data)
+            self._persisted_version = self._snapshot.version
+            self._disk_snapshot = self._snapshot
+            self._cond.notify_all()
         return True
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
-    def _persist(self, cfg: Dict[str, Any]) -> None:
-        self.config_path.write_text(json.dumps(cfg, indent=2))
+    def _commit(self, data: Dict[str, Any]) -> int:
+        """Make `data` the running version and queue it for the writer."""
+        with self._cond:
+            self._advance(data)
+            self._pending = self._snapshot
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="config-writer", daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+            return self._snapshot.version
 
+    def _advance(self, data: Dict[str, Any]) -> None:
+        """Install the next version; caller holds _cond."""
+        old = self._snapshot
+        self._snapshot = old.next(data)
+        for fn in self._listeners:
+            try:
+                fn(old, self._snapshot)
+            except Exception:
+                logger.exception("config listener failed")
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                # Group commit: let further applies pile up for one window
+                deadline = time.monotonic() + self.commit_window
+                while not (self._flush_now or self._closed):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                snap, self._pending = self._pending, None
+                self._flush_now = False
+                if snap is None:   # dropped by reset_to_disk
+                    continue
+                self._writing = True
+            ok = False
+            try:
+                self._rotate_backup()
+                self._persist(snap)
+                self._disk_snapshot = snap
+                ok = True
+            except Exception:
+                logger.exception("config commit of version %s failed", snap.version)
+            with self._cond:
+                self._writing = False
+                if ok:
+                    self._persisted_version = max(self._persisted_version, snap.version)
+                self._cond.notify_all()
+
+    @timed("persist")
+    def _persist(self, snap: ConfigSnapshot) -> None:
+        atomic_write(self.config_path, snap.pretty_body)
+
+    @timed("backup")
     def _rotate_backup(self) -> None:
+        """Record the version currently on disk before it is replaced."""
         try:
-            if not self.config_path.exists():
-                return
-            ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            bak = self.backup_dir / f"config.{ts}.json"
-            bak.write_text(self.config_path.read_text())
-            files = sorted(self.backup_dir.glob("*.json"))
-            excess = len(files) - self._max_backups
-            for i in range(excess):
-                files[i].unlink(missing_ok=True)
+            self._store.put(self._disk_snapshot.data)
         except Exception:
             # best-effort; do not fail apply
-            pass
+            logger.exception("backup failed")
+
+    def _import_legacy_backups(self) -> None:
+        """One-time import of pre-store config.<ts>.json backups into the store."""
+        if len(self._store):
+            return
+        for p in sorted(self.backup_dir.glob("config.*.json")):
+            if p.stem in self._store:
+                continue
+            try:
+                self._store.put(json.loads(p.read_text()), version_id=p.stem)
+            except Exception:
+                logger.warning("skipping unreadable legacy backup %s", p.name)
 
     def _read_disk(self) -> Optional[Dict[str, Any]]:
         try:
@@ -3,7 +3,7 @@ from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field, PositiveInt, conint
 
 class MQTTConfig(BaseModel):
-    host: str = "mqtt"
+    host: str = Field("mqtt", min_length=1)
     port: conint(ge=1, le=65535) = 1883
     user: Optional[str] = None
     password: Optional[str] = None
@@ -25,11 +25,11 @@ class RetentionPolicy(BaseModel):
     post_capture_sec: conint(ge=0, le=15) = 3
 
 class FFmpegInput(BaseModel):
-    url: str
+    url: str = Field(..., min_length=1)
     hwaccel: Optional[str] = None
     width: Optional[int] = None
     height: Optional[int] = None
-    fps: Optional[int] = None
+    fps: Optional[conint(ge=1, le=240)] = None
 
 class CameraConfig(BaseModel):
     name: str
@@ -41,4 +41,4 @@ class CameraConfig(BaseModel):
 
 class RootConfig(BaseModel):
     mqtt: MQTTConfig = MQTTConfig()
-    cameras: Dict[str, CameraConfig] = {}
+    cameras: Dict[str, CameraConfig]
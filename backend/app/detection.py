@@ -0,0 +1,149 @@
+"""Batched detection post-processing: score threshold + NMS for many cameras.
+
+A batch holds the raw detector output of many cameras at once: boxes
+(x1, y1, x2, y2), scores and class ids, plus the camera index of every box.
+`postprocess` drops boxes below their camera's `score_threshold`, then runs
+greedy NMS per (camera, class) group with the camera's `iou_threshold`.
+
+The NMS is vectorized across groups: boxes are sorted by group and score and
+laid out as a padded (groups x max_group_size) array; each step keeps the best
+remaining box of every active group and suppresses its overlaps in one array
+operation. Steps = the most boxes any group keeps, not the number of boxes.
+The result is the same as per-group greedy NMS (suppress when IoU > threshold).
+
+`PostProcessor` reads the thresholds from the camera workers' configs on every
+batch, so `apply_update` changes apply from the next batch, without a restart.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config_schema import DetectionParams
+
+_DEFAULT = DetectionParams()
+
+Raw = Tuple[Any, Any, Any]   # boxes (N, 4), scores (N,), classes (N,)
+
+
+def postprocess(boxes: Any, scores: Any, classes: Any, cameras: Any,
+                score_threshold: Any, iou_threshold: Any) -> np.ndarray:
+    """Indices of the boxes that survive, grouped by camera and class, best first.
+
+    `cameras` is each box's camera index into `score_threshold` / `iou_threshold`
+    (per-camera arrays, or scalars for one shared threshold).
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    classes = np.asarray(classes).ravel()
+    cameras = np.asarray(cameras, dtype=np.int64).ravel()
+    score_t = np.broadcast_to(np.asarray(score_threshold, dtype=np.float64), (int(cameras.max(initial=-1)) + 1,)) \
+        if np.ndim(score_threshold) == 0 else np.asarray(score_threshold, dtype=np.float64)
+    iou_t = np.broadcast_to(np.asarray(iou_threshold, dtype=np.float64), score_t.shape) \
+        if np.ndim(iou_threshold) == 0 else np.asarray(iou_threshold, dtype=np.float64)
+
+    idx = np.flatnonzero(scores >= score_t[cameras]) if len(scores) else np.empty(0, dtype=np.int64)
+    if not len(idx):
+        return idx
+    _, cls = np.unique(classes[idx], return_inverse=True)
+    group_key = cameras[idx] * (int(cls.max()) + 1) + cls
+    order = np.lexsort((-scores[idx], group_key))
+    idx, group_key = idx[order], group_key[order]
+    starts = np.flatnonzero(np.r_[True, group_key[1:] != group_key[:-1]])
+    sizes = np.diff(np.r_[starts, len(idx)])
+    g, m = len(starts), int(sizes.max())
+    group = np.repeat(np.arange(g), sizes)
+    slot = np.arange(len(idx)) - starts[group]
+
+    # working set: one row per group that still has live boxes, compacted as groups finish
+    coords = np.zeros((4, g, m))
+    coords[:, group, slot] = boxes[idx].T
+    x1, y1, x2, y2 = coords
+    area = (x2 - x1) * (y2 - y1)
+    alive = np.zeros((g, m), dtype=bool)
+    alive[group, slot] = True
+    thr = iou_t[cameras[idx[starts]]][:, None]
+    rows = np.arange(g)
+    kept = np.zeros((g, m), dtype=bool)
+    while len(rows):
+        r = np.arange(len(rows))
+        first = alive.argmax(axis=1)   # best live box: rows are sorted by score
+        kept[rows, first] = True
+        alive[r, first] = False
+        bx1, by1, bx2, by2 = (c[r, first][:, None] for c in (x1, y1, x2, y2))
+        inter = (np.clip(np.minimum(x2, bx2) - np.maximum(x1, bx1), 0, None)
+                 * np.clip(np.minimum(y2, by2) - np.maximum(y1, by1), 0, None))
+        # IoU > t  <=>  inter > t * union, without dividing
+        alive &= ~(inter > thr * (area + area[r, first][:, None] - inter))
+        more = alive.any(axis=1)
+        if not more.all():
+            rows, alive, x1, y1, x2, y2, area, thr = (
+                a[more] for a in (rows, alive, x1, y1, x2, y2, area, thr))
+    return idx[kept[group, slot]]
+
+
+class PostProcessor:
+    """Score threshold + NMS over detections from many cameras in one batch.
+
+    `workers` maps camera key -> worker; each camera's thresholds are read
+    from `worker.cfg.detection` per batch (defaults for unknown cameras).
+    """
+
+    def __init__(self, workers: Mapping[str, Any]) -> None:
+        self.workers = workers
+
+    def thresholds(self, keys: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        params = []
+        for key in keys:
+            worker = self.workers.get(key)
+            params.append(worker.cfg.detection if worker is not None else _DEFAULT)
+        return (np.array([p.score_threshold for p in params], dtype=np.float64),
+                np.array([p.iou_threshold for p in params], dtype=np.float64))
+
+    def process(self, batch: Mapping[str, Raw]) -> Dict[str, Dict[str, np.ndarray]]:
+        """{camera: (boxes, scores, classes)} -> {camera: {boxes, scores, classes}} kept."""
+        keys: List[str] = list(batch)
+        parts = [tuple(np.asarray(a) for a in batch[k]) for k in keys]
+        counts = [len(p[1]) for p in parts]
+        if not keys or not sum(counts):
+            return {k: {"boxes": np.empty((0, 4)), "scores": np.empty(0), "classes": np.empty(0, dtype=np.int64)}
+                    for k in keys}
+        boxes = np.concatenate([np.asarray(p[0], dtype=np.float64).reshape(-1, 4) for p in parts])
+        scores = np.concatenate([p[1].ravel() for p in parts])
+        classes = np.concatenate([p[2].ravel() for p in parts])
+        cameras = np.repeat(np.arange(len(keys)), counts)
+        score_t, iou_t = self.thresholds(keys)
+        keep = postprocess(boxes, scores, classes, cameras, score_t, iou_t)
+        keep = keep[np.argsort(cameras[keep], kind="stable")]
+        bounds = np.searchsorted(cameras[keep], np.arange(len(keys) + 1))
+        out: Dict[str, Dict[str, np.ndarray]] = {}
+        for i, key in enumerate(keys):
+            sel = keep[bounds[i]:bounds[i + 1]]
+            out[key] = {"boxes": boxes[sel], "scores": scores[sel], "classes": classes[sel]}
+        return out
+
+
+def nms_reference(boxes: Sequence[Sequence[float]], scores: Sequence[float], iou_threshold: float,
+                  score_threshold: float, classes: Optional[Sequence[Any]] = None) -> List[int]:
+    """Plain-Python per-box filter + O(n^2) greedy NMS for one camera (the old
+    way; kept as the benchmark baseline and for cross-checking)."""
+    classes = classes if classes is not None else [0] * len(scores)
+    cand = [i for i in range(len(scores)) if scores[i] >= score_threshold]
+    cand.sort(key=lambda i: -scores[i])
+    kept: List[int] = []
+    for i in cand:
+        ok = True
+        for j in kept:
+            if classes[j] != classes[i]:
+                continue
+            a, b = boxes[i], boxes[j]
+            ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+            iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+            inter = ix * iy
+            union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+            if union > 0 and inter / union > iou_threshold:
+                ok = False
+                break
+        if ok:
+            kept.append(i)
+    return kept
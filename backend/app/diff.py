@@ -0,0 +1,175 @@
+"""Structural diff for plain JSON configs.
+
+Produces RFC 6902 style operations (add/remove/replace/move) addressed by
+JSON Pointer. Object key order is only significant for `cameras` (the UI
+renders it as-is); a reorder is expressed as `move` ops whose `from` and
+`path` are the same member plus an `after` key naming the member it must
+follow (None = first). Elsewhere JSON object order is ignored.
+"""
+from __future__ import annotations
+import bisect
+from typing import Any, Dict, List
+
+
+def escape_token(token: Any) -> str:
+    """One JSON Pointer reference token (RFC 6901): '~' -> '~0', '/' -> '~1'."""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unesc(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def split_pointer(pointer: str) -> List[str]:
+    """'/cameras/cam1/ffmpeg' -> ['cameras', 'cam1', 'ffmpeg']"""
+    if not pointer:
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"invalid JSON pointer: {pointer!r}")
+    return [_unesc(t) for t in pointer[1:].split("/")]
+
+
+def _stable_keys(current: List[str], final_index: Dict[str, int]) -> set:
+    """Longest run of keys whose relative order already matches the target order."""
+    seq = [final_index[k] for k in current]
+    tails: List[int] = []       # tails[i] = index into seq of the smallest tail of a run of length i+1
+    prev: List[int] = [-1] * len(seq)
+    tail_vals: List[int] = []
+    for i, v in enumerate(seq):
+        pos = bisect.bisect_left(tail_vals, v)
+        if pos > 0:
+            prev[i] = tails[pos - 1]
+        if pos == len(tails):
+            tails.append(i)
+            tail_vals.append(v)
+        else:
+            tails[pos] = i
+            tail_vals[pos] = v
+    out = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        out.add(current[i])
+        i = prev[i]
+    return out
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """Type-strict JSON equality: like `==`, but 1, 1.0 and True are different
+    values, at any depth. dict/list subclasses (frozen snapshots) compare as
+    their JSON kind, and object key order is ignored."""
+    if a is b:
+        return True
+    if isinstance(a, dict):
+        # C-level `==` first rejects most differences without recursing in Python
+        if not isinstance(b, dict) or a != b:
+            return False
+        return all(json_equal(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        if not isinstance(b, list) or a != b:
+            return False
+        return all(json_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def _same_cameras(a: Any, b: Any) -> bool:
+    # dict equality ignores key order, which is significant for cameras
+    return json_equal(a, b) and (not isinstance(a, dict) or list(a) == list(b))
+
+
+def _diff_obj(old: dict, new: dict, path: str, ops: List[Dict[str, Any]]) -> None:
+    for k in old:
+        if k not in new:
+            ops.append({"op": "remove", "path": f"{path}/{escape_token(k)}"})
+    for k, nv in new.items():
+        p = f"{path}/{escape_token(k)}"
+        if k not in old:
+            ops.append({"op": "add", "path": p, "value": nv})
+            continue
+        ov = old[k]
+        if _same_cameras(ov, nv) if p == "/cameras" else json_equal(ov, nv):
+            continue
+        _diff_value(ov, nv, p, ops)
+
+    # Key order: after removes/adds the object is [old survivors..., added...]
+    current = [k for k in old if k in new] + [k for k in new if k not in old]
+    target = list(new)
+    if current != target:
+        final_index = {k: i for i, k in enumerate(target)}
+        stable = _stable_keys(current, final_index)
+        # Applied in sequence, placing each out-of-order key right after its
+        # predecessor in the target order reproduces that order exactly.
+        for i, k in enumerate(target):
+            if k in stable:
+                continue
+            p = f"{path}/{escape_token(k)}"
+            ops.append({"op": "move", "from": p, "path": p, "after": target[i - 1] if i else None})
+
+
+def _diff_list(old: list, new: list, path: str, ops: List[Dict[str, Any]]) -> None:
+    common = min(len(old), len(new))
+    for i in range(common):
+        ov, nv = old[i], new[i]
+        if json_equal(ov, nv):
+            continue
+        _diff_value(ov, nv, f"{path}/{i}", ops)
+    # Remove from the tail first so indices stay valid while applying
+    for i in range(len(old) - 1, common - 1, -1):
+        ops.append({"op": "remove", "path": f"{path}/{i}"})
+    for i in range(common, len(new)):
+        ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+
+
+def _diff_value(old: Any, new: Any, path: str, ops: List[Dict[str, Any]]) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        _diff_obj(old, new, path, ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, ops)
+    else:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def diff_ops(old: Any, new: Any) -> List[Dict[str, Any]]:
+    """Return the list of operations turning `old` into `new`."""
+    ops: List[Dict[str, Any]] = []
+    if json_equal(old, new) and (not isinstance(old, dict) or _same_cameras(old.get("cameras"), new.get("cameras"))):
+        return ops
+    _diff_value(old, new, "", ops)
+    return ops
+
+
+def camera_summary(ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Group operations by camera key.
+
+    Returns {"added": [...], "removed": [...], "modified": {key: [subpaths]}, "moved": [...]}.
+    """
+    added: List[str] = []
+    removed: List[str] = []
+    moved: List[str] = []
+    modified: Dict[str, List[str]] = {}
+    for op in ops:
+        parts = split_pointer(op["path"])
+        if not parts or parts[0] != "cameras":
+            continue
+        if len(parts) == 1:
+            # whole cameras object replaced
+            continue
+        key = parts[1]
+        if len(parts) == 2:
+            kind = op["op"]
+            if kind == "add":
+                added.append(key)
+            elif kind == "remove":
+                removed.append(key)
+            elif kind == "move":
+                moved.append(key)
+            else:
+                modified.setdefault(key, []).append("")
+        else:
+            sub = op["path"].split("/", 3)[3]
+            modified.setdefault(key, []).append("/" + sub)
+    return {"added": added, "removed": removed, "modified": modified, "moved": moved}
+
+
+def diff_configs(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    ops = diff_ops(old, new)
+    return {"ops": ops, "cameras": camera_summary(ops)}
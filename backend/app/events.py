@@ -1,25 +1,283 @@
+"""WebSocket fan-out.
+
+`broadcast` serializes an event once and only enqueues it: every client has a
+bounded queue drained by its own writer task, so a slow browser tab delays
+nobody but itself. When a client's queue is full its backlog is coalesced into
+a single `{"event": "overflow", "dropped": N}` notice (the client should
+refetch state). A watchdog closes and evicts clients whose current send has
+been blocked for longer than `stall_timeout`.
+
+Config-change events are versioned: `EventLog` keeps a bounded replay ring of
+committed versions, each event carrying `version`, `base` (the version it
+applies on top of) and `delta` (RFC 6902 ops, see diff.py). A client that
+reconnects with `/ws?since=<version>` is replayed the deltas it missed, or
+sent one full snapshot if that version has fallen off the ring.
+"""
 from __future__ import annotations
-from typing import List
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Union
+
 from fastapi import WebSocket
 
+from .diff import diff_ops
+from .metrics import timed
+from .snapshot import ConfigSnapshot
+
+logger = logging.getLogger("hotreload")
+
+SLOW_CONSUMER_CLOSE = 1008   # policy violation: client does not keep up
+
+
+class _Client:
+    __slots__ = ("ws", "queue", "task", "dropped", "busy_since")
+
+    def __init__(self, ws: WebSocket, queue_size: int) -> None:
+        self.ws = ws
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0   # events coalesced away since the last overflow notice
+        self.busy_since: Optional[float] = None   # start of the send in progress
+
+
 class WSBus:
-    def __init__(self):
-        self.clients: List[WebSocket] = []
+    def __init__(self, queue_size: int = 64, stall_timeout: float = 10.0) -> None:
+        self.queue_size = max(2, queue_size)   # room for an overflow notice + the new event
+        self.stall_timeout = stall_timeout
+        self._clients: Dict[WebSocket, _Client] = {}
+        self.stats = {"events": 0, "sent": 0, "dropped": 0, "evicted": 0}
+        self._watchdog: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
 
-    async def register(self, ws: WebSocket):
+    async def connect(self, ws: WebSocket) -> None:
         await ws.accept()
-        self.clients.append(ws)
+        self.register(ws)
+
+    def register(self, ws: WebSocket, backlog: Iterable[str] = ()) -> None:
+        """Attach an already accepted socket and start its writer. `backlog`
+        (at most queue_size messages) is sent before any new event."""
+        client = _Client(ws, self.queue_size)
+        for payload in backlog:
+            client.queue.put_nowait(payload)
+        loop = self._loop = asyncio.get_running_loop()
+        client.task = loop.create_task(self._writer(client))
+        self._clients[ws] = client
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = loop.create_task(self._watch())
+
+    def disconnect(self, ws: WebSocket) -> None:
+        client = self._clients.pop(ws, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    async def broadcast(self, message: Union[Dict[str, Any], str]) -> None:
+        """Queue `message` for every client; never waits on a socket."""
+        self._fanout(message)
 
-    async def unregister(self, ws: WebSocket):
-        if ws in self.clients:
-            self.clients.remove(ws)
+    def publish(self, message: Union[Dict[str, Any], str]) -> None:
+        """`broadcast` from any thread (sync endpoints run in the threadpool)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return   # nobody has connected yet
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fanout(message)
+        else:
+            loop.call_soon_threadsafe(self._fanout, message)
 
-    async def broadcast(self, payload):
-        stale = []
-        for c in self.clients:
+    @timed("broadcast")
+    def _fanout(self, message: Union[Dict[str, Any], str]) -> None:
+        payload = json.dumps(message) if not isinstance(message, str) else message
+        self.stats["events"] += 1
+        for client in list(self._clients.values()):
             try:
-                await c.send_json(payload)
-            except Exception:
-                stale.append(c)
-        for s in stale:
-            await self.unregister(s)
+                client.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self._coalesce(client, payload)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _coalesce(self, client: _Client, payload: str) -> None:
+        """Replace a full backlog with one overflow notice followed by `payload`."""
+        q = client.queue
+        dropped = 0
+        while not q.empty():
+            if not isinstance(q.get_nowait(), _Overflow):
+                dropped += 1
+        client.dropped += dropped
+        self.stats["dropped"] += dropped
+        q.put_nowait(_Overflow())
+        q.put_nowait(payload)
+
+    async def _writer(self, client: _Client) -> None:
+        ws = client.ws
+        try:
+            while True:
+                item = await client.queue.get()
+                if isinstance(item, _Overflow):
+                    item = json.dumps({"event": "overflow", "dropped": client.dropped})
+                    client.dropped = 0
+                client.busy_since = time.monotonic()
+                await ws.send_text(item)
+                client.busy_since = None
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # socket gone
+            self.disconnect(ws)
+
+    async def _watch(self) -> None:
+        """Evict stalled clients; runs while any client is connected."""
+        while self._clients:
+            await asyncio.sleep(self.stall_timeout / 2)
+            deadline = time.monotonic() - self.stall_timeout
+            for client in list(self._clients.values()):
+                if client.busy_since is not None and client.busy_since < deadline:
+                    self._evict(client)
+
+    def _evict(self, client: _Client) -> None:
+        self.stats["evicted"] += 1
+        logger.warning("evicting WebSocket client stalled for more than %.1fs", self.stall_timeout)
+        self.disconnect(client.ws)
+        asyncio.get_running_loop().create_task(self._close(client.ws))
+
+    @staticmethod
+    async def _close(ws: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(ws.close(code=SLOW_CONSUMER_CLOSE), 1.0)
+        except Exception:
+            pass
+
+
+class _Overflow:
+    """Queue marker: events were dropped here."""
+    __slots__ = ()
+
+
+class _Entry:
+    __slots__ = ("version", "base", "old", "new", "delta", "event", "payload", "message", "published")
+
+    def __init__(self, old: ConfigSnapshot, new: ConfigSnapshot) -> None:
+        self.version = new.version
+        self.base = old.version
+        self.old: Optional[ConfigSnapshot] = old
+        self.new: Optional[ConfigSnapshot] = new
+        self.delta: Optional[List[Dict[str, Any]]] = None   # diffed on first use
+        self.event = "config_changed"
+        self.payload: Dict[str, Any] = {}
+        self.message: Optional[str] = None   # serialized event, built on first use
+        self.published = False   # set by publish(); replay stops before the first unpublished entry
+
+
+class EventLog:
+    """Replay ring of committed config versions.
+
+    `record` is the ConfigManager commit listener: it runs under the manager's
+    lock, so the ring has every version in order and costs one append. The
+    delta is diffed from the two (structure-sharing) snapshots the first time
+    the event is sent or replayed; deltas longer than `max_delta_ops` are sent
+    as `"delta": null, "resync": true` instead (the client refetches
+    /api/config). `publish` names the event and adds the endpoint's payload.
+    """
+
+    def __init__(self, size: int = 256, max_delta_ops: int = 1000) -> None:
+        self.size = max(1, size)
+        self.max_delta_ops = max_delta_ops
+        self.epoch = secrets.token_hex(4)   # versions restart with the process
+        self._ring: Deque[_Entry] = deque(maxlen=self.size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def record(self, old: ConfigSnapshot, new: ConfigSnapshot) -> None:
+        entry = _Entry(old, new)
+        with self._lock:
+            self._ring.append(entry)
+
+    def publish(self, version: int, event: str, payload: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Name the event for `version` and return its serialized message
+        (None if the version is no longer in the ring)."""
+        with self._lock:
+            entry = self._find(version)
+            if entry is None:
+                return None
+            entry.event = event
+            entry.payload = dict(payload or {})
+            entry.message = None
+            entry.published = True
+        return self._message(entry)
+
+    def since(self, version: int) -> Optional[List[str]]:
+        """Messages for every version after `version`, oldest first; None if
+        the client has to resync from a snapshot instead. Versions committed but
+        not yet published are left out: they reach the client through the bus
+        under their real event name once the endpoint publishes them."""
+        with self._lock:
+            if not self._ring:
+                return None
+            if version == self._ring[-1].version:
+                return []
+            first = self._find(version + 1)
+            if first is None or first.base != version:
+                return None
+            entries = []
+            for e in self._ring:
+                if e.version <= version:
+                    continue
+                if not e.published:
+                    break
+                entries.append(e)
+        return [self._message(e) for e in entries]
+
+    def hello(self, snap: ConfigSnapshot) -> str:
+        return json.dumps({"event": "hello", "epoch": self.epoch, "version": snap.version})
+
+    def snapshot(self, snap: ConfigSnapshot) -> str:
+        # the snapshot's cached compact body is spliced in, not re-serialized
+        head = json.dumps({"event": "snapshot", "epoch": self.epoch, "version": snap.version})
+        return head[:-1] + ',"config":' + snap.body.decode("utf-8") + "}"
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _find(self, version: int) -> Optional[_Entry]:
+        # versions in the ring are consecutive
+        if not self._ring:
+            return None
+        i = version - self._ring[0].version
+        if 0 <= i < len(self._ring) and self._ring[i].version == version:
+            return self._ring[i]
+        return None
+
+    def _message(self, entry: _Entry) -> str:
+        message = entry.message
+        if message is None:
+            # races only repeat the same work
+            old, new = entry.old, entry.new
+            if old is not None and new is not None:
+                ops = diff_ops(old.data, new.data)
+                entry.delta = ops if len(ops) <= self.max_delta_ops else None
+                entry.old = entry.new = None   # the ring keeps the delta, not the versions
+            ops = entry.delta
+            body = {"event": entry.event, **entry.payload, "epoch": self.epoch,
+                    "version": entry.version, "base": entry.base}
+            if ops is not None:
+                body["delta"] = ops
+            else:
+                body.update(delta=None, resync=True)
+            message = entry.message = json.dumps(body)
+        return message
@@ -0,0 +1,159 @@
+"""Zone geometry: compile a camera's zones once, classify detections in batches.
+
+`compile_zones(zones)` turns the `Zone.points` polygons into NumPy arrays:
+per-zone bounding boxes and the polygon edges padded to a common length.
+`CompiledZones.contains_points(pts)` answers "which zones contain each of these
+N points" as an (N, Z) bool matrix: a bounding-box test over all pairs, then a
+vectorized even-odd (ray crossing) test over the candidate pairs only.
+`contains_boxes` does the same for detection boxes, using the box's anchor
+point (bottom centre by default: where the object touches the ground).
+
+With `raster=True` and a frame size (the camera's `ffmpeg.width`/`height`) the
+zones are also rasterized into a per-pixel bitmask (up to 64 zones), and point
+queries become one array lookup per point.
+
+Compile once per config version (CameraState.compiled_zones in
+workers/base.py caches it and drops it when `apply_update` changes zones).
+"""
+from __future__ import annotations
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+ANCHORS = ("bottom_center", "center")
+_CHUNK = 1 << 20   # candidate (point, zone) pairs evaluated per step
+
+
+def _points_of(zone: Any) -> Sequence[Sequence[float]]:
+    return zone["points"] if isinstance(zone, dict) else zone.points
+
+
+def _name_of(zone: Any) -> str:
+    return zone["name"] if isinstance(zone, dict) else zone.name
+
+
+class CompiledZones:
+    """Array form of one camera's zones. Zones with fewer than 3 points never match."""
+
+    def __init__(self, zones: Iterable[Any], width: Optional[int] = None, height: Optional[int] = None,
+                 raster: bool = False) -> None:
+        zones = list(zones)
+        self.names: List[str] = [_name_of(z) for z in zones]
+        polys = [np.asarray(_points_of(z), dtype=np.float64).reshape(-1, 2) for z in zones]
+        z = len(polys)
+        e = max((len(p) for p in polys), default=0)
+        # edges (x0, y0) -> (x1, y1); padding edges have y0 = y1 = inf and never cross
+        self.x0 = np.zeros((z, e))
+        self.x1 = np.zeros((z, e))
+        self.y0 = np.full((z, e), np.inf)
+        self.y1 = np.full((z, e), np.inf)
+        self.bbox = np.empty((z, 4))   # xmin, ymin, xmax, ymax
+        self.bbox[:] = (np.inf, np.inf, -np.inf, -np.inf)
+        for i, p in enumerate(polys):
+            if len(p) < 3:
+                continue
+            q = np.roll(p, -1, axis=0)
+            n = len(p)
+            self.x0[i, :n], self.y0[i, :n] = p[:, 0], p[:, 1]
+            self.x1[i, :n], self.y1[i, :n] = q[:, 0], q[:, 1]
+            self.bbox[i] = (*p.min(axis=0), *p.max(axis=0))
+        self.width, self.height = width, height
+        self.mask: Optional[np.ndarray] = None
+        if raster and width and height and 0 < z <= 64:
+            self.mask = self._rasterize(int(width), int(height))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def contains_points(self, points: Any) -> np.ndarray:
+        """(N, 2) x/y points -> (N, Z) bool: point n lies inside zone z."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.mask is not None:
+            return self._lookup(pts)
+        return self._crossing(pts)
+
+    def contains_boxes(self, boxes: Any, anchor: str = "bottom_center") -> np.ndarray:
+        """(N, 4) x1/y1/x2/y2 boxes -> (N, Z) bool, testing each box's anchor point."""
+        b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        x = (b[:, 0] + b[:, 2]) * 0.5
+        if anchor == "bottom_center":
+            y = np.maximum(b[:, 1], b[:, 3])
+        elif anchor == "center":
+            y = (b[:, 1] + b[:, 3]) * 0.5
+        else:
+            raise ValueError(f"anchor must be one of: {', '.join(ANCHORS)}")
+        return self.contains_points(np.stack([x, y], axis=1))
+
+    def zone_names(self, hits: np.ndarray) -> List[List[str]]:
+        """Turn a contains_* matrix into the zone names per row."""
+        names = self.names
+        return [[names[j] for j in np.flatnonzero(row)] for row in hits]
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _crossing(self, pts: np.ndarray) -> np.ndarray:
+        n, z = len(pts), len(self.names)
+        out = np.zeros((n, z), dtype=bool)
+        if not n or not z:
+            return out
+        px, py = pts[:, 0:1], pts[:, 1:2]
+        cand = ((px >= self.bbox[:, 0]) & (px <= self.bbox[:, 2])
+                & (py >= self.bbox[:, 1]) & (py <= self.bbox[:, 3]))
+        pi, zi = np.nonzero(cand)
+        step = max(1, _CHUNK // max(1, self.x0.shape[1]))
+        for s in range(0, len(pi), step):
+            p, q = pi[s:s + step], zi[s:s + step]
+            out[p, q] = self._inside(pts[p, 0], pts[p, 1], q)
+        return out
+
+    def _inside(self, px: np.ndarray, py: np.ndarray, zi: np.ndarray) -> np.ndarray:
+        """Even-odd test of point k against zone zi[k], over all edges at once."""
+        x0, y0, x1, y1 = self.x0[zi], self.y0[zi], self.x1[zi], self.y1[zi]
+        px, py = px[:, None], py[:, None]
+        crosses = (y0 > py) != (y1 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xs = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        return np.logical_xor.reduce(crosses & (px < xs), axis=1)
+
+    def _rasterize(self, width: int, height: int) -> np.ndarray:
+        """Scanline fill: pixel x of row y is inside when an odd number of edge
+        crossings at y lie right of x, i.e. (total even) an odd number lie at
+        or left of it -- a per-row prefix sum over the crossing positions."""
+        mask = np.zeros((height, width), dtype=np.uint64)
+        for j in range(len(self.names)):
+            if not np.isfinite(self.bbox[j, 0]):
+                continue
+            x_lo, y_lo, x_hi, y_hi = self.bbox[j]
+            c0, c1 = max(0, int(np.ceil(x_lo))), min(width, int(np.floor(x_hi)) + 1)
+            r0, r1 = max(0, int(np.ceil(y_lo))), min(height, int(np.floor(y_hi)) + 1)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            ys = np.arange(r0, r1, dtype=np.float64)[:, None]
+            x0, y0, x1, y1 = self.x0[j], self.y0[j], self.x1[j], self.y1[j]
+            crosses = (y0 > ys) != (y1 > ys)   # (rows, E)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                xs = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+            rows, cols = np.nonzero(crosses)
+            # first pixel at or right of each crossing, relative to the bbox
+            first = np.clip(np.ceil(xs[rows, cols]) - c0, 0, c1 - c0).astype(np.int64)
+            hist = np.zeros((r1 - r0, c1 - c0 + 1), dtype=np.int32)
+            np.add.at(hist, (rows, first), 1)
+            inside = (np.cumsum(hist[:, :-1], axis=1) & 1).astype(np.uint64)
+            mask[r0:r1, c0:c1] |= inside << np.uint64(j)
+        return mask
+
+    def _lookup(self, pts: np.ndarray) -> np.ndarray:
+        assert self.mask is not None
+        h, w = self.mask.shape
+        xi, yi = np.floor(pts[:, 0]).astype(np.int64), np.floor(pts[:, 1]).astype(np.int64)
+        ok = (xi >= 0) & (xi < w) & (yi >= 0) & (yi < h)
+        bits = np.zeros(len(pts), dtype=np.uint64)
+        bits[ok] = self.mask[yi[ok], xi[ok]]
+        shifts = np.arange(len(self.names), dtype=np.uint64)
+        return ((bits[:, None] >> shifts) & np.uint64(1)).astype(bool)
+
+
+def compile_zones(zones: Iterable[Any], width: Optional[int] = None, height: Optional[int] = None,
+                  raster: bool = False) -> CompiledZones:
+    return CompiledZones(zones, width, height, raster)
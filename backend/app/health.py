@@ -0,0 +1,428 @@
+"""Camera health prober: reachability, latency and FPS of every `ffmpeg.url`.
+
+All probes run concurrently on one asyncio loop (its own thread), bounded by a
+global limit and a per-host limit (NVRs serve many cameras from one address).
+A probe per scheme:
+
+  rtsp / rtsps   OPTIONS (latency), then DESCRIBE: the SDP's a=framerate gives
+                 the stream FPS. The connection stays open and the next probe
+                 reuses it (RTSP is persistent); Basic / Digest auth from the
+                 URL's user:password when the camera answers 401
+  http / https   HEAD over a keep-alive connection, reused the same way
+  rtmp / tcp ... TCP connect
+  udp / srt / file paths are not probed ("skipped")
+
+Intervals adapt per camera: every healthy probe doubles the interval up to
+`max_interval`, a failing camera is probed every `min_interval`. Results are
+kept in memory (`results()`); `on_change` is called with the camera's result
+whenever its status changes (main.py streams it as a `camera_health` event).
+
+`update(cameras)` is cheap and thread-safe (ConfigManager listener): new or
+changed URLs are probed right away, removed cameras are dropped.
+"""
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import heapq
+import logging
+import random
+import re
+import ssl
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger("hotreload")
+
+DEFAULT_PORTS = {"rtsp": 554, "rtsps": 322, "http": 80, "https": 443, "rtmp": 1935, "rtmps": 443}
+SKIPPED = ("udp", "srt", "rtp", "file", "")
+_FPS = re.compile(rb"a=(?:x-)?framerate:\s*([0-9.]+)", re.I)
+_USER_AGENT = "frigate-hotreload-health"
+
+
+class ProbeError(Exception):
+    pass
+
+
+def _insecure_context() -> ssl.SSLContext:
+    # reachability only: cameras mostly serve self-signed certificates
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+class _Target:
+    __slots__ = ("key", "url", "scheme", "host", "port", "path", "user", "password", "generation",
+                 "reader", "writer", "cseq", "auth", "interval", "failures", "result")
+
+    def __init__(self, key: str, url: str, generation: int, min_interval: float) -> None:
+        parts = urlsplit(url)
+        self.key = key
+        self.url = url
+        self.scheme = parts.scheme.lower()
+        self.host = parts.hostname or ""
+        try:
+            self.port = parts.port or DEFAULT_PORTS.get(self.scheme, 0)
+        except ValueError:
+            self.port = 0
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += "?" + parts.query
+        self.user = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else ""
+        self.generation = generation
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.cseq = 0
+        self.auth: Optional[Tuple[str, Dict[str, str]]] = None   # last 401 challenge
+        self.interval = min_interval
+        self.failures = 0
+        self.result: Dict[str, Any] = {"status": "pending", "url": _redact(url)}
+
+    @property
+    def request_uri(self) -> str:
+        # RTSP wants the absolute URI, without credentials
+        netloc = self.host if ":" not in self.host else f"[{self.host}]"
+        if self.port and self.port != DEFAULT_PORTS.get(self.scheme):
+            netloc += f":{self.port}"
+        return f"{self.scheme}://{netloc}{self.path}"
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def _redact(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    return url.replace(f"{parts.username}:{parts.password}@", f"{parts.username}:***@", 1)
+
+
+def _challenge(headers: Mapping[str, str]) -> Optional[Tuple[str, Dict[str, str]]]:
+    raw = headers.get("www-authenticate", "")
+    scheme, _, rest = raw.partition(" ")
+    if not scheme:
+        return None
+    return scheme.lower(), dict(re.findall(r'(\w+)="?([^",]*)"?', rest))
+
+
+def _authorization(t: _Target, method: str, uri: str) -> Optional[str]:
+    if t.auth is None or t.user is None:
+        return None
+    scheme, params = t.auth
+    if scheme == "basic":
+        return "Basic " + base64.b64encode(f"{t.user}:{t.password}".encode()).decode()
+    if scheme == "digest":
+        realm, nonce = params.get("realm", ""), params.get("nonce", "")
+        ha1 = hashlib.md5(f"{t.user}:{realm}:{t.password}".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+        response = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
+        return (f'Digest username="{t.user}", realm="{realm}", nonce="{nonce}", '
+                f'uri="{uri}", response="{response}"')
+    return None
+
+
+class HealthProber:
+    def __init__(self, on_change: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 concurrency: int = 64, per_host: int = 4, timeout: float = 3.0,
+                 min_interval: float = 10.0, max_interval: float = 300.0) -> None:
+        self.on_change = on_change
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.stats = {"probes": 0, "failures": 0, "connects": 0, "reused": 0}
+        self._targets: Dict[str, _Target] = {}   # loop thread only
+        self._results: Dict[str, Dict[str, Any]] = {}   # replaced per result, read from any thread
+        self._heap: List[Tuple[float, int, str, int]] = []   # (due, seq, key, generation)
+        self._seq = 0
+        self._generation = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._scheduler: Optional[asyncio.Task] = None
+        self._tls = _insecure_context()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def update(self, cameras: Mapping[str, Any]) -> None:
+        """Probe these cameras from now on ({key: camera config}); any thread."""
+        urls = {}
+        for key, cam in (cameras or {}).items():
+            if isinstance(cam, Mapping):
+                enabled, url = cam.get("enabled", True), (cam.get("ffmpeg") or {}).get("url")
+            else:
+                enabled, url = getattr(cam, "enabled", True), getattr(getattr(cam, "ffmpeg", None), "url", None)
+            if enabled and url:
+                urls[key] = url
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._sync, urls)
+
+    def listener(self, old: Any, new: Any) -> None:
+        """ConfigManager listener: hand the new snapshot's cameras to the loop."""
+        self.update(new.data.get("cameras") or {})
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._results)
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for r in list(self._results.values()):
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return counts
+
+    def probe_now(self, keys: Optional[Iterable[str]] = None, wait: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Probe `keys` (all cameras by default) right away; with `wait`, return
+        their results once done."""
+        loop = self._ensure_loop()
+        fut = asyncio.run_coroutine_threadsafe(self._probe_now(None if keys is None else list(keys)), loop)
+        if not wait:
+            return {}
+        return fut.result(self.timeout * 4 + 5)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(5)
+        except Exception:
+            logger.exception("health prober shutdown failed")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout=5)
+        loop.close()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(target=self._serve, args=(loop, ready), name="health-prober", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _serve(self, loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        self._wake = asyncio.Event()
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._scheduler = loop.create_task(self._schedule())
+        ready.set()
+        loop.run_forever()
+
+    def _sync(self, urls: Dict[str, str]) -> None:
+        for key in [k for k in self._targets if urls.get(k) != self._targets[k].url]:
+            self._drop(key)
+        for key, url in urls.items():
+            if key not in self._targets:
+                self._generation += 1
+                t = self._targets[key] = _Target(key, url, self._generation, self.min_interval)
+                self._results[key] = t.result
+                self._push(t, 0.0)
+        self._wake.set()
+
+    def _drop(self, key: str) -> None:
+        t = self._targets.pop(key)
+        task = self._inflight.pop(key, None)
+        if task is not None:
+            task.cancel()
+        t.close()
+        self._results.pop(key, None)
+
+    def _push(self, t: _Target, delay: float) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, t.key, t.generation))
+
+    async def _schedule(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key, generation = heapq.heappop(self._heap)
+                t = self._targets.get(key)
+                if t is None or t.generation != generation or key in self._inflight:
+                    continue
+                self._start(t)
+            self._wake.clear()
+            delay = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start(self, t: _Target) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._probe(t))
+        self._inflight[t.key] = task
+
+        def done(_: asyncio.Task) -> None:
+            if self._inflight.get(t.key) is task:
+                del self._inflight[t.key]
+
+        task.add_done_callback(done)
+        return task
+
+    async def _probe_now(self, keys: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        keys = [k for k in (self._targets if keys is None else keys) if k in self._targets]
+        tasks = [self._inflight.get(k) or self._start(self._targets[k]) for k in keys]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {k: self._results[k] for k in keys if k in self._results}
+
+    async def _probe(self, t: _Target) -> None:
+        host_sem = self._hosts.get(t.host)
+        if host_sem is None:
+            host_sem = self._hosts[t.host] = asyncio.Semaphore(self.per_host)
+        result: Dict[str, Any] = {"url": _redact(t.url), "checked_at": time.time()}
+        if t.scheme in SKIPPED or not t.host or not t.port:
+            result.update(status="skipped", error=f"cannot probe {t.scheme or 'path'} inputs")
+            return self._finish(t, result, None)
+        async with host_sem, self._sem:
+            t0 = time.perf_counter()
+            try:
+                result.update(await asyncio.wait_for(self._check(t), self.timeout))
+                result["status"] = "up"
+            except asyncio.CancelledError:
+                t.close()
+                raise
+            except (OSError, asyncio.TimeoutError, ProbeError, ValueError) as e:
+                t.close()
+                result.update(status="down", error=str(e) or type(e).__name__)
+            result["probe_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        self._finish(t, result, result["status"] == "up")
+
+    def _finish(self, t: _Target, result: Dict[str, Any], healthy: Optional[bool]) -> None:
+        if self._targets.get(t.key) is not t:
+            return   # dropped or replaced while probing
+        self.stats["probes"] += 1
+        if healthy is False:
+            self.stats["failures"] += 1
+            t.failures += 1
+            t.interval = self.min_interval
+        elif healthy:
+            t.failures = 0
+            t.interval = min(t.interval * 2, self.max_interval) if t.result.get("status") == "up" else self.min_interval
+        else:
+            t.interval = self.max_interval
+        result["failures"] = t.failures
+        result["interval"] = t.interval
+        changed = result["status"] != t.result.get("status")
+        result["since"] = result["checked_at"] if changed else t.result.get("since", result["checked_at"])
+        t.result = self._results[t.key] = result
+        self._push(t, t.interval * random.uniform(0.9, 1.1))
+        if changed and self.on_change is not None:
+            try:
+                self.on_change(t.key, result)
+            except Exception:
+                logger.debug("health on_change failed", exc_info=True)
+
+    async def _check(self, t: _Target) -> Dict[str, Any]:
+        if t.scheme in ("rtsp", "rtsps"):
+            return await self._check_rtsp(t)
+        if t.scheme in ("http", "https"):
+            code, _, _, out = await self._request(t, "HEAD", t.path, "HTTP/1.1")
+            if code >= 400:
+                raise ProbeError(f"HTTP {code}")
+            return out
+        t0 = time.perf_counter()
+        _, writer = await asyncio.open_connection(t.host, t.port)
+        writer.close()
+        self.stats["connects"] += 1
+        return {"latency_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
+    async def _check_rtsp(self, t: _Target) -> Dict[str, Any]:
+        code, _, _, out = await self._request(t, "OPTIONS", t.request_uri, "RTSP/1.0")
+        if code >= 400:
+            raise ProbeError(f"RTSP OPTIONS {code}")
+        fps = None
+        code, headers, body, _ = await self._request(t, "DESCRIBE", t.request_uri, "RTSP/1.0", {"Accept": "application/sdp"})
+        if code >= 400:
+            raise ProbeError(f"RTSP DESCRIBE {code}")
+        m = _FPS.search(body)
+        if m:
+            fps = float(m.group(1))
+        out["fps"] = fps
+        return out
+
+    async def _request(self, t: _Target, method: str, uri: str, proto: str,
+                       extra: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes, Dict[str, Any]]:
+        """One request on the target's connection (opened or reused). A reused
+        connection that turns out dead is reopened once; a 401 is retried once
+        with credentials from the URL."""
+        out: Dict[str, Any] = {}
+        for attempt in range(3):
+            reused = t.writer is not None and not t.writer.is_closing()
+            if not reused:
+                t0 = time.perf_counter()
+                tls = self._tls if t.scheme in ("rtsps", "https") else None
+                t.reader, t.writer = await asyncio.open_connection(t.host, t.port, ssl=tls)
+                out["connect_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+                self.stats["connects"] += 1
+            else:
+                self.stats["reused"] += 1
+            out["reused"] = reused
+            t.cseq += 1
+            lines = [f"{method} {uri} {proto}", f"User-Agent: {_USER_AGENT}"]
+            lines.append(f"CSeq: {t.cseq}" if proto.startswith("RTSP") else f"Host: {t.host}")
+            auth = _authorization(t, method, uri)
+            if auth:
+                lines.append(f"Authorization: {auth}")
+            lines += [f"{k}: {v}" for k, v in (extra or {}).items()]
+            t0 = time.perf_counter()
+            try:
+                t.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+                await t.writer.drain()
+                code, headers, body = await self._response(t, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                t.close()
+                if reused:
+                    continue
+                raise
+            out["latency_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            if headers.get("connection", "").lower() == "close":
+                t.close()
+            if code == 401 and t.user is not None and attempt < 2 and not (auth and t.auth == _challenge(headers)):
+                t.auth = _challenge(headers)
+                continue
+            return code, headers, body, out
+        raise ProbeError(f"{method} failed")
+
+    @staticmethod
+    async def _response(t: _Target, method: str) -> Tuple[int, Dict[str, str], bytes]:
+        assert t.reader is not None
+        status = (await t.reader.readuntil(b"\r\n")).decode("latin-1").split(" ", 2)
+        if len(status) < 2 or not status[0].startswith(("RTSP/", "HTTP/")):
+            raise ProbeError(f"not an RTSP/HTTP response: {' '.join(status)[:40]!r}")
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await t.reader.readuntil(b"\r\n")).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        body = await t.reader.readexactly(length) if length and method != "HEAD" else b""
+        return int(status[1]), headers, body
+
+    async def _shutdown(self) -> None:
+        tasks = list(self._inflight.values()) + [self._scheduler]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for t in self._targets.values():
+            t.close()
@@ -1,16 +1,20 @@
 from __future__ import annotations
-import asyncio
+import atexit
+import functools
 import json
+import os
+import threading
 import traceback
 import logging
+import multiprocessing
 from pathlib import Path
+from collections import OrderedDict
 from typing import Optional, List, Any, Dict
-from types import SimpleNamespace
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request, Body, Header, Depends
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import secrets
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
@@ -18,33 +22,19 @@ from starlette.requests import Request
 import secrets
 
 from .config_manager import ConfigManager
-
-# Try to import a Pydantic model for the config if it exists
-try:
-    from .config_schema import Config as ConfigModel  # type: ignore
-except Exception:
-    ConfigModel = None  # type: ignore
-
-# -----------------------------------------------------------------------------
-# Helpers
-# -----------------------------------------------------------------------------
-def _to_attr(obj: Any) -> Any:
-    """Recursively convert dict/list into objects with attribute access (dot-access)."""
-    if isinstance(obj, dict):
-        return SimpleNamespace(**{k: _to_attr(v) for k, v in obj.items()})
-    if isinstance(obj, list):
-        return [_to_attr(x) for x in obj]
-    return obj
-
-
-def _as_model_or_attr(raw_cfg: dict) -> Any:
-    """Prefer a Pydantic model if available; otherwise return a dot-access object."""
-    if ConfigModel is not None:
-        try:
-            return ConfigModel(**raw_cfg)
-        except Exception:
-            pass
-    return _to_attr(raw_cfg)
+from .storage import atomic_write
+from .diff import diff_configs as _diff_configs, escape_token, split_pointer
+from .bulk import BulkError, apply_patch, compile_patch, select_cameras
+from .validation import ConfigValidator
+from .events import EventLog, WSBus
+from .health import HealthProber
+from .metrics import REGISTRY, Counter, GaugeFunc, MetricsMiddleware, timed
+from .retention import RetentionEngine, SegmentCatalog
+from .workers.reconciler import Reconciler
+from .workers.runtime import WorkerRuntime
+from .workers.shards import ShardSupervisor
+from .patch import PatchError, PatchTestFailed, json_patch, merge_patch, touched_cameras, touched_cameras_merge, ALL
+from .pipeline import ApplyPipeline, ApplyQueue, Conflict, InvalidConfig, next_config as _next_config
 
 # -----------------------------------------------------------------------------
 # Init
@@ -81,7 +71,7 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
 
 
 BASE_DIR = Path(__file__).parent
-DATA_DIR = BASE_DIR.parent / "data"
+DATA_DIR = Path(os.environ.get("HOTRELOAD_DATA_DIR") or BASE_DIR.parent / "data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 # -----------------------------------------------------------------------------
@@ -92,6 +82,8 @@ import time
 TOKEN_FILE = DATA_DIR / "auth_token.txt"
 TOKEN_TTL_SECONDS = 7 * 24 * 3600  # 7 days
 TOKEN_RENEW_THRESHOLD = 5 * 60      # auto-extend when <5 minutes remain
+TOKEN_RECHECK_SECONDS = 1.0         # how often the cache stats the token file
+TOKEN_FLUSH_DELAY = 1.0             # sliding-expiry renewals are written this long after the first one
 
 def _now() -> int:
     return int(time.time())
@@ -119,7 +111,8 @@ def _save_token_record(token: str, expires: int | None = None) -> None:
     payload = {"token": token}
     if expires:
         payload["expires"] = int(expires)
-    TOKEN_FILE.write_text(json.dumps(payload))
+    atomic_write(TOKEN_FILE, json.dumps(payload).encode())
+    token_cache.invalidate()
 
 # Back-compat helpers used elsewhere in code
 
@@ -131,6 +124,78 @@ def _save_token(token: str) -> None:
     _save_token_record(token, _now() + TOKEN_TTL_SECONDS)
 
 
+class TokenCache:
+    """In-memory copy of the token record for the auth middleware.
+
+    The file is re-read only when its (inode, mtime, size) changes, and that is
+    checked at most every TOKEN_RECHECK_SECONDS. The /api/auth/* endpoints
+    invalidate it directly. Sliding-expiry renewals update the cached record at
+    once and are written to disk by a timer thread, batched over TOKEN_FLUSH_DELAY.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rec: dict | None = None
+        self._sig: tuple | None = None
+        self._checked = 0.0
+        self._loaded = False
+        self._flush_timer: threading.Timer | None = None
+
+    def _stat_sig(self) -> tuple | None:
+        try:
+            st = TOKEN_FILE.stat()
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self) -> dict | None:
+        now = time.monotonic()
+        if self._loaded and now - self._checked < TOKEN_RECHECK_SECONDS:
+            return self._rec
+        with self._lock:
+            sig = self._stat_sig()
+            if not self._loaded or sig != self._sig:
+                self._rec = _load_token_record()
+                self._sig = sig
+                self._loaded = True
+            self._checked = now
+            return self._rec
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+    def renew(self, expires: int) -> None:
+        """Extend the cached expiry now; persist it shortly, off the request path."""
+        with self._lock:
+            if not self._rec:
+                return
+            self._rec = {**self._rec, "expires": int(expires)}
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(TOKEN_FLUSH_DELAY, self._flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._flush_timer = None
+            rec = self._rec
+            # the file changed under us (generate/disable): it wins over our renewal
+            if not rec or self._stat_sig() != self._sig:
+                return
+            try:
+                payload = {"token": rec["token"]}
+                if rec.get("expires"):
+                    payload["expires"] = int(rec["expires"])
+                atomic_write(TOKEN_FILE, json.dumps(payload).encode())
+                self._sig = self._stat_sig()
+            except Exception:
+                logger.warning("token renewal could not be persisted", exc_info=True)
+
+
+token_cache = TokenCache()
+
+
 manager = ConfigManager(DATA_DIR)
 
 # -----------------------------------------------------------------------------
@@ -186,72 +251,78 @@ if not hasattr(manager, "get_running_config"):
     manager.get_running_config = _mgr_get_running  # type: ignore
 
 
-# Provide a generic "apply_config" adapter based on what the manager exposes
-import inspect
-if not hasattr(manager, "apply_config"):
-    if hasattr(manager, "apply") and callable(getattr(manager, "apply")):
-        sig = inspect.signature(manager.apply)
-        if "workers" in sig.parameters:
-            def _apply_cfg(cfg: dict):
-                payload = _as_model_or_attr(cfg)
-                return manager.apply(payload, workers={})
-        else:
-            def _apply_cfg(cfg: dict):
-                payload = _as_model_or_attr(cfg)
-                return manager.apply(payload)
-        manager.apply_config = _apply_cfg  # type: ignore
-    elif hasattr(manager, "set_config") and callable(getattr(manager, "set_config")):
-        def _apply_cfg(cfg: dict):
-            payload = _as_model_or_attr(cfg)
-            return manager.set_config(payload)  # type: ignore
-        manager.apply_config = _apply_cfg  # type: ignore
-    else:
-        def _apply_fallback(cfg: dict) -> dict:
-            path = DATA_DIR / "config.json"
-            path.write_text(json.dumps(cfg, indent=2))
-            return {"saved_to": str(path)}
-        manager.apply_config = _apply_fallback  # type: ignore
-
-
 if not hasattr(manager, "diff_configs"):
     def _diff_fallback(a: dict, b: dict) -> dict:
-        return {"before": a, "after": b}
+        return _diff_configs(a, b)
     manager.diff_configs = _diff_fallback  # type: ignore
 
 # -----------------------------------------------------------------------------
 # WebSocket Bus
 # -----------------------------------------------------------------------------
-class WSBus:
-    def __init__(self) -> None:
-        self._clients: set[WebSocket] = set()
+bus = WSBus()
+event_log = EventLog(size=int(os.environ.get("HOTRELOAD_EVENT_RING") or 256))
+if hasattr(manager, "add_listener"):
+    manager.add_listener(event_log.record)
 
-    async def connect(self, ws: WebSocket) -> None:
-        await ws.accept()
-        self._clients.add(ws)
+# -----------------------------------------------------------------------------
+# Camera workers: reconciled against every committed version
+# -----------------------------------------------------------------------------
+# HOTRELOAD_SHARDS=N|auto runs them in N worker processes instead of this one.
+# Not in child processes: a spawned shard re-imports the parent's __main__.
+WORKERS = (os.environ.get("HOTRELOAD_WORKERS", "1") != "0" and hasattr(manager, "add_listener")
+           and multiprocessing.parent_process() is None)
+SHARDS = os.environ.get("HOTRELOAD_SHARDS", "0")
+worker_runtime = WorkerRuntime()
+if WORKERS and SHARDS != "0":
+    reconciler: Any = ShardSupervisor(0 if SHARDS == "auto" else int(SHARDS))
+else:
+    reconciler = Reconciler(factory=worker_runtime.worker)
+if WORKERS:
+    manager.add_listener(reconciler.submit)
+    reconciler.submit(None, manager.snapshot)
+    atexit.register(worker_runtime.close)   # atexit is LIFO: workers stop first, then the loop
+    atexit.register(reconciler.close)
 
-    def disconnect(self, ws: WebSocket) -> None:
-        self._clients.discard(ws)
+# -----------------------------------------------------------------------------
+# Recording retention: catalog in data/recordings.db, policies from the running config
+# -----------------------------------------------------------------------------
+# HOTRELOAD_RETENTION_INTERVAL=seconds between cycles (0 = only POST /api/retention/run).
+RECORDINGS_DIR = Path(os.environ.get("HOTRELOAD_RECORDINGS_DIR") or DATA_DIR / "recordings")
 
-    async def broadcast(self, message: dict | str) -> None:
-        payload = json.dumps(message) if not isinstance(message, str) else message
-        dead: List[WebSocket] = []
-        for ws in list(self._clients):
-            try:
-                await ws.send_text(payload)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect(ws)
 
+def _retention_policies() -> Dict[str, Any]:
+    cams = manager.get_running_config().get("cameras") or {}
+    return {key: cam.get("retention") for key, cam in cams.items() if isinstance(cam, dict)}
 
-bus = WSBus()
+
+retention = RetentionEngine(SegmentCatalog(DATA_DIR / "recordings.db"), _retention_policies, root=RECORDINGS_DIR)
+RETENTION_INTERVAL = float(os.environ.get("HOTRELOAD_RETENTION_INTERVAL") or 600)
+if RETENTION_INTERVAL > 0 and multiprocessing.parent_process() is None:
+    retention.start(RETENTION_INTERVAL)
+    atexit.register(retention.stop)
+
+# -----------------------------------------------------------------------------
+# Camera health: every ffmpeg.url probed concurrently, changes streamed over /ws
+# -----------------------------------------------------------------------------
+# HOTRELOAD_HEALTH=0 disables the prober; HOTRELOAD_HEALTH_CONCURRENCY / _PER_HOST bound it.
+health = HealthProber(
+    on_change=lambda key, result: _ws_event("camera_health", key=key, **result),
+    concurrency=int(os.environ.get("HOTRELOAD_HEALTH_CONCURRENCY") or 64),
+    per_host=int(os.environ.get("HOTRELOAD_HEALTH_PER_HOST") or 4),
+)
+HEALTH = (os.environ.get("HOTRELOAD_HEALTH", "1") != "0" and hasattr(manager, "add_listener")
+          and multiprocessing.parent_process() is None)
+if HEALTH:
+    manager.add_listener(health.listener)
+    health.listener(None, manager.snapshot)
+    atexit.register(health.close)
 
 # -----------------------------------------------------------------------------
 # Auth endpoints (token lifecycle)
 # -----------------------------------------------------------------------------
 @app.get("/api/auth/status")
 def auth_status() -> dict:
-    rec = _load_token_record()
+    rec = token_cache.get()
     if not rec:
         return {"enabled": False, "have_token": False, "seconds_left": None, "expires_at": None}
     exp = rec.get("expires")
@@ -273,77 +344,69 @@ def auth_disable() -> dict:
     try:
         if TOKEN_FILE.exists():
             TOKEN_FILE.unlink()
+        token_cache.invalidate()
         return {"ok": True, "disabled": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # -----------------------------------------------------------------------------
-# Centralized apply with rich error reporting
+# Centralized apply with rich error reporting (stages: pipeline.py)
 # -----------------------------------------------------------------------------
 logger = logging.getLogger("hotreload")
 logging.basicConfig(level=logging.INFO)
 
 
-def _candidate_payloads(raw_cfg: dict) -> list[Any]:
-    """Return payload variants to try: dict, Pydantic model (if present), and attr-object."""
-    variants: list[Any] = [raw_cfg]
-    if ConfigModel is not None:
-        try:
-            model = ConfigModel(**raw_cfg)
-            variants.append(model)
-        except Exception:
-            pass
-    variants.append(_to_attr(raw_cfg))
-    return variants
-
-
-def _apply_config_safe(new_cfg: dict):
-    """Attempt various manager function signatures and payload types (dict/model/attr)."""
-    tried: list[str] = []
-    payloads = _candidate_payloads(new_cfg)
-
-    for fn_name in ("apply_config", "apply"):
-        fn = getattr(manager, fn_name, None)
-        if not callable(fn):
-            continue
-        for payload in payloads:
-            try:
-                return fn(payload)
-            except Exception as e:
-                tried.append(f"{fn_name}({type(payload).__name__}) -> {e}")
-            try:
-                return fn(payload, workers={})
-            except Exception as e2:
-                tried.append(f"{fn_name}({type(payload).__name__}, workers={{}}) -> {e2}")
-
-    # Last resort: write to disk
-    path = DATA_DIR / "config.json"
-    path.write_text(json.dumps(new_cfg, indent=2))
-    return {"saved_to": str(path), "note": "fallback_apply", "tried": tried}
-
-
-async def _ws_event(event: str, **payload):
+def _ws_event(event: str, version: Optional[int] = None, **payload) -> None:
+    """Send a versioned delta event (or a plain one if the version is unknown)."""
     try:
-        await bus.broadcast({"event": event, **payload})
+        message = event_log.publish(version, event, payload) if version is not None else None
+        bus.publish(message or {"event": event, **payload})
     except Exception:
         logger.debug("WS broadcast failed", exc_info=True)
 
 
-def _apply_with_errors(new_cfg: dict, ws_event: str | None = None, ws_payload: dict | None = None):
+def _apply_with_errors(change, ws_event: str | None = None, ws_payload: Any = None, durable: bool = False,
+                       skip=None, extra=None, base_version: Optional[int] = None) -> JSONResponse:
+    """Queue `change(work) -> summary` for the running config (see pipeline.py).
+    Errors raised by the change keep their status, validation errors are a
+    400, a stale `base_version` a 409, anything failing after that a JSON
+    500. `extra(summary)` adds fields to the response."""
     try:
-        result = _apply_config_safe(new_cfg)
-        if ws_event:
-            try:
-                loop = asyncio.get_event_loop()
-                loop.create_task(_ws_event(ws_event, **(ws_payload or {})))
-            except RuntimeError:
-                pass
-        return JSONResponse({"ok": True, "applied": True, "result": result})
+        res, out = applier.submit(change, event=ws_event, payload=ws_payload, durable=durable, skip=skip,
+                                  base_version=base_version)
+    except InvalidConfig as e:
+        raise HTTPException(status_code=400, detail={"errors": e.errors})
+    except Conflict as e:
+        raise HTTPException(status_code=409, detail={"conflict": e.detail})
+    except HTTPException:
+        raise
     except Exception as e:
         err = {"error": str(e), "type": e.__class__.__name__, "trace": traceback.format_exc()}
         logger.error("apply failed: %s", err["error"])
         return JSONResponse({"ok": False, "applied": False, "error": err}, status_code=500)
+    if out is None:
+        return _ok(applied=False, **res)
+    return JSONResponse({"ok": True, "applied": True, **out, **(extra(res) if extra else {})})
+
+
+def _preview(change, extra=None) -> JSONResponse:
+    """Dry run of `change` on the running config: diff plus validation `errors`
+    (an invalid config is previewed too, not rejected)."""
+    cfg = manager.get_running_config()
+    new_cfg = _next_config(cfg)
+    res = change(new_cfg)
+    out = pipeline.preview(new_cfg, cfg)
+    return _ok(dry=True, **out, **(extra(res) if extra else {}))
+
+
+def _replace_with(cfg: dict):
+    """Change that swaps in a whole config (apply, import)."""
+    def change(work: dict) -> dict:
+        work.clear()
+        work.update(cfg)
+        return {}
+    return change
 
 
 # -----------------------------------------------------------------------------
@@ -354,43 +417,175 @@ class CameraCloneReq(BaseModel):
     target_key: str
     overwrite: bool = False
     apply: bool = True
+    base_version: Optional[int] = None   # conditional write, see _write_base / _base
 
 
 class CameraDeleteReq(BaseModel):
     key: str
     apply: bool = True
+    base_version: Optional[int] = None
 
 
 class CameraBulkDeleteReq(BaseModel):
     keys: List[str]
     apply: bool = True
+    base_version: Optional[int] = None
 
 
 class CameraReorderReq(BaseModel):
     order: List[str]
     apply: bool = True
+    base_version: Optional[int] = None
 
 
 class CameraSetReq(BaseModel):
     key: str
     value: Dict[str, Any]
     apply: bool = True
+    base_version: Optional[int] = None
+
+
+class BulkSelector(BaseModel):
+    keys: List[str] = []
+    ranges: List[str] = []          # e.g. "cam1..cam200"
+    where: Optional[str] = None     # e.g. "ffmpeg.fps < 10 and enabled == true"
+    all: bool = False
+
+
+class BulkEditReq(BaseModel):
+    select: BulkSelector
+    set: Dict[str, Any] = {}        # dotted field path -> value
+    unset: List[str] = []           # dotted field paths to remove
+    apply: bool = True
+    base_version: Optional[int] = None
+
+
+class TransactionReq(BaseModel):
+    ops: List[Dict[str, Any]]       # [{"op": "clone"|"delete"|..., <fields of that request>}]
+    apply: bool = True
+    base_version: Optional[int] = None
 
 
 # -----------------------------------------------------------------------------
 # Basic helpers
 # -----------------------------------------------------------------------------
-def _deepcopy(obj: Any) -> Any:
-    return json.loads(json.dumps(obj))
+def _ok(**kw) -> JSONResponse:
+    return JSONResponse({"ok": True, **kw})
 
 
-def _ensure_cameras(cfg: dict) -> dict:
-    cfg.setdefault("cameras", {})
-    return cfg
+GZIP_MIN_BYTES = 1024
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison as used for If-None-Match (RFC 9110 13.1.2)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _accepts_gzip(header: str) -> bool:
+    """Accept-Encoding allows gzip with q > 0 (named, or via `*`; RFC 9110 12.5.3)."""
+    star = None
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            star = q > 0
+    return bool(star)
+
+
+def _snapshot_response(request: Request, snap: Any, export: bool = False) -> Response:
+    """Serve a config snapshot from its per-version byte cache, honouring
+    If-None-Match (304) and Accept-Encoding: gzip."""
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding", "X-Config-Version": str(snap.version)}
+    if export:
+        body, variant = snap.pretty_body, "export"
+        headers["Content-Disposition"] = 'attachment; filename="config.json"'
+    else:
+        body, variant = snap.body, ""
+        if len(body) >= GZIP_MIN_BYTES and _accepts_gzip(request.headers.get("accept-encoding", "")):
+            body, variant = snap.gzip_body, "gz"
+            headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = snap.etag(variant)
+    _remember_etag(snap)
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Content hash -> newest version served with it, so an ETag from GET /api/config
+# can be sent back as If-Match on a write.
+_ETAG_VERSIONS: "OrderedDict[str, int]" = OrderedDict()
+_ETAG_VERSIONS_MAX = 256
+_etag_lock = threading.Lock()
+
+
+def _remember_etag(snap: Any) -> None:
+    with _etag_lock:
+        if _ETAG_VERSIONS.get(snap.content_hash, 0) < snap.version:
+            _ETAG_VERSIONS[snap.content_hash] = snap.version
+        _ETAG_VERSIONS.move_to_end(snap.content_hash)
+        while len(_ETAG_VERSIONS) > _ETAG_VERSIONS_MAX:
+            _ETAG_VERSIONS.popitem(last=False)
+
+
+def _if_match_version(header: str) -> Optional[int]:
+    """Config version named by an If-Match header: an ETag of GET
+    /api/config (any variant) or a bare version number. None for `*`.
+    Several tags: the newest version. An unknown tag is a 412."""
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.isdigit():
+            versions.append(int(tag))
+            continue
+        with _etag_lock:
+            version = _ETAG_VERSIONS.get(tag.rsplit("-", 1)[0] if tag.endswith(("-gz", "-export")) else tag)
+        if version is not None:
+            versions.append(version)
+    if not versions:
+        raise HTTPException(status_code=412, detail="If-Match names no known config version (GET /api/config again)")
+    return max(versions)
 
 
-def _ok(**kw) -> JSONResponse:
-    return JSONResponse({"ok": True, **kw})
+def _write_base(
+    if_match: Optional[str] = Header(None, description="ETag of GET /api/config, or a config version"),
+    base_version: Optional[int] = Query(None, ge=0, description="Config version the change was made against"),
+) -> Optional[int]:
+    """Base version of a conditional write (If-Match, or ?base_version=), or
+    None for an unconditional one. A `base_version` field in the request body
+    takes precedence over both (_base)."""
+    if base_version is not None:
+        return base_version
+    return _if_match_version(if_match) if if_match else None
+
+
+def _base(req: Any, base: Optional[int]) -> Optional[int]:
+    return base if req.base_version is None else req.base_version
 
 
 # -----------------------------------------------------------------------------
@@ -419,82 +614,40 @@ app.mount("/ui", StaticFiles(directory=BASE_DIR / "static", html=True), name="ui
 # -----------------------------------------------------------------------------
 # Validation helpers
 # -----------------------------------------------------------------------------
-from typing import Tuple
-
-def _is_bool(x: Any) -> bool:
-    return isinstance(x, bool)
+validator = ConfigValidator()
 
-def _is_int(x: Any) -> bool:
-    return isinstance(x, int) and not isinstance(x, bool)
 
-
-def validate_config_full(cfg: dict) -> List[Dict[str, Any]]:
+def validate_config_full(cfg: dict, cameras: Optional[set] = None) -> List[Dict[str, Any]]:
     """Return a list of validation error objects. Empty list means OK.
-    Lightweight but catches common mistakes.
+    Lightweight but catches common mistakes; unchanged cameras are served from
+    the validator's memo (see validation.py).
+    `cameras` limits the per-camera checks to those keys (None = all).
     """
-    errors: List[Dict[str, Any]] = []
-    if not isinstance(cfg, dict):
-        return [{"path": [], "msg": "config must be an object"}]
-
-    # mqtt
-    mqtt = cfg.get("mqtt")
-    if not isinstance(mqtt, dict):
-        errors.append({"path": ["mqtt"], "msg": "mqtt must be an object"})
-    else:
-        host = mqtt.get("host")
-        port = mqtt.get("port")
-        if not isinstance(host, str) or not host:
-            errors.append({"path": ["mqtt", "host"], "msg": "host must be non-empty string"})
-        if not _is_int(port) or not (0 < port < 65536):
-            errors.append({"path": ["mqtt", "port"], "msg": "port must be integer in (0,65536)"})
-
-    # cameras
-    cams = cfg.get("cameras")
-    if cams is None:
-        errors.append({"path": ["cameras"], "msg": "cameras is required"})
-        return errors
-    if not isinstance(cams, dict):
-        errors.append({"path": ["cameras"], "msg": "cameras must be an object of key -> camera"})
-        return errors
-
-    for key, cam in cams.items():
-        if not isinstance(key, str) or not key:
-            errors.append({"path": ["cameras"], "msg": "camera key must be string"})
-            continue
-        if not isinstance(cam, dict):
-            errors.append({"path": ["cameras", key], "msg": "camera value must be an object"})
-            continue
-        # enabled (optional)
-        en = cam.get("enabled", True)
-        if not isinstance(en, bool):
-            errors.append({"path": ["cameras", key, "enabled"], "msg": "enabled must be boolean"})
-        # ffmpeg
-        ff = cam.get("ffmpeg", {})
-        if not isinstance(ff, dict):
-            errors.append({"path": ["cameras", key, "ffmpeg"], "msg": "ffmpeg must be an object"})
-        else:
-            url = ff.get("url")
-            if not isinstance(url, str) or not url:
-                errors.append({"path": ["cameras", key, "ffmpeg", "url"], "msg": "url must be non-empty string"})
-            w = ff.get("width")
-            h = ff.get("height")
-            fps = ff.get("fps")
-            if w is not None and not _is_int(w):
-                errors.append({"path": ["cameras", key, "ffmpeg", "width"], "msg": "width must be integer"})
-            if h is not None and not _is_int(h):
-                errors.append({"path": ["cameras", key, "ffmpeg", "height"], "msg": "height must be integer"})
-            if fps is not None and (not _is_int(fps) or not (1 <= fps <= 240)):
-                errors.append({"path": ["cameras", key, "ffmpeg", "fps"], "msg": "fps must be integer in [1,240]"})
+    return validator.validate(cfg, cameras)
 
-    return errors
+
+pipeline = ApplyPipeline(manager, validate=validate_config_full,
+                         notify=lambda event, version, payload: _ws_event(event, version, **payload))
+applier = ApplyQueue(pipeline)
+atexit.register(applier.close)
 
 
 # -----------------------------------------------------------------------------
 # Routes: config
 # -----------------------------------------------------------------------------
 @app.get("/api/config")
-def get_config() -> dict:
-    return manager.get_running_config()
+async def get_config(request: Request) -> Response:
+    return _snapshot_response(request, manager.snapshot)
+
+
+@app.get("/api/config/versions")
+def config_versions() -> dict:
+    """Version that last changed each camera and everything outside `cameras`:
+    what a conditional write (If-Match / base_version) is checked against."""
+    snap = manager.snapshot
+    cams = snap.data.get("cameras") or {}
+    return {"version": snap.version, "config": snap.rest_version,
+            "cameras": {k: snap.camera_versions.get(k, snap.version) for k in cams}}
 
 
 @app.post("/api/config/validate")
@@ -503,40 +656,120 @@ def validate_config(cfg: dict) -> dict:
         json.dumps(cfg)  # structural JSON check
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    errs = validate_config_full(cfg)
+    errs, warnings = validator.check(cfg)
     if errs:
-        raise HTTPException(status_code=400, detail={"errors": errs})
-    return {"ok": True}
+        raise HTTPException(status_code=400, detail={"errors": errs, "warnings": warnings})
+    return {"ok": True, "warnings": warnings}
 
 
 @app.post("/api/config/apply")
-def apply_config(cfg: dict, dry: bool = Query(False, description="Preview only")) -> JSONResponse:
-    current = manager.get_running_config()
-    new_cfg = _deepcopy(cfg)
+def apply_config(
+    cfg: dict,
+    dry: bool = Query(False, description="Preview only"),
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
     if dry:
-        diff = manager.diff_configs(current, new_cfg)
-        return _ok(dry=True, diff=diff)
+        return _preview(_replace_with(cfg))
     return _apply_with_errors(
-        new_cfg,
+        _replace_with(cfg),
         ws_event="applied",
-        ws_payload={"ts": (asyncio.get_event_loop().time() if asyncio.get_event_loop().is_running() else None)},
+        ws_payload={"ts": time.time()},
+        durable=durable,
+        base_version=base,
     )
 
 
+@app.get("/api/workers")
+def workers_status(wait: bool = Query(False, description="Wait until workers run the current version")) -> dict:
+    if wait:
+        reconciler.wait(getattr(manager, "version", 0))
+    return {
+        "workers": len(reconciler),
+        "version": reconciler.version,
+        "config_version": getattr(manager, "version", None),
+        "stats": dict(reconciler.stats),
+        "last": reconciler.last_report,
+        "shards": reconciler.shard_info() if hasattr(reconciler, "shard_info") else None,
+    }
+
+
+@app.post("/api/workers/shards")
+def workers_resize(count: int = Query(..., ge=1, le=256)) -> dict:
+    if not hasattr(reconciler, "resize"):
+        raise HTTPException(status_code=409, detail="workers run in-process; start with HOTRELOAD_SHARDS=N")
+    ok = reconciler.resize(count)
+    return {"ok": ok, "moved": reconciler.stats["moved"], "shards": reconciler.shard_info()}
+
+
+@app.get("/api/retention")
+def retention_status() -> dict:
+    return {
+        "interval": RETENTION_INTERVAL,
+        "segments": retention.catalog.counts(),
+        "last": retention.last_report,
+    }
+
+
+@app.post("/api/retention/run")
+def retention_run(dry: bool = Query(False, description="Report what would be deleted, delete nothing")) -> dict:
+    return retention.run_cycle(dry=dry)
+
+
+@app.get("/api/health/cameras")
+def health_cameras(refresh: bool = Query(False, description="Probe every camera now and wait for the results")) -> dict:
+    if refresh and HEALTH:
+        health.probe_now()
+    return {"enabled": HEALTH, "summary": health.summary(), "stats": dict(health.stats), "cameras": health.results()}
+
+
+def _worker_states() -> Dict[str, int]:
+    workers = getattr(reconciler, "workers", None)
+    if workers is None:   # ShardSupervisor: workers live in the shard processes
+        return {"running": len(reconciler)}
+    states = {"running": 0, "stopped": 0}
+    for w in list(workers.values()):
+        states["running" if getattr(w, "running", True) else "stopped"] += 1
+    return states
+
+
+for _gauge in (
+    GaugeFunc("hotreload_config_version", "Running config version.", lambda: getattr(manager, "version", 0)),
+    GaugeFunc("hotreload_config_bytes", "Size of the running config as served by GET /api/config.",
+              lambda: len(manager.snapshot.body)),
+    GaugeFunc("hotreload_cameras", "Cameras in the running config.",
+              lambda: len(manager.get_running_config().get("cameras") or {})),
+    GaugeFunc("hotreload_backups", "Versions in the backup store.", lambda: manager.backup_count),
+    GaugeFunc("hotreload_ws_clients", "Connected WebSocket clients.", lambda: len(bus)),
+    GaugeFunc("hotreload_workers", "Camera workers by state.", _worker_states, ("state",)),
+    GaugeFunc("hotreload_camera_health", "Cameras by health status.", health.summary, ("status",)),
+):
+    REGISTRY.register(_gauge)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus text exposition (scrape with the bearer token when auth is on)."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/api/config/backups")
-def list_backups() -> dict:
+def list_backups(limit: int = Query(100, ge=1, description="Newest N versions")) -> dict:
+    if hasattr(manager, "backup_entries"):
+        items = manager.backup_entries(limit)  # type: ignore
+        return {"backups": [e["id"] for e in items], "items": items}
     if hasattr(manager, "list_backups"):
         files = manager.list_backups()  # type: ignore
     else:
         bdir = DATA_DIR / "backups"
         files = sorted([p.name for p in bdir.glob("*.json")]) if bdir.exists() else []
-    return {"backups": files}
+    return {"backups": files[-limit:]}
 
 
 @app.post("/api/config/rollback")
 def rollback(name: Optional[str] = Query(None)) -> JSONResponse:
     if hasattr(manager, "rollback"):
-        ok = manager.rollback(name)  # type: ignore
+        ok = applier.exclusive(lambda: manager.rollback(name), "rolled_back", {"name": name or "latest"})  # type: ignore
     else:
         raise HTTPException(status_code=501, detail="rollback not implemented in manager")
     if ok:
@@ -547,7 +780,7 @@ def rollback(name: Optional[str] = Query(None)) -> JSONResponse:
 @app.post("/api/config/reset")
 def reset_to_disk() -> JSONResponse:
     if hasattr(manager, "reset_to_disk"):
-        ok = manager.reset_to_disk()  # type: ignore
+        ok = applier.exclusive(manager.reset_to_disk, "reset")  # type: ignore
     else:
         raise HTTPException(status_code=501, detail="reset not implemented in manager")
     if ok:
@@ -556,16 +789,16 @@ def reset_to_disk() -> JSONResponse:
 
 
 @app.get("/api/config/export")
-def export_cfg() -> FileResponse:
-    path = DATA_DIR / "config.json"
-    if not path.exists():
-        current = manager.get_running_config()
-        path.write_text(json.dumps(current, indent=2))
-    return FileResponse(path, media_type="application/json", filename="config.json")
+async def export_cfg(request: Request) -> Response:
+    return _snapshot_response(request, manager.snapshot, export=True)
 
 
 @app.post("/api/config/import")
-def import_cfg(cfg: dict) -> JSONResponse:
+def import_cfg(
+    cfg: dict,
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
     """Import and apply a full config payload with robust error reporting."""
     try:
         # 1) structural JSON check
@@ -574,14 +807,8 @@ def import_cfg(cfg: dict) -> JSONResponse:
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-        # 2) domain validation
-        errs = validate_config_full(cfg)
-        if errs:
-            raise HTTPException(status_code=400, detail={"errors": errs})
-
-        # 3) deepcopy and apply via centralized path
-        new_cfg = _deepcopy(cfg)
-        return _apply_with_errors(new_cfg, ws_event="imported")
+        # 2) validate and apply via the pipeline (the body is already a private copy)
+        return _apply_with_errors(_replace_with(cfg), ws_event="imported", durable=durable, base_version=base)
 
     except HTTPException:
         # Let FastAPI handle 4xx as-is
@@ -594,139 +821,334 @@ def import_cfg(cfg: dict) -> JSONResponse:
 
 
 # -----------------------------------------------------------------------------
-# NEW: Camera management API
+# Partial updates: JSON Merge Patch (RFC 7396) / JSON Patch (RFC 6902)
 # -----------------------------------------------------------------------------
-@app.post("/api/cameras/clone")
-def api_cam_clone(req: CameraCloneReq) -> JSONResponse:
-    cfg = manager.get_running_config()
-    cams = _ensure_cameras(cfg)["cameras"]
+def _error_path(pointer: str) -> list:
+    try:
+        return split_pointer(pointer)
+    except ValueError:
+        return [pointer]
+
+
+def _prefix_ops(ops: Any, base: str) -> list:
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        raise PatchError("JSON Patch must be an array of operations")
+    out = []
+    for op in ops:
+        op = dict(op)
+        for field in ("path", "from"):
+            if isinstance(op.get(field), str):
+                op[field] = base + op[field]
+        out.append(op)
+    return out
+
+
+def _patch_and_apply(request: Request, body: Any, camera_key: Optional[str], dry: bool, durable: bool,
+                     base_version: Optional[int] = None) -> JSONResponse:
+    """Patch the running config (or one camera), then preview or apply it.
+    The patch is applied inside the apply queue, so `test` ops (and the
+    camera's existence) are checked against the config it actually lands on."""
+    ctype = request.headers.get("content-type", "")
+    as_json_patch = "json-patch" in ctype or ("merge-patch" not in ctype and isinstance(body, list))
+
+    def change(work: dict) -> dict:
+        # checked here, not at request time: a merge patch on a camera deleted
+        # in between would otherwise re-create it
+        if camera_key is not None and camera_key not in work.get("cameras", {}):
+            raise HTTPException(status_code=404, detail=f"key '{camera_key}' not found")
+        try:
+            if as_json_patch:
+                ops = body if camera_key is None else _prefix_ops(body, "/cameras/" + escape_token(camera_key))
+                new_cfg = json_patch(work, ops)
+                scope = touched_cameras(ops)
+            else:
+                patch = body if camera_key is None else {"cameras": {camera_key: body}}
+                new_cfg = merge_patch(work, patch)
+                scope = touched_cameras_merge(patch)
+        except PatchTestFailed as e:
+            raise HTTPException(status_code=409, detail={"errors": [{"path": _error_path(e.path), "msg": e.msg}]})
+        except PatchError as e:
+            raise HTTPException(status_code=400, detail={"errors": [{"path": _error_path(e.path), "msg": e.msg}]})
+        keys = None if scope is ALL else sorted(k for k in scope if k in new_cfg.get("cameras", {}) or k in work.get("cameras", {}))
+        work.clear()
+        work.update(new_cfg)
+        return {"keys": keys}
+
+    if dry:
+        return _preview(change, lambda res: {"cameras": res["keys"]})
+    return _apply_with_errors(
+        change,
+        ws_event="cam_patched" if camera_key is not None else "config_patched",
+        durable=durable,
+        base_version=base_version,
+    )
+
+
+@app.post("/api/config/bulk_edit")
+def bulk_edit(
+    req: BulkEditReq,
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
+    """Apply the same field patch to every selected camera as one version:
+    one diff, one backup, one event."""
+    change = functools.partial(_op_bulk_edit, req=req, strict=req.apply)
+
+    if not req.apply:
+        return _preview(change, lambda res: res)
+
+    return _apply_with_errors(
+        change,
+        ws_event="cams_bulk_edited",
+        ws_payload=lambda res: {"keys": res["changed"]},
+        durable=durable,
+        skip=lambda res: not res["changed"],
+        extra=lambda res: {"selected": res["selected"], "changed": res["changed"]},
+        base_version=_base(req, base),
+    )
+
+
+@app.patch("/api/config")
+def patch_config(
+    request: Request,
+    body: Any = Body(..., description="Merge patch object or JSON Patch array"),
+    dry: bool = Query(False, description="Preview only"),
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
+    return _patch_and_apply(request, body, None, dry, durable, base)
 
+
+# -----------------------------------------------------------------------------
+# Camera operations on a working copy (shared by the endpoints and transactions)
+# Each takes a _next_config() copy, changes it in place and returns a summary;
+# errors are raised as HTTPException.
+# -----------------------------------------------------------------------------
+def _op_clone(work: dict, req: CameraCloneReq) -> dict:
+    cams = work["cameras"]
     if req.source_key not in cams:
         raise HTTPException(status_code=404, detail=f"source_key '{req.source_key}' not found")
     if (req.target_key in cams) and not req.overwrite:
         raise HTTPException(status_code=409, detail=f"target_key '{req.target_key}' exists (use overwrite=true)")
 
-    new_cfg = _deepcopy(cfg)
-    new_cams = _ensure_cameras(new_cfg)["cameras"]
-    new_cams[req.target_key] = _deepcopy(new_cams[req.source_key])
-    if not new_cams[req.target_key].get("name"):
-        new_cams[req.target_key]["name"] = req.target_key
+    cams[req.target_key] = cams[req.source_key]
+    if not cams[req.target_key].get("name"):
+        cams[req.target_key] = {**cams[req.source_key], "name": req.target_key}
+    return {"from": req.source_key, "to": req.target_key}
+
+
+def _op_delete(work: dict, req: CameraDeleteReq) -> dict:
+    if req.key not in work["cameras"]:
+        raise HTTPException(status_code=404, detail=f"key '{req.key}' not found")
+    work["cameras"].pop(req.key, None)
+    return {"key": req.key}
+
+
+def _op_bulk_delete(work: dict, req: CameraBulkDeleteReq, strict: bool = True) -> dict:
+    cams = work["cameras"]
+    req_keys = list(dict.fromkeys(req.keys))  # unique while preserving order
+    existing = [k for k in req_keys if k in cams]
+    missing = [k for k in req_keys if k not in cams]
+    if missing and strict:
+        raise HTTPException(status_code=404, detail={"missing": missing})
+    for k in existing:
+        cams.pop(k, None)
+    return {"keys": existing, "missing": missing}
+
+
+def _op_reorder(work: dict, req: CameraReorderReq) -> dict:
+    cams = work["cameras"]
+    if not cams:
+        raise HTTPException(status_code=400, detail="no cameras to reorder")
+
+    ordered_keys = [k for k in req.order if k in cams]
+    for k in cams.keys():
+        if k not in ordered_keys:
+            ordered_keys.append(k)
+    work["cameras"] = {k: cams[k] for k in ordered_keys}
+    return {"order": ordered_keys}
+
+
+def _op_set(work: dict, req: CameraSetReq) -> dict:
+    if not isinstance(req.value, dict):
+        raise HTTPException(status_code=400, detail="value must be an object")
+    work["cameras"][req.key] = req.value
+    return {"key": req.key}
+
+
+def _op_bulk_edit(work: dict, req: BulkEditReq, strict: bool = True) -> dict:
+    sel = req.select
+    if not (sel.keys or sel.ranges or sel.where or sel.all):
+        raise HTTPException(status_code=400, detail="empty selector (use keys, ranges, where or all=true)")
+    if not (req.set or req.unset):
+        raise HTTPException(status_code=400, detail="nothing to change (set/unset are empty)")
+
+    cams = work["cameras"]
+    try:
+        selected, missing = select_cameras(cams, sel.keys, sel.ranges, sel.where)
+        tree = compile_patch(req.set, req.unset)
+    except BulkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if missing and strict:
+        raise HTTPException(status_code=404, detail={"missing": missing})
+
+    changed = []
+    for k in selected:
+        cam = apply_patch(cams[k], tree)
+        if cam is not cams[k]:
+            cams[k] = cam
+            changed.append(k)
+    return {"selected": selected, "changed": changed, "missing": missing}
+
+
+# -----------------------------------------------------------------------------
+# NEW: Camera management API
+# -----------------------------------------------------------------------------
+@app.post("/api/cameras/clone")
+def api_cam_clone(req: CameraCloneReq, base: Optional[int] = Depends(_write_base)) -> JSONResponse:
+    change = functools.partial(_op_clone, req=req)
 
     if not req.apply:
-        diff = manager.diff_configs(cfg, new_cfg)
-        return _ok(dry=True, diff=diff)
+        return _preview(change)
 
     return _apply_with_errors(
-        new_cfg,
+        change,
         ws_event="cam_cloned",
-        ws_payload={"from": req.source_key, "to": req.target_key},
+        base_version=_base(req, base),
     )
 
 
 @app.post("/api/cameras/delete")
-def api_cam_delete(req: CameraDeleteReq) -> JSONResponse:
-    cfg = manager.get_running_config()
-    cams = cfg.get("cameras", {})
-    if req.key not in cams:
-        raise HTTPException(status_code=404, detail=f"key '{req.key}' not found")
-
-    new_cfg = _deepcopy(cfg)
-    new_cfg.get("cameras", {}).pop(req.key, None)
+def api_cam_delete(req: CameraDeleteReq, base: Optional[int] = Depends(_write_base)) -> JSONResponse:
+    change = functools.partial(_op_delete, req=req)
 
     if not req.apply:
-        diff = manager.diff_configs(cfg, new_cfg)
-        return _ok(dry=True, diff=diff)
+        return _preview(change)
 
     return _apply_with_errors(
-        new_cfg,
+        change,
         ws_event="cam_deleted",
-        ws_payload={"key": req.key},
+        base_version=_base(req, base),
     )
 
 
 @app.post("/api/cameras/bulk_delete")
-def api_cam_bulk_delete(req: CameraBulkDeleteReq) -> JSONResponse:
-    cfg = manager.get_running_config()
-    cams = cfg.get("cameras", {})
-    req_keys = list(dict.fromkeys(req.keys))  # unique while preserving order
-    existing = [k for k in req_keys if k in cams]
-    missing = [k for k in req_keys if k not in cams]
-
-    # Build the prospective new config by removing only existing keys
-    new_cfg = _deepcopy(cfg)
-    for k in existing:
-        new_cfg.get("cameras", {}).pop(k, None)
+def api_cam_bulk_delete(req: CameraBulkDeleteReq, base: Optional[int] = Depends(_write_base)) -> JSONResponse:
+    # DRY-RUN: do not error if some are missing; report what would happen.
+    # APPLY mode: if any are missing, keep strict behavior
+    change = functools.partial(_op_bulk_delete, req=req, strict=req.apply)
 
     if not req.apply:
-        # DRY-RUN: do not error if some are missing; report what would happen
-        diff = manager.diff_configs(cfg, new_cfg)
-        return _ok(dry=True, diff=diff, to_delete=existing, missing=missing)
-
-    # APPLY mode: if any are missing, keep strict behavior
-    if missing:
-        raise HTTPException(status_code=404, detail={"missing": missing})
+        return _preview(change, lambda res: {"to_delete": res["keys"], "missing": res["missing"]})
 
     return _apply_with_errors(
-        new_cfg,
+        change,
         ws_event="cams_deleted",
-        ws_payload={"keys": existing},
+        ws_payload=lambda res: {"keys": res["keys"]},
+        base_version=_base(req, base),
     )
 
 
 @app.post("/api/cameras/reorder")
-def api_cam_reorder(req: CameraReorderReq) -> JSONResponse:
-    cfg = manager.get_running_config()
-    cams = cfg.get("cameras", {})
-    if not cams:
-        raise HTTPException(status_code=400, detail="no cameras to reorder")
-
-    ordered_keys = [k for k in req.order if k in cams]
-    for k in cams.keys():
-        if k not in ordered_keys:
-            ordered_keys.append(k)
-
-    new_cfg = _deepcopy(cfg)
-    new_cfg["cameras"] = {k: cams[k] for k in ordered_keys}
+def api_cam_reorder(req: CameraReorderReq, base: Optional[int] = Depends(_write_base)) -> JSONResponse:
+    change = functools.partial(_op_reorder, req=req)
 
     if not req.apply:
-        diff = manager.diff_configs(cfg, new_cfg)
-        return _ok(dry=True, diff=diff, order=ordered_keys)
+        return _preview(change, lambda res: {"order": res["order"]})
 
-    resp = _apply_with_errors(
-        new_cfg,
+    return _apply_with_errors(
+        change,
         ws_event="cam_reordered",
-        ws_payload={"order": ordered_keys},
+        extra=lambda res: {"order": res["order"]},
+        base_version=_base(req, base),
     )
-    if resp.status_code == 200:
-        data = json.loads(resp.body.decode())
-        data["order"] = ordered_keys
-        return JSONResponse(data)
-    return resp
 
 
 # -----------------------------------------------------------------------------
 # Camera set endpoint (create/overwrite a camera value)
 # -----------------------------------------------------------------------------
 @app.post("/api/cameras/set")
-def api_cam_set(req: CameraSetReq) -> JSONResponse:
-    cfg = manager.get_running_config()
-    if not isinstance(req.value, dict):
-        raise HTTPException(status_code=400, detail="value must be an object")
-
-    new_cfg = _deepcopy(cfg)
-    new_cfg.setdefault("cameras", {})[req.key] = _deepcopy(req.value)
+def api_cam_set(req: CameraSetReq, base: Optional[int] = Depends(_write_base)) -> JSONResponse:
+    change = functools.partial(_op_set, req=req)
 
     if not req.apply:
-        diff = manager.diff_configs(cfg, new_cfg)
-        return _ok(dry=True, diff=diff)
+        return _preview(change)
 
     return _apply_with_errors(
-        new_cfg,
+        change,
         ws_event="cam_set",
-        ws_payload={"key": req.key},
+        base_version=_base(req, base),
     )
 
 
+# -----------------------------------------------------------------------------
+# Transactions: several camera operations committed as one version
+# -----------------------------------------------------------------------------
+_TX_OPS: Dict[str, Any] = {
+    "clone": (CameraCloneReq, _op_clone),
+    "delete": (CameraDeleteReq, _op_delete),
+    "bulk_delete": (CameraBulkDeleteReq, _op_bulk_delete),
+    "reorder": (CameraReorderReq, _op_reorder),
+    "set": (CameraSetReq, _op_set),
+    "bulk_edit": (BulkEditReq, _op_bulk_edit),
+}
+
+
+@app.post("/api/transactions")
+def api_transaction(
+    req: TransactionReq,
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
+    """Run `ops` in order against one working copy, validate the result once
+    and commit it as a single version (one backup, one `transaction` event).
+    Any failing op aborts the whole transaction and nothing is applied."""
+    if not req.ops:
+        raise HTTPException(status_code=400, detail="no operations")
+    ops = []
+    for i, raw in enumerate(req.ops):
+        name = raw.get("op")
+        if name not in _TX_OPS:
+            raise HTTPException(status_code=400, detail={"index": i, "error": f"unknown op '{name}' (expected one of {sorted(_TX_OPS)})"})
+        model, run = _TX_OPS[name]
+        try:
+            ops.append((name, run, model(**{k: v for k, v in raw.items() if k != "op"})))
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail={"index": i, "op": name, "error": json.loads(e.json())})
+
+    def change(work: dict) -> dict:
+        results = []
+        for i, (name, run, op_req) in enumerate(ops):
+            try:
+                results.append({"op": name, **run(work, op_req)})
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail={"index": i, "op": name, "error": e.detail})
+        return {"ops": results}
+
+    if not req.apply:
+        return _preview(change, lambda res: {"results": res["ops"]})
+
+    return _apply_with_errors(
+        change,
+        ws_event="transaction",
+        durable=durable,
+        extra=lambda res: {"results": res["ops"]},
+        base_version=_base(req, base),
+    )
+
+
+@app.patch("/api/cameras/{key}")
+def patch_camera(
+    key: str,
+    request: Request,
+    body: Any = Body(..., description="Merge patch object or JSON Patch array, relative to the camera"),
+    dry: bool = Query(False, description="Preview only"),
+    durable: bool = Query(False, description="Respond only after the config is on disk"),
+    base: Optional[int] = Depends(_write_base),
+) -> JSONResponse:
+    return _patch_and_apply(request, body, key, dry, durable, base)
+
+
 # -----------------------------------------------------------------------------
 # Strict auth middleware: protect everything except UI/static/auth/docs/ping/root
 # -----------------------------------------------------------------------------
@@ -751,10 +1173,19 @@ async def auth_middleware(request: Request, call_next):
     if any(path == p or path.startswith(p) for p in WHITELIST_PREFIXES):
         return await call_next(request)
 
-    rec = _load_token_record()
+    denied = _check_token(request)
+    if denied is not None:
+        return denied
+    return await call_next(request)
+
+
+@timed("auth")
+def _check_token(request: Request) -> Optional[JSONResponse]:
+    """None if the request may pass, else the 403 response."""
+    rec = token_cache.get()
     if not rec:
         # No token configured -> open access (dev mode)
-        return await call_next(request)
+        return None
 
     auth = request.headers.get("authorization") or request.headers.get("Authorization")
     if not auth or not auth.lower().startswith("bearer "):
@@ -768,21 +1199,35 @@ async def auth_middleware(request: Request, call_next):
     if exp:
         left = int(exp - _now())
         if left < TOKEN_RENEW_THRESHOLD:
-            new_exp = _now() + TOKEN_TTL_SECONDS
-            try:
-                _save_token_record(rec["token"], new_exp)
-            except Exception:
-                pass
+            token_cache.renew(_now() + TOKEN_TTL_SECONDS)
+    return None
 
-    return await call_next(request)
+
+# Outermost: counts every request, the ones auth turns away included
+app.add_middleware(MetricsMiddleware, requests=REGISTRY.register(Counter(
+    "hotreload_http_requests_total", "HTTP requests by method, route template and status.",
+    ("method", "route", "status"))), routes=app.routes)
 
 
 # -----------------------------------------------------------------------------
 # WebSocket endpoint
 # -----------------------------------------------------------------------------
 @app.websocket("/ws")
-async def ws(ws: WebSocket):
-    await bus.connect(ws)
+async def ws(ws: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+    """Live config events. `?since=<version>&epoch=<epoch>` replays the deltas
+    missed since that version; a client too far behind gets one snapshot."""
+    await ws.accept()
+    snap = getattr(manager, "snapshot", None)
+    backlog: List[str] = []
+    if snap is not None:
+        missed = event_log.since(since) if since is not None and epoch in (None, event_log.epoch) else None
+        if since is None:
+            backlog = [event_log.hello(snap)]
+        elif missed is not None and len(missed) < bus.queue_size:
+            backlog = missed
+        else:
+            backlog = [event_log.snapshot(snap)]
+    bus.register(ws, backlog)
     try:
         while True:
             _ = await ws.receive_text()  # ping/pong
@@ -0,0 +1,274 @@
+"""Prometheus metrics, rendered by GET /metrics (text format 0.0.4).
+
+Built for the request path: every histogram / counter child owns one
+preallocated list per thread (bucket counts + sum, or a single count), so an
+observation is a bisect and two list increments on the calling thread's own
+list -- no lock, no allocation. A scrape sums the per-thread lists. A lock is
+only taken the first time a thread or a new label combination shows up.
+
+Gauges are callbacks evaluated at scrape time (`GaugeFunc`), so nothing keeps
+them up to date in between.
+
+  from .metrics import timed
+  @timed("persist")          # hotreload_stage_duration_seconds{stage="persist"}
+  def _persist(...): ...
+"""
+from __future__ import annotations
+import bisect
+import functools
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, Tuple, Union
+
+# 0.1 ms .. 10 s: config stages range from microseconds (validation of a cached
+# config) to seconds (backup of a 10k-camera config)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labelstr(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Sharded:
+    """A fixed-size list of numbers per thread; `cells()` sums them."""
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        s = getattr(self._local, "s", None)
+        if s is None:
+            s = self._local.s = [0] * self._size
+            with self._lock:
+                self._shards.append(s)
+        return s
+
+    def cells(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        total = [0] * self._size
+        for s in shards:
+            for i, v in enumerate(s):
+                total[i] += v
+        return total
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._child()
+        return child
+
+    def _child(self) -> Any:
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _CounterChild(_Sharded):
+    def __init__(self) -> None:
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self.shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self.cells()[0]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_labelstr(self.labelnames, key)} {_fmt(child.value)}"
+
+
+class _HistogramChild(_Sharded):
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        super().__init__(len(bounds) + 2)   # per-bucket counts, +Inf, sum
+        self.bounds = bounds
+
+    def observe(self, value: float) -> None:
+        s = self.shard()
+        s[bisect.bisect_left(self.bounds, value)] += 1
+        s[-1] += value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            cells = child.cells()
+            cumulative = 0
+            for bound, n in zip(self.bounds + (math.inf,), cells):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                yield f"{self.name}_bucket{_labelstr(self.labelnames, key, le)} {_fmt(cumulative)}"
+            yield f"{self.name}_sum{_labelstr(self.labelnames, key)} {_fmt(cells[-1])}"
+            yield f"{self.name}_count{_labelstr(self.labelnames, key)} {_fmt(cumulative)}"
+
+
+class GaugeFunc(_Metric):
+    """Gauge read at scrape time: `fn()` returns a number, or {label values: number}."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Union[float, Mapping[Any, float]]],
+                 labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def samples(self) -> Iterable[str]:
+        value = self.fn()
+        if not isinstance(value, Mapping):
+            yield f"{self.name} {_fmt(value)}"
+            return
+        for key, v in value.items():
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{_labelstr(self.labelnames, key)} {_fmt(v)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        out = []
+        for metric in list(self._metrics.values()):
+            try:
+                out.append(metric.render())
+            except Exception as e:   # a broken gauge callback must not break the scrape
+                out.append(f"# {metric.name} unavailable: {type(e).__name__}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGES = ("apply", "validate", "diff", "commit", "persist", "backup", "notify", "broadcast", "auth")
+STAGE = REGISTRY.register(Histogram(
+    "hotreload_stage_duration_seconds", "Time spent in one stage of the config pipeline.", ("stage",)))
+for _stage in STAGES:
+    STAGE.labels(_stage)   # exported from the first scrape on, even at zero
+
+
+def timed(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: observe the call's duration in STAGE{stage}."""
+    child = STAGE.labels(stage)
+
+    def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests by method, route template and
+    status into `requests` (a Counter labelled method/route/status).
+
+    The route comes from the router's match; requests answered before routing
+    (e.g. by the auth middleware) are matched against `routes` afterwards.
+    """
+
+    def __init__(self, app: Any, requests: Counter, routes: Sequence[Any] = ()) -> None:
+        self.app = app
+        self.requests = requests
+        self.routes = routes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route") or self._match(scope)
+            path = getattr(route, "path", None) or "unmatched"
+            self.requests.labels(scope.get("method", ""), path, status[0]).inc()
+
+    def _match(self, scope: Dict[str, Any]) -> Any:
+        from starlette.routing import Match
+        for route in self.routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return route
+        return None
@@ -0,0 +1,247 @@
+"""Copy-on-write JSON Merge Patch (RFC 7396) and JSON Patch (RFC 6902).
+
+Both return a new document that shares every subtree the patch does not touch
+with the input, so they work directly on frozen running-config snapshots:
+only the containers on the path to a change are copied (each at most once per
+patch). `touched_cameras` reports which cameras a patch can affect, so callers
+validate just those.
+"""
+from __future__ import annotations
+import copy
+from typing import Any, Dict, List, Optional, Set
+
+from .diff import json_equal, split_pointer
+
+
+class PatchError(ValueError):
+    """Malformed patch or a path that cannot be applied (HTTP 400)."""
+
+    def __init__(self, msg: str, path: str = "") -> None:
+        super().__init__(msg)
+        self.path = path
+        self.msg = msg
+
+
+class PatchTestFailed(PatchError):
+    """An RFC 6902 `test` op did not match (HTTP 409)."""
+
+
+# -----------------------------------------------------------------------------
+# JSON Merge Patch
+# -----------------------------------------------------------------------------
+def merge_patch(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    base = target if isinstance(target, dict) else {}
+    out = dict(base)
+    for k, v in patch.items():
+        if v is None:
+            out.pop(k, None)
+        else:
+            out[k] = merge_patch(base.get(k), v)
+    return out
+
+
+# -----------------------------------------------------------------------------
+# JSON Patch
+# -----------------------------------------------------------------------------
+class _Doc:
+    """Document being patched; copies a container the first time it is written."""
+
+    def __init__(self, root: Any) -> None:
+        self.root = root
+        self._owned: Set[int] = set()
+
+    def _own(self, obj: Any) -> Any:
+        if id(obj) in self._owned:
+            return obj
+        copy = dict(obj) if isinstance(obj, dict) else list(obj)
+        self._owned.add(id(copy))
+        return copy
+
+    def detached(self, value: Any) -> Any:
+        """`value` to insert at a second place: a container this patch owns
+        (and may still write to) is copied, shared frozen ones stay shared."""
+        if isinstance(value, (dict, list)) and id(value) in self._owned:
+            return copy.deepcopy(value)
+        return value
+
+    def get(self, parts: List[str], pointer: str) -> Any:
+        node = self.root
+        for t in parts:
+            node = _child(node, t, pointer)
+        return node
+
+    def parent_for_write(self, parts: List[str], pointer: str) -> Any:
+        """Own every container from the root to the parent of `parts[-1]`."""
+        if not isinstance(self.root, (dict, list)):
+            raise PatchError("document root is not a container", pointer)
+        self.root = self._own(self.root)
+        node = self.root
+        for t in parts[:-1]:
+            child = _child(node, t, pointer)
+            if not isinstance(child, (dict, list)):
+                raise PatchError(f"'{t}' is not a container", pointer)
+            child = self._own(child)
+            _set_child(node, t, child, pointer)
+            node = child
+        return node
+
+
+def _index(node: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(node)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"invalid array index '{token}'", pointer)
+    i = int(token)
+    if i > len(node) or (i == len(node) and not allow_end):
+        raise PatchError(f"array index {i} out of range", pointer)
+    return i
+
+
+def _child(node: Any, token: str, pointer: str) -> Any:
+    if isinstance(node, dict):
+        if token not in node:
+            raise PatchError("path not found", pointer)
+        return node[token]
+    if isinstance(node, list):
+        return node[_index(node, token, pointer)]
+    raise PatchError("path not found", pointer)
+
+
+def _set_child(node: Any, token: str, value: Any, pointer: str) -> None:
+    if isinstance(node, dict):
+        node[token] = value
+    else:
+        node[_index(node, token, pointer)] = value
+
+
+def _add(doc: _Doc, pointer: str, value: Any) -> None:
+    parts = split_pointer(pointer)
+    if not parts:
+        doc.root = value
+        return
+    parent = doc.parent_for_write(parts, pointer)
+    last = parts[-1]
+    if isinstance(parent, dict):
+        parent[last] = value
+    else:
+        parent.insert(_index(parent, last, pointer, allow_end=True), value)
+
+
+def _replace(doc: _Doc, pointer: str, value: Any) -> None:
+    parts = split_pointer(pointer)
+    doc.get(parts, pointer)   # must exist
+    if not parts:
+        doc.root = value
+        return
+    # in place, so object members keep their position
+    _set_child(doc.parent_for_write(parts, pointer), parts[-1], value, pointer)
+
+
+def _remove(doc: _Doc, pointer: str) -> Any:
+    parts = split_pointer(pointer)
+    if not parts:
+        raise PatchError("cannot remove the document root", pointer)
+    parent = doc.parent_for_write(parts, pointer)
+    last = parts[-1]
+    if isinstance(parent, dict):
+        if last not in parent:
+            raise PatchError("path not found", pointer)
+        return parent.pop(last)
+    return parent.pop(_index(parent, last, pointer))
+
+
+def _reorder(doc: _Doc, pointer: str, after: Optional[str]) -> None:
+    """diff.py key-order move: place member `pointer` right after sibling `after`."""
+    parts = split_pointer(pointer)
+    parent = doc.parent_for_write(parts, pointer)
+    last = parts[-1]
+    if not isinstance(parent, dict) or last not in parent:
+        raise PatchError("path not found", pointer)
+    if after is not None and (after not in parent or after == last):
+        raise PatchError(f"'after' member '{after}' not found", pointer)
+    value = parent.pop(last)
+    items = list(parent.items())
+    at = 0 if after is None else next(i for i, (k, _) in enumerate(items) if k == after) + 1
+    items.insert(at, (last, value))
+    parent.clear()
+    parent.update(items)
+
+
+def json_patch(document: Any, ops: Any) -> Any:
+    if not isinstance(ops, list):
+        raise PatchError("JSON Patch must be an array of operations")
+    doc = _Doc(document)
+    for n, op in enumerate(ops):
+        if not isinstance(op, dict) or "op" not in op or not isinstance(op.get("path"), str):
+            raise PatchError(f"operation {n} needs 'op' and 'path'")
+        kind, path = op["op"], op["path"]
+        try:
+            if kind in ("add", "replace", "test") and "value" not in op:
+                raise PatchError(f"'{kind}' needs 'value'", path)
+            if kind == "add":
+                _add(doc, path, op["value"])
+            elif kind == "remove":
+                _remove(doc, path)
+            elif kind == "replace":
+                _replace(doc, path, op["value"])
+            elif kind == "move":
+                src = op.get("from")
+                if not isinstance(src, str):
+                    raise PatchError("'move' needs 'from'", path)
+                if src == path and "after" in op:
+                    _reorder(doc, path, op["after"])
+                elif src != path:
+                    if path.startswith(src + "/"):
+                        raise PatchError("cannot move a value into itself", path)
+                    _add(doc, path, _remove(doc, src))
+            elif kind == "copy":
+                src = op.get("from")
+                if not isinstance(src, str):
+                    raise PatchError("'copy' needs 'from'", path)
+                _add(doc, path, doc.detached(doc.get(split_pointer(src), src)))
+            elif kind == "test":
+                # RFC 6902 4.6: 1, 1.0 and true are different values
+                if not json_equal(doc.get(split_pointer(path), path), op["value"]):
+                    raise PatchTestFailed("test failed", path)
+            else:
+                raise PatchError(f"unknown op '{kind}'", path)
+        except ValueError as e:
+            if isinstance(e, PatchError):
+                raise
+            raise PatchError(str(e), path)
+    return doc.root
+
+
+# -----------------------------------------------------------------------------
+# Scope
+# -----------------------------------------------------------------------------
+ALL = None  # touched_cameras() result meaning "every camera may have changed"
+
+
+def touched_cameras(ops: List[Dict[str, Any]]) -> Optional[Set[str]]:
+    """Camera keys a JSON Patch can change, or ALL if it rewrites `cameras` wholesale."""
+    keys: Set[str] = set()
+    for op in ops:
+        for ptr in (op.get("path"), op.get("from") if op.get("op") == "move" else None):
+            if not isinstance(ptr, str):
+                continue
+            parts = split_pointer(ptr)
+            if not parts:
+                return ALL
+            if parts[0] != "cameras":
+                continue
+            if len(parts) == 1:
+                return ALL
+            keys.add(parts[1])
+    return keys
+
+
+def touched_cameras_merge(patch: Any) -> Optional[Set[str]]:
+    if not isinstance(patch, dict):
+        return ALL
+    if "cameras" not in patch:
+        return set()
+    cams = patch["cameras"]
+    return set(cams) if isinstance(cams, dict) else ALL
@@ -0,0 +1,479 @@
+"""The config apply pipeline: validate -> diff -> commit -> persist -> notify,
+behind a serialized apply queue.
+
+Every write endpoint describes its change as a function of the config it
+applies to, `change(work) -> summary`, where `work` is a copy-on-write
+`next_config` copy that the function edits in place, and submits it to the
+`ApplyQueue`. One asyncio task on the queue's own loop thread owns the
+running config: it drains the queue in order and runs each queued change
+against the result of the one before it. A change is never built on a stale
+read, so concurrent writers cannot lose each other's updates.
+
+Changes that are queued together are coalesced into one commit, one version
+and one event. A change that fails (HTTP error from the op, validation
+errors, conflict) is dropped from the batch alone. Rollback / reset run
+exclusively, in queue order, on an executor thread.
+
+Optimistic concurrency: a change submitted with `base_version` (the config
+version its author last saw) only commits if nothing it touches changed
+after that version. "Touches" is by value: the cameras, and anything outside
+`cameras`, that differ between its input and its output. Those are checked
+against the per-camera versions of the running snapshot (see
+snapshot.ConfigSnapshot) and against earlier changes of the same batch, so
+writers editing different cameras never conflict while a stale write to the
+same camera raises Conflict, listing only the conflicting cameras.
+
+Stages, each timed into the response (`timings_ms`), the log and
+`hotreload_stage_duration_seconds`:
+
+  queue      wait until the batch starts
+  validate   per change, only cameras it does not share with its input;
+             errors raise InvalidConfig (dry runs report them instead)
+  diff       freeze the batch result against the running config, so
+             unchanged subtrees stay shared, and count added/removed/changed
+             cameras. The manager's commit then installs the frozen tree
+             as-is, so this work happens outside its lock.
+             Dry runs (`preview`) return the full RFC 6902 diff instead.
+  commit     the manager entry point, resolved once in __init__. The
+             manager's listeners run here: event log, worker reconciler
+             hand-off (workers restart asynchronously, see
+             GET /api/workers?wait=true) and health prober.
+  notify     the versioned WS event, published from the queue's loop thread
+             in commit order
+  persist    only with durable=True, in the caller's thread (the queue does
+             not wait): the write-behind writer backs up the old version and
+             writes the new one, off the loop
+
+The config is passed through as the plain dict it is; the manager is not
+tried with other payload shapes or call signatures.
+"""
+from __future__ import annotations
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .diff import json_equal
+from .metrics import STAGE
+from .snapshot import freeze
+
+logger = logging.getLogger("hotreload")
+
+Errors = List[Dict[str, Any]]
+Change = Callable[[Dict[str, Any]], Dict[str, Any]]
+CHANGED = object()   # scope default: validate cameras not shared with the base config
+_MISSING = object()
+
+
+class InvalidConfig(ValueError):
+    """Validation errors for the new config (HTTP 400)."""
+
+    def __init__(self, errors: Errors) -> None:
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+class Conflict(ValueError):
+    """A `base_version` write touches what changed after that version (HTTP 409).
+    `detail`: {"version", "base_version", "cameras": {key: version},
+    "deleted": [keys no longer in the config], "config": version (only if
+    something outside `cameras` conflicts)}."""
+
+    def __init__(self, detail: Dict[str, Any]) -> None:
+        super().__init__(f"conflict with version {detail.get('version')}")
+        self.detail = detail
+
+
+def next_config(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy-on-write base for the next config version: new top-level and
+    cameras containers, while every camera object stays shared with `cfg`."""
+    new_cfg = dict(cfg)
+    new_cfg["cameras"] = dict(cfg.get("cameras") or {})
+    return new_cfg
+
+
+def resolve_entry(manager: Any) -> Callable[[Dict[str, Any]], Any]:
+    """The manager's apply entry point as a one-argument callable.
+    Looked up once: `apply`, `apply_config` or `set_config`, in that order;
+    a required `workers` argument gets an empty dict."""
+    for name in ("apply", "apply_config", "set_config"):
+        fn = getattr(manager, name, None)
+        if not callable(fn):
+            continue
+        workers = inspect.signature(fn).parameters.get("workers")
+        if workers is not None and workers.default is inspect.Parameter.empty:
+            return functools.partial(fn, workers={})
+        return fn
+    raise TypeError(f"{type(manager).__name__} has no apply(), apply_config() or set_config()")
+
+
+def camera_changes(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Added / removed / changed camera keys between two configs whose
+    unchanged cameras are the same objects (see snapshot.freeze)."""
+    old_cams = old.get("cameras") or {}
+    new_cams = new.get("cameras") or {}
+    if not isinstance(old_cams, dict) or not isinstance(new_cams, dict):
+        return {"added": [], "removed": [], "changed": []}
+    return {
+        "added": [k for k in new_cams if k not in old_cams],
+        "removed": [k for k in old_cams if k not in new_cams],
+        "changed": [k for k, cam in new_cams.items() if k in old_cams and old_cams[k] is not cam],
+    }
+
+
+def touched(before: Dict[str, Any], after: Dict[str, Any]) -> Tuple[List[str], bool]:
+    """Camera keys whose value differs between two configs, and whether
+    anything outside `cameras` does (identity first, then type-strict equality)."""
+    old_cams = before.get("cameras") or {}
+    new_cams = after.get("cameras") or {}
+    cams = [k for k in new_cams.keys() | old_cams.keys()
+            if not json_equal(old_cams.get(k, _MISSING), new_cams.get(k, _MISSING))]
+    rest = any(not json_equal(before.get(k, _MISSING), after.get(k, _MISSING))
+               for k in before.keys() | after.keys() if k != "cameras")
+    return cams, rest
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class ApplyPipeline:
+    """The stages for one new config; `ApplyQueue` runs them.
+
+    `validate(cfg, cameras)` returns a list of errors (cameras=None: all);
+    `notify(event, version, payload)` publishes the change event.
+    """
+
+    def __init__(self, manager: Any, validate: Callable[[Dict[str, Any], Any], Errors],
+                 notify: Callable[[str, Optional[int], Dict[str, Any]], None]) -> None:
+        self.manager = manager
+        self.entry = resolve_entry(manager)
+        self.flush = getattr(manager, "flush", None)
+        self.diff_configs = manager.diff_configs
+        self.validate = validate
+        self.notify = notify
+        self._stage = {name: STAGE.labels(name) for name in ("apply", "diff", "commit", "notify")}
+
+    def check(self, new_cfg: Dict[str, Any], base: Dict[str, Any], scope: Any = CHANGED) -> None:
+        """Validate `new_cfg`; `scope` limits the per-camera checks to those
+        keys (None: all), by default every camera not shared with `base`."""
+        if scope is CHANGED:
+            old_cams = base.get("cameras") or {}
+            scope = {k for k, cam in (new_cfg.get("cameras") or {}).items() if old_cams.get(k) is not cam}
+        errors = self.validate(new_cfg, scope)
+        if errors:
+            raise InvalidConfig(errors)
+
+    def preview(self, new_cfg: Dict[str, Any], base: Dict[str, Any], scope: Any = CHANGED) -> Dict[str, Any]:
+        """Dry run: validate, then the full diff against `base`. An invalid
+        config is still diffed (the UI previews it) and its problems are
+        returned under `errors` (empty when the config would be accepted)."""
+        t0 = time.perf_counter()
+        try:
+            self.check(new_cfg, base, scope)
+            errors: List[Dict[str, Any]] = []
+        except InvalidConfig as e:
+            errors = e.errors
+        t1 = time.perf_counter()
+        diff = self.diff_configs(base, new_cfg)
+        return {"diff": diff, "errors": errors,
+                "timings_ms": {"validate": _ms(t1 - t0), "diff": _ms(time.perf_counter() - t1)}}
+
+    def commit(self, new_cfg: Dict[str, Any], base: Dict[str, Any]) -> Tuple[Any, Dict[str, int], Dict[str, float]]:
+        """diff + commit: returns (manager result, camera change counts, timings)."""
+        t0 = time.perf_counter()
+        frozen = freeze(new_cfg, base)
+        changes = {k: len(v) for k, v in camera_changes(base, frozen).items()}
+        t1 = time.perf_counter()
+        result = self.entry(frozen)
+        t2 = time.perf_counter()
+        self._stage["diff"].observe(t1 - t0)
+        self._stage["commit"].observe(t2 - t1)
+        return result, changes, {"diff": _ms(t1 - t0), "commit": _ms(t2 - t1)}
+
+    def publish(self, event: str, version: Optional[int], payload: Dict[str, Any]) -> float:
+        t0 = time.perf_counter()
+        self.notify(event, version, payload)
+        elapsed = time.perf_counter() - t0
+        self._stage["notify"].observe(elapsed)
+        return _ms(elapsed)
+
+
+class _Job:
+    __slots__ = ("change", "event", "payload", "skip", "exclusive", "base_version", "future", "submitted",
+                 "timings", "summary")
+
+    def __init__(self, change: Callable[..., Any], event: Optional[str], payload: Any,
+                 skip: Optional[Callable[[Dict[str, Any]], bool]], exclusive: bool,
+                 base_version: Optional[int] = None) -> None:
+        self.change = change
+        self.event = event
+        self.payload = payload
+        self.skip = skip
+        self.exclusive = exclusive
+        self.base_version = base_version
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.submitted = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.summary: Dict[str, Any] = {}
+
+    def event_payload(self) -> Dict[str, Any]:
+        if callable(self.payload):
+            return self.payload(self.summary)
+        return self.summary if self.payload is None else self.payload
+
+
+class ApplyQueue:
+    """Serialized config writes: see the module docstring.
+
+    `submit` and `exclusive` block the calling thread (sync endpoints run in
+    the threadpool) until their change is committed or has failed.
+    """
+
+    def __init__(self, pipeline: ApplyPipeline, max_batch: int = 64) -> None:
+        self.pipeline = pipeline
+        self.max_batch = max(1, max_batch)
+        self.stats = {"jobs": 0, "batches": 0, "commits": 0, "failed": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._drainer: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def submit(self, change: Change, event: Optional[str] = None, payload: Any = None, durable: bool = False,
+               skip: Optional[Callable[[Dict[str, Any]], bool]] = None,
+               base_version: Optional[int] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Apply `change` to the running config, coalesced with whatever is
+        queued alongside it.
+
+        `payload` is the event payload: a dict, a function of the change's
+        summary, or None for the summary itself. If `skip(summary)` is true
+        the change is not committed. With `base_version`, the change is
+        conditional (see the module docstring). Returns (summary, None) for a
+        skipped change, else (summary, {"result", "changes", "timings_ms",
+        "batch"}). Raises what `change` raised, InvalidConfig or Conflict.
+        """
+        job = self._put(_Job(change, event, payload, skip, exclusive=False, base_version=base_version))
+        summary, out = job.future.result()
+        if out is not None and durable and self.pipeline.flush is not None and isinstance(out["result"], dict):
+            t0 = time.perf_counter()
+            out["result"]["persisted"] = self.pipeline.flush(out["result"].get("version"))
+            out["timings_ms"]["persist"] = _ms(time.perf_counter() - t0)
+        if out is not None:
+            out["timings_ms"]["total"] = _ms(time.perf_counter() - job.submitted)
+        return summary, out
+
+    def exclusive(self, fn: Callable[[], Any], event: Optional[str] = None,
+                  payload: Optional[Dict[str, Any]] = None) -> Any:
+        """Run `fn()` (rollback, reset: commits of their own) in queue order,
+        with nothing else applying meanwhile. If it returns a true value,
+        `event` is published for the version it left running."""
+        return self._put(_Job(fn, event, payload, None, exclusive=True)).future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(5)
+        except Exception:
+            logger.exception("apply queue shutdown failed")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout=5)
+        loop.close()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _put(self, job: _Job) -> _Job:
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(target=self._serve, args=(loop, ready), name="config-apply", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _serve(self, loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        self._queue = asyncio.Queue()
+        self._drainer = loop.create_task(self._drain())
+        ready.set()
+        loop.run_forever()
+
+    async def _drain(self) -> None:
+        queue = self._queue
+        held: Optional[_Job] = None
+        while True:
+            job = held or await queue.get()
+            held = None
+            if job.exclusive:
+                await self._run_exclusive(job)
+                continue
+            batch = [job]
+            while len(batch) < self.max_batch and not queue.empty():
+                job = queue.get_nowait()
+                if job.exclusive:
+                    held = job   # runs right after this batch
+                    break
+                batch.append(job)
+            try:
+                self._apply(batch)
+            except BaseException as e:   # never leave a caller waiting
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+
+    def _apply(self, batch: List[_Job]) -> None:
+        """Run the batch's changes in order on one working copy, commit the
+        ones that succeeded as one version, then publish its event."""
+        p = self.pipeline
+        t_start = time.perf_counter()
+        self.stats["batches"] += 1
+        self.stats["jobs"] += len(batch)
+        snap = getattr(p.manager, "snapshot", None)
+        base = p.manager.get_running_config()
+        work = base
+        accepted: List[_Job] = []
+        # conditional changes: what earlier changes of this batch touched, and
+        # the conflicts found (raised once the batch's version exists)
+        track = snap is not None and any(job.base_version is not None for job in batch)
+        batch_cams: Dict[str, bool] = {}
+        batch_rest = False
+        conflicts: List[Tuple[_Job, Dict[str, int], List[str], bool]] = []
+        for job in batch:
+            job.timings["queue"] = _ms(t_start - job.submitted)
+            t0 = time.perf_counter()
+            try:
+                candidate = next_config(work)
+                job.summary = job.change(candidate) or {}
+                if job.skip is not None and job.skip(job.summary):
+                    job.future.set_result((job.summary, None))
+                    continue
+                if track:
+                    cams, rest = touched(work, candidate)
+                    if job.base_version is not None:
+                        found = self._conflicts(snap, job.base_version, cams, rest, batch_cams, batch_rest)
+                        if found is not None:
+                            conflicts.append((job, *found))
+                            continue
+                p.check(candidate, work)
+            except Exception as e:
+                self.stats["failed"] += 1
+                job.future.set_exception(e)
+                continue
+            job.timings["validate"] = _ms(time.perf_counter() - t0)
+            accepted.append(job)
+            work = candidate
+            if track:
+                batch_cams.update(dict.fromkeys(cams, True))
+                batch_rest = batch_rest or rest
+
+        version = None
+        if accepted:
+            version = self._commit(accepted, work, base, t_start)
+        for job, committed, pending, rest in conflicts:
+            self.stats["failed"] += 1
+            job.future.set_exception(self._conflict_error(job.base_version, committed, pending, rest, version))
+
+    def _commit(self, accepted: List[_Job], work: Dict[str, Any], base: Dict[str, Any], t_start: float) -> Optional[int]:
+        p = self.pipeline
+        try:
+            result, changes, shared = p.commit(work, base)
+        except Exception as e:
+            self.stats["failed"] += len(accepted)
+            logger.error("apply of %d change(s) failed: %s", len(accepted), e)
+            for job in accepted:
+                job.future.set_exception(e)
+            return None
+        self.stats["commits"] += 1
+        version = result.get("version") if isinstance(result, dict) else None
+
+        named = [job for job in accepted if job.event]
+        if len(named) == 1:
+            shared["notify"] = p.publish(named[0].event, version, named[0].event_payload())
+        elif named:
+            shared["notify"] = p.publish("batch", version, {
+                "events": [{"event": job.event, **job.event_payload()} for job in named]})
+
+        elapsed = time.perf_counter() - t_start
+        p._stage["apply"].observe(elapsed)
+        logger.info("apply v%s %s (%d change(s)): %s", version, ",".join(job.event or "-" for job in accepted),
+                    len(accepted), " ".join(f"{k}={v:.2f}ms" for k, v in shared.items()))
+        for job in accepted:
+            job.future.set_result((job.summary, {
+                "result": dict(result) if isinstance(result, dict) else result,
+                "changes": changes,
+                "timings_ms": {**job.timings, **shared},
+                "batch": len(accepted),
+            }))
+        return version
+
+    @staticmethod
+    def _conflicts(snap: Any, base_version: int, cams: List[str], rest: bool, batch_cams: Dict[str, bool],
+                   batch_rest: bool) -> Optional[Tuple[Dict[str, int], List[str], bool]]:
+        """(committed {camera: version} newer than base_version, cameras
+        changed earlier in this batch, whether `rest` conflicts), or None."""
+        if base_version > snap.version:   # a version this process never had (e.g. before a restart)
+            return {k: snap.camera_versions.get(k, 0) for k in cams}, [], rest
+        versions = snap.camera_versions
+        committed = {k: versions[k] for k in cams if versions.get(k, 0) > base_version}
+        pending = [k for k in cams if k in batch_cams and k not in committed]
+        rest = rest and (snap.rest_version > base_version or batch_rest)
+        if committed or pending or rest:
+            return committed, pending, rest
+        return None
+
+    def _conflict_error(self, base_version: int, committed: Dict[str, int], pending: List[str],
+                        rest: bool, version: Optional[int]) -> Conflict:
+        current = self.pipeline.manager.snapshot
+        cams = {**committed, **{k: version for k in pending if version is not None}}
+        present = current.data.get("cameras") or {}
+        detail: Dict[str, Any] = {"version": current.version, "base_version": base_version, "cameras": cams}
+        deleted = [k for k in cams if k not in present]
+        if deleted:
+            detail["deleted"] = deleted
+        if rest:
+            detail["config"] = current.rest_version
+        return Conflict(detail)
+
+    async def _run_exclusive(self, job: _Job) -> None:
+        """Off the loop (rollback / reset read files), but still in order."""
+        loop = asyncio.get_running_loop()
+        self.stats["jobs"] += 1
+        try:
+            ok, version = await loop.run_in_executor(None, self._call, job.change)
+        except Exception as e:
+            self.stats["failed"] += 1
+            job.future.set_exception(e)
+            return
+        if ok and job.event:
+            self.pipeline.publish(job.event, version, job.payload or {})
+        job.future.set_result(ok)
+
+    def _call(self, fn: Callable[[], Any]) -> Tuple[Any, Optional[int]]:
+        ok = fn()
+        return ok, getattr(self.pipeline.manager, "version", None)
+
+    async def _shutdown(self) -> None:
+        if self._drainer is not None:
+            self._drainer.cancel()
+            await asyncio.gather(self._drainer, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait().future.set_exception(RuntimeError("apply queue closed"))
@@ -0,0 +1,344 @@
+"""Recording retention: an indexed segment catalog and a streaming purge.
+
+The recorder registers every finished segment (camera, start, end, path, size,
+motion seconds) and every tracked-object event in `SegmentCatalog`, a SQLite
+database indexed by (camera, end). `RetentionEngine.run_cycle()` then applies
+each camera's `RetentionPolicy` with range queries on that index instead of
+walking the recordings tree:
+
+  keep a segment if it overlaps a detection window and ended within
+  `detection_days`, or if it ended within `recording_days` and the mode is
+  "all" or it overlaps a motion window.
+
+Windows are the detection events / motion segments padded by
+`pre_capture_sec` / `post_capture_sec` and merged. A segment's verdict only
+changes when its end crosses one of three cutoffs: the recording cutoff, the
+detection cutoff, or `now - SETTLE_SECONDS` (newer segments are not judged
+yet, their events may still arrive). Per camera and cycle:
+
+  expired      segments that ended before both day cutoffs: deleted outright
+  crossed      segments whose end crossed a cutoff since the last cycle: the
+               rule above is evaluated against the windows of each page
+
+Deletions are streamed in batches of `batch` rows (files first, then one short
+transaction), so the catalog is never locked for long. Policies are read from
+the running config at the start of every cycle, so a hot-reloaded policy
+applies on the next cycle. Each camera's last cutoffs are stored with a
+fingerprint of its policy; a changed policy drops them, so the next cycle
+re-checks that camera's retained range through the index once -- no rescan of
+the recordings tree.
+"""
+from __future__ import annotations
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger("hotreload")
+
+DAY = 86400.0
+SETTLE_SECONDS = 60.0   # let detection events for a segment arrive before judging it
+
+Segment = Tuple[str, float, float, str, int, float]   # camera, start, end, path, size, motion seconds
+Windows = Tuple[List[float], List[float]]            # merged (starts, ends), sorted
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    camera TEXT NOT NULL,
+    start REAL NOT NULL,
+    "end" REAL NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    motion REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS segments_camera_end ON segments (camera, "end");
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    camera TEXT NOT NULL,
+    start REAL NOT NULL,
+    "end" REAL NOT NULL,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS events_camera_end ON events (camera, "end");
+CREATE TABLE IF NOT EXISTS longest (
+    tbl TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (tbl, camera)
+);
+CREATE TABLE IF NOT EXISTS retention_state (
+    camera TEXT PRIMARY KEY,
+    policy TEXT NOT NULL,
+    recording REAL NOT NULL,
+    detection REAL NOT NULL,
+    settled REAL NOT NULL
+);
+"""
+
+_DEFAULT_POLICY = {"mode": "motion", "detection_days": 5, "recording_days": 2, "pre_capture_sec": 3, "post_capture_sec": 3}
+
+
+def _policy(p: Any) -> Dict[str, Any]:
+    if p is None:
+        return dict(_DEFAULT_POLICY)
+    if not isinstance(p, Mapping):
+        p = p.model_dump() if hasattr(p, "model_dump") else vars(p)
+    return {**_DEFAULT_POLICY, **{k: v for k, v in p.items() if v is not None}}
+
+
+def merge_windows(spans: Iterable[Tuple[float, float]], pre: float, post: float) -> Windows:
+    """Pad each (start, end) by pre/post seconds and merge overlapping spans."""
+    starts: List[float] = []
+    ends: List[float] = []
+    for s, e in sorted((s - pre, e + post) for s, e in spans):
+        if ends and s <= ends[-1]:
+            ends[-1] = max(ends[-1], e)
+        else:
+            starts.append(s)
+            ends.append(e)
+    return starts, ends
+
+
+def overlaps(windows: Windows, start: float, end: float) -> bool:
+    """True if [start, end] overlaps one of the merged windows."""
+    starts, ends = windows
+    i = bisect.bisect_left(ends, start)   # first window ending at/after the segment start
+    return i < len(starts) and starts[i] <= end
+
+
+class SegmentCatalog:
+    """SQLite catalog of recording segments and detection events (thread-safe)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def add_segments(self, rows: Iterable[Segment]) -> None:
+        self._insert("segments", 'INSERT INTO segments (camera, start, "end", path, size, motion) VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def add_events(self, rows: Iterable[Tuple[str, float, float, Optional[str]]]) -> None:
+        self._insert("events", 'INSERT INTO events (camera, start, "end", label) VALUES (?, ?, ?, ?)', rows)
+
+    def _insert(self, table: str, sql: str, rows: Iterable[Tuple]) -> None:
+        rows = list(rows)
+        longest: Dict[str, float] = {}
+        for r in rows:
+            longest[r[0]] = max(longest.get(r[0], 0.0), r[2] - r[1])
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN")
+            db.executemany(sql, rows)
+            db.executemany("INSERT INTO longest (tbl, camera, seconds) VALUES (?, ?, ?) "
+                           "ON CONFLICT (tbl, camera) DO UPDATE SET seconds = max(seconds, excluded.seconds)",
+                           ((table, cam, sec) for cam, sec in longest.items()))
+            db.execute("COMMIT")
+
+    def stream(self, camera: str, lo: float, hi: float, batch: int) -> Iterator[List[Tuple[int, float, float, str, int, float]]]:
+        """Segments of `camera` with lo <= end < hi in (end, id) order, `batch` at a
+        time (keyset pagination: each page is one short indexed query)."""
+        sql = ('SELECT id, start, "end", path, size, motion FROM segments '
+               'WHERE camera = ? AND ("end", id) > (?, ?) AND "end" < ? '
+               'ORDER BY "end", id LIMIT ?')
+        last_end, last_id = lo, -1
+        while True:
+            with self._lock:
+                page = self.db.execute(sql, (camera, last_end, last_id, hi, batch)).fetchall()
+            if not page:
+                return
+            yield page
+            last_end, last_id = page[-1][2], page[-1][0]
+            if len(page) < batch:
+                return
+
+    def spans(self, table: str, camera: str, lo: float, hi: float, where: str = "") -> List[Tuple[float, float]]:
+        """(start, end) of rows of `table` overlapping [lo, hi]. The end-time range
+        is bounded by the camera's longest row, so this stays an index range scan."""
+        with self._lock:
+            db = self.db
+            row = db.execute("SELECT seconds FROM longest WHERE tbl = ? AND camera = ?", (table, camera)).fetchone()
+            if row is None:
+                return []
+            return db.execute(
+                f'SELECT start, "end" FROM {table} WHERE camera = ? AND "end" >= ? AND "end" <= ? AND start <= ? {where}',
+                (camera, lo, hi + row[0], hi)).fetchall()
+
+    def delete(self, table: str, ids: Sequence[int]) -> None:
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN")
+            db.executemany(f"DELETE FROM {table} WHERE id = ?", ((i,) for i in ids))
+            db.execute("COMMIT")
+
+    def state(self, camera: str) -> Optional[Tuple[str, float, float, float]]:
+        """(policy fingerprint, recording, detection, settle cutoff) of a camera's last cycle."""
+        with self._lock:
+            return self.db.execute("SELECT policy, recording, detection, settled FROM retention_state WHERE camera = ?",
+                                   (camera,)).fetchone()
+
+    def set_state(self, camera: str, policy: str, cutoffs: Tuple[float, float, float]) -> None:
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO retention_state (camera, policy, recording, detection, settled) "
+                            "VALUES (?, ?, ?, ?, ?)", (camera, policy, *cutoffs))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.db.execute("SELECT camera, COUNT(*) FROM segments GROUP BY camera").fetchall())
+
+
+class RetentionEngine:
+    def __init__(self, catalog: SegmentCatalog, policies: Callable[[], Mapping[str, Any]],
+                 root: Optional[Path] = None, batch: int = 1000, delete_files: bool = True) -> None:
+        """`policies()` returns {camera: RetentionPolicy or dict} from the running
+        config; segment paths are relative to `root` unless absolute."""
+        self.catalog = catalog
+        self.policies = policies
+        self.root = Path(root) if root else None
+        self.batch = batch
+        self.delete_files = delete_files
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._cycle_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_cycle(self, now: Optional[float] = None, dry: bool = False) -> Dict[str, Any]:
+        """One retention pass over every configured camera."""
+        now = time.time() if now is None else now
+        t0 = time.perf_counter()
+        with self._cycle_lock:
+            cameras = {key: self._camera(key, _policy(p), now, dry) for key, p in self.policies().items()}
+        report = {
+            "ts": now,
+            "dry": dry,
+            "cameras": cameras,
+            "deleted": sum(c["deleted"] for c in cameras.values()),
+            "bytes": sum(c["bytes"] for c in cameras.values()),
+            "scanned": sum(c["scanned"] for c in cameras.values()),
+            "max_batch_ms": max((c["max_batch_ms"] for c in cameras.values()), default=0.0),
+            "total_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+        if not dry:
+            self.last_report = report
+            if report["deleted"]:
+                logger.info("retention: deleted %d segments (%.1f MB) in %.0f ms",
+                            report["deleted"], report["bytes"] / 1e6, report["total_ms"])
+        return report
+
+    def start(self, interval: float) -> None:
+        """Run a cycle every `interval` seconds on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.run_cycle()
+                except Exception:
+                    logger.exception("retention cycle failed")
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _camera(self, camera: str, p: Dict[str, Any], now: float, dry: bool) -> Dict[str, Any]:
+        cutoffs = (now - p["recording_days"] * DAY, now - p["detection_days"] * DAY, now - SETTLE_SECONDS)
+        rec_cut, det_cut, settle = cutoffs
+        floor = min(rec_cut, det_cut)
+        pre, post = float(p["pre_capture_sec"]), float(p["post_capture_sec"])
+        motion_mode = p["mode"] == "motion"
+        stats = {"deleted": 0, "bytes": 0, "scanned": 0, "kept_by_detection": 0, "max_batch_ms": 0.0}
+        fingerprint = json.dumps(p, sort_keys=True)
+        state = self.catalog.state(camera)
+        last = state[1:] if state and state[0] == fingerprint else (floor, floor, floor)
+
+        # expired: past both windows nothing keeps a segment
+        for page in self.catalog.stream(camera, float("-inf"), floor, self.batch):
+            stats["scanned"] += len(page)
+            self._purge(page, stats, dry)
+
+        # crossed: [last cutoff, cutoff) for each cutoff, merged
+        ranges = sorted((max(lo, floor), hi) for lo, hi in zip(last, cutoffs) if hi > max(lo, floor))
+        merged: List[List[float]] = []
+        for lo, hi in ranges:
+            if merged and lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        for lo, hi in merged:
+            for page in self.catalog.stream(camera, lo, hi, self.batch):
+                stats["scanned"] += len(page)
+                det = self._windows("events", camera, page, pre, post)
+                motion = self._windows("segments", camera, page, pre, post, "AND motion > 0") \
+                    if motion_mode else ([], [])
+                doomed = []
+                for row in page:
+                    start, end = row[1], row[2]
+                    if end >= rec_cut and (end >= settle or not motion_mode or overlaps(motion, start, end)):
+                        continue
+                    if end >= det_cut and overlaps(det, start, end):
+                        stats["kept_by_detection"] += 1
+                        continue
+                    doomed.append(row)
+                self._purge(doomed, stats, dry)
+        if not dry:
+            self.catalog.set_state(camera, fingerprint, cutoffs)
+        return stats
+
+    def _windows(self, table: str, camera: str, page: Sequence[Tuple], pre: float, post: float,
+                 where: str = "") -> Windows:
+        lo = min(r[1] for r in page) - post
+        hi = max(r[2] for r in page) + pre
+        return merge_windows(self.catalog.spans(table, camera, lo, hi, where), pre, post)
+
+    def _purge(self, rows: Sequence[Tuple], stats: Dict[str, Any], dry: bool) -> None:
+        if not rows:
+            return
+        t0 = time.perf_counter()
+        if not dry:
+            if self.delete_files:
+                for row in rows:
+                    path = Path(row[3])
+                    if self.root is not None and not path.is_absolute():
+                        path = self.root / path
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logger.warning("retention: cannot delete %s: %s", path, e)
+            self.catalog.delete("segments", [row[0] for row in rows])
+        stats["deleted"] += len(rows)
+        stats["bytes"] += sum(row[4] for row in rows)
+        stats["max_batch_ms"] = max(stats["max_batch_ms"], round((time.perf_counter() - t0) * 1000, 3))
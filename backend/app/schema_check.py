@@ -0,0 +1,229 @@
+"""Compile the Pydantic config models into plain checker functions.
+
+`compile_model(Model)` walks the model's fields once and returns a closure tree
+that checks a raw JSON value without constructing model instances. The rules
+come from config_schema.py: required fields, types, Optional, Literal,
+List/Dict, nested models and the numeric/length constraints set with
+Field()/conint(). Unknown keys are ignored, as in the models. Checks are
+strict: bool is not accepted as a number and strings are not coerced.
+`required` names fields that must be present even though the model gives them
+a default (the API keeps rules the models are more lenient about).
+
+A checker returns None when the value is valid, otherwise a list of
+(relative path tuple, message). Paths are only built on failure and every
+message is formatted at compile time, so the valid case allocates nothing.
+`errors(check, value, prefix)` turns the result into the API's
+`{"path": [...], "msg": "..."}` objects.
+"""
+from __future__ import annotations
+import types
+from typing import Annotated, Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple, Union, get_args, get_origin
+
+import annotated_types as at
+from pydantic import BaseModel
+
+Problems = List[Tuple[tuple, str]]
+Check = Callable[[Any], Optional[Problems]]
+
+
+def errors(check: Check, value: Any, prefix: list = ()) -> List[Dict[str, Any]]:  # type: ignore[assignment]
+    problems = check(value)
+    if not problems:
+        return []
+    return [{"path": [*prefix, *path], "msg": msg} for path, msg in problems]
+
+
+def _unwrap(tp: Any) -> Tuple[Any, List[Any]]:
+    meta: List[Any] = []
+    while get_origin(tp) is Annotated:
+        tp, *extra = get_args(tp)
+        meta.extend(extra)
+    return tp, meta
+
+
+def _bounds(meta: List[Any]) -> Dict[str, Any]:
+    b: Dict[str, Any] = {}
+    for m in meta:
+        if isinstance(m, at.Interval):
+            b.update({k: v for k, v in (("gt", m.gt), ("ge", m.ge), ("lt", m.lt), ("le", m.le)) if v is not None})
+        elif isinstance(m, (at.Gt, at.Ge, at.Lt, at.Le)):
+            name = type(m).__name__.lower()
+            b[name] = getattr(m, name)
+        elif isinstance(m, at.MinLen):
+            b["min_length"] = m.min_length
+        elif isinstance(m, at.MaxLen):
+            b["max_length"] = m.max_length
+        elif hasattr(m, "metadata"):   # pydantic FieldInfo-like wrapper
+            b.update(_bounds(list(m.metadata)))
+    return b
+
+
+def _range_text(kind: str, b: Dict[str, Any]) -> str:
+    lo = f"[{b['ge']}" if "ge" in b else f"({b['gt']}" if "gt" in b else None
+    hi = f"{b['le']}]" if "le" in b else f"{b['lt']})" if "lt" in b else None
+    if lo and hi:
+        return f"{kind} in {lo},{hi}"
+    if lo:
+        return f"{kind} {'>=' if lo[0] == '[' else '>'} {lo[1:]}"
+    if hi:
+        return f"{kind} {'<=' if hi[-1] == ']' else '<'} {hi[:-1]}"
+    return kind
+
+
+def _number(name: str, kind: str, accepted: Tuple[type, ...], b: Dict[str, Any]) -> Check:
+    fail = [((), f"{name} must be {_range_text(kind, b)}")]
+    ge, gt, le, lt = b.get("ge"), b.get("gt"), b.get("le"), b.get("lt")
+    if not b:
+        return lambda v: None if type(v) in accepted else fail
+
+    def check(v: Any) -> Optional[Problems]:
+        if (type(v) not in accepted
+                or (ge is not None and v < ge) or (gt is not None and v <= gt)
+                or (le is not None and v > le) or (lt is not None and v >= lt)):
+            return fail
+        return None
+
+    return check
+
+
+def _string(name: str, b: Dict[str, Any]) -> Check:
+    lo, hi = b.get("min_length", 0), b.get("max_length")
+    if lo == 1 and hi is None:
+        text = "non-empty string"
+    elif lo or hi is not None:
+        text = f"string of length {lo}..{'' if hi is None else hi}"
+    else:
+        text = "string"
+    fail = [((), f"{name} must be {text}")]
+    if not lo and hi is None:
+        return lambda v: None if type(v) is str else fail
+
+    def check(v: Any) -> Optional[Problems]:
+        if type(v) is not str or len(v) < lo or (hi is not None and len(v) > hi):
+            return fail
+        return None
+
+    return check
+
+
+def compile_model(model: type, name: str = "value", required: Iterable[str] = ()) -> Check:
+    required = set(required)
+    fields = []
+    for field_name, f in model.model_fields.items():
+        key = f.alias or field_name
+        fields.append((key, f.is_required() or key in required, compile_type(f.annotation, list(f.metadata), key)))
+    not_object = [((), f"{name} must be an object")]
+
+    def check(v: Any) -> Optional[Problems]:
+        if not isinstance(v, dict):
+            return not_object
+        out = None
+        for key, required, sub in fields:
+            if key in v:
+                r = sub(v[key])
+                if r:
+                    out = out or []
+                    out.extend(((key, *p), m) for p, m in r)
+            elif required:
+                out = out or []
+                out.append(((key,), f"{key} is required"))
+        return out
+
+    check.fields = {key: sub for key, _, sub in fields}  # type: ignore[attr-defined]
+    check.required = {key for key, req, _ in fields if req}  # type: ignore[attr-defined]
+    return check
+
+
+def compile_type(tp: Any, meta: List[Any] = (), name: str = "value") -> Check:  # type: ignore[assignment]
+    tp, extra = _unwrap(tp)
+    meta = [m for m in [*meta, *extra] if m is not None]
+    origin = get_origin(tp)
+
+    if origin in (Union, getattr(types, "UnionType", Union)):
+        args = [a for a in get_args(tp) if a is not type(None)]
+        nullable = len(args) < len(get_args(tp))
+        alts = [compile_type(a, meta, name) for a in args]
+        if nullable and len(alts) == 1:
+            (alt,) = alts
+            return lambda v: None if v is None else alt(v)
+        null = [((), f"{name} must not be null")]
+
+        def check_union(v: Any) -> Optional[Problems]:
+            if v is None:
+                return None if nullable else null
+            first = None
+            for alt in alts:
+                r = alt(v)
+                if not r:
+                    return None
+                first = first or r
+            return first
+
+        return check_union
+
+    if origin is Literal:
+        choices = {(type(c), c) for c in get_args(tp)}
+        text = ", ".join(repr(c) if not isinstance(c, str) else c for c in get_args(tp))
+        fail = [((), f"{name} must be one of: {text}")]
+
+        def check_literal(v: Any) -> Optional[Problems]:
+            try:
+                return None if (type(v), v) in choices else fail
+            except TypeError:   # unhashable value
+                return fail
+
+        return check_literal
+
+    if origin in (list, List):
+        (item_tp,) = get_args(tp) or (Any,)
+        item = compile_type(item_tp, (), name)
+        not_list = [((), f"{name} must be a list")]
+
+        def check_list(v: Any) -> Optional[Problems]:
+            if not isinstance(v, list):
+                return not_list
+            out = None
+            for i, x in enumerate(v):
+                r = item(x)
+                if r:
+                    out = out or []
+                    out.extend(((i, *p), m) for p, m in r)
+            return out
+
+        return check_list
+
+    if origin in (dict, Dict):
+        _, value_tp = get_args(tp) or (str, Any)
+        value = compile_type(value_tp, (), f"{name} value")
+        not_object = [((), f"{name} must be an object")]
+
+        def check_dict(v: Any) -> Optional[Problems]:
+            if not isinstance(v, dict):
+                return not_object
+            out = None
+            for k, x in v.items():
+                r = value(x)
+                if r:
+                    out = out or []
+                    out.extend(((k, *p), m) for p, m in r)
+            return out
+
+        check_dict.value = value  # type: ignore[attr-defined]
+        return check_dict
+
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        return compile_model(tp, name)
+
+    b = _bounds(meta)
+    if tp is bool:
+        fail = [((), f"{name} must be boolean")]
+        return lambda v: None if type(v) is bool else fail
+    if tp is int:
+        return _number(name, "integer", (int,), b)
+    if tp is float:
+        return _number(name, "number", (int, float), b)
+    if tp is str:
+        return _string(name, b)
+    if tp is Any:
+        return lambda v: None
+    raise TypeError(f"schema_check: unsupported annotation {tp!r}")
@@ -0,0 +1,179 @@
+"""Immutable, versioned config snapshots.
+
+The running config is a tree of FrozenDict/FrozenList (dict/list subclasses,
+so json.dumps, pydantic and `==` keep working) that readers share without
+copying. A new version is built copy-on-write: callers shallow-copy the levels
+they change and `freeze` reuses every subtree that is already frozen, so
+unchanged cameras are the same objects in consecutive versions.
+"""
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+
+_MISSING = object()
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only; build a new version instead")
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    setdefault = pop = popitem = clear = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def _identical(a: Any, b: Any) -> bool:
+    """For two `==` trees: also the same key order and the same scalar types
+    (`==` treats 1, 1.0 and True as equal)."""
+    if a is b:
+        return True
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(_identical(v, b[k]) for k, v in a.items())
+    if isinstance(a, (list, tuple)):
+        return all(_identical(x, y) for x, y in zip(a, b))
+    return type(a) is type(b)
+
+
+def freeze(obj: Any, base: Any = None) -> Any:
+    """Return an immutable version of `obj`.
+
+    Already-frozen subtrees are returned as-is. If `base` (the previous version
+    of the same subtree) is given, subtrees equal to it (same types and key
+    order too) are replaced by the frozen `base` objects so they stay shared
+    between versions.
+    """
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        if isinstance(base, FrozenDict) and obj == base and _identical(obj, base):
+            return base
+        sub = base if isinstance(base, dict) else {}
+        return FrozenDict({k: freeze(v, sub.get(k)) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        if isinstance(base, FrozenList) and len(obj) == len(base) and list(obj) == base and _identical(obj, base):
+            return base
+        sub = base if isinstance(base, list) else []
+        return FrozenList(freeze(v, sub[i] if i < len(sub) else None) for i, v in enumerate(obj))
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Deep, mutable plain-dict/list copy of a (possibly frozen) tree."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+class ConfigSnapshot:
+    """One committed version of the running config.
+
+    Serialized forms are computed lazily and cached on the snapshot itself, so
+    they live exactly as long as the version does: a new version (apply,
+    rollback, reset) starts with an empty cache.
+
+    `camera_versions` maps every camera key to the version that last changed
+    it (added, edited or removed: removed keys stay as tombstones);
+    `rest_version` is the version that last changed anything outside
+    `cameras`. Both follow from the structure sharing: a camera that is the
+    same object as in the previous version is unchanged.
+    """
+
+    __slots__ = ("version", "data", "created", "camera_versions", "rest_version",
+                 "_body", "_gzip", "_pretty", "_hash")
+
+    def __init__(self, version: int, data: FrozenDict, created: Optional[float] = None,
+                 camera_versions: Optional[Dict[str, int]] = None, rest_version: Optional[int] = None) -> None:
+        self.version = version
+        self.data = data
+        self.created = created if created is not None else time.time()
+        if camera_versions is None:
+            cams = data.get("cameras")
+            camera_versions = dict.fromkeys(cams if isinstance(cams, dict) else (), version)
+        self.camera_versions = camera_versions
+        self.rest_version = version if rest_version is None else rest_version
+        self._body: Optional[bytes] = None
+        self._gzip: Optional[bytes] = None
+        self._pretty: Optional[bytes] = None
+        self._hash: Optional[str] = None
+
+    def next(self, data: Dict[str, Any]) -> "ConfigSnapshot":
+        """Build the following version, sharing unchanged subtrees with this one."""
+        version = self.version + 1
+        new = freeze(data, self.data)
+        old_cams, new_cams = self.data.get("cameras"), new.get("cameras")
+        old_cams = old_cams if isinstance(old_cams, dict) else {}
+        new_cams = new_cams if isinstance(new_cams, dict) else {}
+        versions = self.camera_versions
+        if new_cams is not old_cams:
+            changed = [key for key, cam in new_cams.items() if old_cams.get(key) is not cam]
+            changed += [key for key in old_cams if key not in new_cams]
+            if changed:
+                versions = {**versions, **dict.fromkeys(changed, version)}
+        rest = self.rest_version
+        if any(k != "cameras" and new.get(k, _MISSING) is not self.data.get(k, _MISSING)
+               for k in new.keys() | self.data.keys()):
+            rest = version
+        return ConfigSnapshot(version, new, camera_versions=versions, rest_version=rest)
+
+    @property
+    def body(self) -> bytes:
+        """Compact JSON, byte-identical to what FastAPI's JSONResponse would send."""
+        if self._body is None:
+            self._body = json.dumps(self.data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self._body
+
+    @property
+    def gzip_body(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzip
+
+    @property
+    def pretty_body(self) -> bytes:
+        """Indented JSON, same layout as data/config.json (used by export)."""
+        if self._pretty is None:
+            self._pretty = json.dumps(self.data, indent=2).encode("utf-8")
+        return self._pretty
+
+    @property
+    def content_hash(self) -> str:
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.body).hexdigest()[:32]
+        return self._hash
+
+    def etag(self, variant: str = "") -> str:
+        """Strong ETag for one representation (variant: "", "gz", "export")."""
+        return f'"{self.content_hash}-{variant}"' if variant else f'"{self.content_hash}"'
@@ -1,16 +1,55 @@
 from __future__ import annotations
 import json
+import os
 from pathlib import Path
 from typing import Optional, Dict, Any, List
-from datetime import datetime
 
 CONFIG_PATH = Path("data/config.json")
 BACKUP_DIR = Path("data/backups")
-MAX_KEEP = 5  # максимум 5 бекъпа
+MAX_KEEP = 5000  # версии в историята (дедупликирани, евтини)
+_STORE = None
 
-def _ts() -> str:
-    # пример: 2025-08-10_18-03-45
-    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+def atomic_write(path: Path, data: bytes) -> None:
+    """Атомарен запис: temp файл в същата директория + fsync + rename.
+    При срив на диска остава или старото, или новото съдържание — никога половин файл."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    # rename-ът е траен едва след fsync на директорията (POSIX)
+    fsync_dir(path.parent)
+
+def fsync_dir(directory: Path) -> None:
+    """fsync на директория: прави трайни create/rename в нея (без ефект, където не се поддържа)."""
+    try:
+        dfd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dfd)
+
+def cleanup_tmp(directory: Path) -> None:
+    """Маха останали temp файлове от прекъснат atomic_write."""
+    for p in Path(directory).glob(".*.tmp"):
+        try:
+            p.unlink()
+        except OSError:
+            pass
 
 def load_config() -> Optional[Dict[str, Any]]:
     if CONFIG_PATH.exists():
@@ -23,38 +62,23 @@ def load_config() -> Optional[Dict[str, Any]]:
 def save_config(cfg: Dict[str, Any]) -> None:
     """Записва активния конфиг на диск (без да прави нов бекъп)."""
     CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    CONFIG_PATH.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
+    atomic_write(CONFIG_PATH, json.dumps(cfg, ensure_ascii=False, indent=2).encode("utf-8"))
+
+def _store():
+    """Споделен BackupStore върху BACKUP_DIR (lazy — backup_store импортира този модул)."""
+    global _STORE
+    if _STORE is None:
+        from .backup_store import BackupStore
+        _STORE = BackupStore(BACKUP_DIR, max_versions=MAX_KEEP)
+    return _STORE
 
 def create_backup(cfg: Dict[str, Any]) -> str:
-    """Създава бекъп (с timestamp име) и подрязва старите. Връща името на файла."""
-    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
-    name = f"{_ts()}.json"
-    p = BACKUP_DIR / name
-    p.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
-    _prune_backups(MAX_KEEP)
-    return name
+    """Създава бекъп в content-addressed store-а. Връща id на версията."""
+    return _store().put(cfg)["id"]
 
 def list_backups() -> List[str]:
-    if not BACKUP_DIR.exists():
-        return []
-    files = [p.name for p in BACKUP_DIR.glob("*.json")]
-    files.sort()  # най-старите първи, най-новият е files[-1]
-    return files
+    # най-старите първи, най-новият е [-1]; чете само индекса
+    return _store().ids()
 
 def load_backup(name: str) -> Optional[Dict[str, Any]]:
-    p = BACKUP_DIR / name
-    if not p.exists() or not p.is_file():
-        return None
-    try:
-        return json.loads(p.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-
-def _prune_backups(max_keep: int) -> None:
-    files = sorted(BACKUP_DIR.glob("*.json"))
-    excess = len(files) - max_keep
-    for i in range(excess):
-        try:
-            files[i].unlink(missing_ok=True)
-        except Exception:
-            pass
+    return _store().load(name)
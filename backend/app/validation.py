@@ -0,0 +1,201 @@
+"""Config validation with per-camera memoisation.
+
+The rules are those of config_schema.RootConfig, compiled once at import into
+plain checker functions (schema_check.py), so no model instances are built.
+
+`ConfigValidator` remembers the result of the per-camera check under a content
+hash of the camera subtree, so re-validating a config after a small edit only
+checks the cameras that are new or changed. Cameras that are the very same
+object as in the previously validated config (frozen snapshots share unchanged
+cameras), or equal to it with the same value types, are not even hashed.
+
+Cross-camera checks (duplicate names, duplicate stream URLs) are answered from
+indexes that are updated only for the cameras that changed. Duplicates are
+reported as warnings, not errors: cloning a camera legitimately produces them.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .config_schema import RootConfig
+from .diff import json_equal
+from .metrics import timed
+from .schema_check import compile_model, errors as _errors
+from .snapshot import FrozenDict
+
+Errors = List[Dict[str, Any]]
+MAX_LISTED = 5   # other camera keys named in one duplicate warning
+
+
+# Compiled once from config_schema.RootConfig (see schema_check.py). RootConfig
+# defaults mqtt, but the API has always rejected a config without it
+_ROOT = compile_model(RootConfig, "config", required={"mqtt"})
+_CAMERA = _ROOT.fields["cameras"].value
+_REST = [(k, c) for k, c in _ROOT.fields.items() if k != "cameras"]
+
+
+def validate_rest(cfg: dict) -> Errors:
+    """Errors for every top-level section except `cameras` (mqtt, ...)."""
+    errors: Errors = []
+    for key, check in _REST:
+        if key in cfg:
+            errors.extend(_errors(check, cfg[key], [key]))
+        elif key in _ROOT.required:
+            errors.append({"path": [key], "msg": f"{key} is required"})
+    return errors
+
+
+def camera_errors(cam: Any) -> Errors:
+    """Errors for one camera value, with paths relative to the camera."""
+    return _errors(_CAMERA, cam)
+
+
+def validate_camera(key: Any, cam: Any) -> Errors:
+    """Errors for a single camera entry (cameras[key])."""
+    if not isinstance(key, str) or not key:
+        return [{"path": ["cameras"], "msg": "camera key must be string"}]
+    return _errors(_CAMERA, cam, ["cameras", key])
+
+
+def _content_hash(cam: Any) -> str:
+    raw = json.dumps(cam, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _name_url(cam: Any) -> Tuple[Optional[str], Optional[str]]:
+    if not isinstance(cam, dict):
+        return None, None
+    name = cam.get("name")
+    ff = cam.get("ffmpeg")
+    url = ff.get("url") if isinstance(ff, dict) else None
+    return (name if isinstance(name, str) and name else None), (url if isinstance(url, str) and url else None)
+
+
+class _Index:
+    """value -> camera keys using it, plus the set of values used more than once."""
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, Set[str]] = {}
+        self.dups: Set[str] = set()
+
+    def add(self, value: Optional[str], key: str) -> None:
+        if value is None:
+            return
+        keys = self.keys.setdefault(value, set())
+        keys.add(key)
+        if len(keys) > 1:
+            self.dups.add(value)
+
+    def remove(self, value: Optional[str], key: str) -> None:
+        keys = self.keys.get(value) if value is not None else None
+        if not keys:
+            return
+        keys.discard(key)
+        if len(keys) < 2:
+            self.dups.discard(value)
+        if not keys:
+            del self.keys[value]
+
+
+class ConfigValidator:
+    """Validates whole configs, re-checking only cameras that changed since the
+    previous call. Thread-safe; one instance serves the whole app."""
+
+    def __init__(self, check_camera: Callable[[Any], Errors] = camera_errors, max_cached: int = 100_000) -> None:
+        self.check_camera = check_camera
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._results: Dict[str, Errors] = {}   # content hash -> relative errors
+        # camera key -> (camera object, content hash, name, url) as last validated
+        self._seen: Dict[str, Tuple[Any, str, Optional[str], Optional[str]]] = {}
+        self._names = _Index()
+        self._urls = _Index()
+
+    def validate(self, cfg: dict, cameras: Optional[Set[str]] = None) -> Errors:
+        return self.check(cfg, cameras, warnings=False)[0]
+
+    @timed("validate")
+    def check(self, cfg: dict, cameras: Optional[Set[str]] = None, warnings: bool = True) -> Tuple[Errors, Errors]:
+        """Return (errors, warnings). Empty errors means OK.
+        `cameras` limits the reported per-camera errors to those keys (None = all).
+        """
+        errors: Errors = []
+        if not isinstance(cfg, dict):
+            return [{"path": [], "msg": "config must be an object"}], []
+
+        errors.extend(validate_rest(cfg))
+
+        # cameras
+        cams = cfg.get("cameras")
+        if cams is None:
+            errors.append({"path": ["cameras"], "msg": "cameras is required"})
+            return errors, []
+        if not isinstance(cams, dict):
+            errors.append({"path": ["cameras"], "msg": "cameras must be an object"})
+            return errors, []
+
+        with self._lock:
+            self._sync(cams)
+            keys = cams.keys() if cameras is None else [k for k in cameras if k in cams]
+            for key in keys:
+                if not isinstance(key, str) or not key:
+                    errors.append({"path": ["cameras"], "msg": "camera key must be string"})
+                    continue
+                for e in self._results.get(self._seen[key][1], ()):
+                    errors.append({"path": ["cameras", key, *e["path"]], "msg": e["msg"]})
+            dups = self._duplicates() if warnings else []
+        return errors, dups
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _sync(self, cams: Dict[str, Any]) -> None:
+        """Bring the memo and indexes in line with `cams`."""
+        for key in self._seen.keys() - cams.keys():
+            _, _, name, url = self._seen.pop(key)
+            self._names.remove(name, key)
+            self._urls.remove(url, key)
+        if len(self._results) > self.max_cached:
+            self._results.clear()
+            self._seen.clear()
+            self._names = _Index()
+            self._urls = _Index()
+        for key, cam in cams.items():
+            prev = self._seen.get(key)
+            # identity is only trusted for frozen cameras; plain dicts may have been mutated
+            if prev is not None and prev[0] is cam and isinstance(cam, FrozenDict):
+                continue
+            # fresh JSON (validate/import): an equality check against the previous
+            # value is far cheaper than serializing it for the hash. Type-strict:
+            # `==` alone would let {"enabled": 1} reuse the result for `true`
+            if prev is not None and isinstance(prev[0], FrozenDict) and json_equal(cam, prev[0]):
+                continue
+            h = _content_hash(cam)
+            if h not in self._results:
+                self._results[h] = self.check_camera(cam)
+            name, url = _name_url(cam)
+            if prev is not None:
+                if prev[2] != name:
+                    self._names.remove(prev[2], key)
+                    self._names.add(name, key)
+                if prev[3] != url:
+                    self._urls.remove(prev[3], key)
+                    self._urls.add(url, key)
+            else:
+                self._names.add(name, key)
+                self._urls.add(url, key)
+            self._seen[key] = (cam, h, name, url)
+
+    def _duplicates(self) -> Errors:
+        warnings: Errors = []
+        for field, index, path in (("name", self._names, ["name"]), ("stream URL", self._urls, ["ffmpeg", "url"])):
+            for value in sorted(index.dups):
+                keys = sorted(index.keys[value])
+                for key in keys:
+                    others = [k for k in keys[:MAX_LISTED + 1] if k != key][:MAX_LISTED]
+                    more = len(keys) - 1 - len(others)
+                    listed = ", ".join(others) + (f" and {more} more" if more else "")
+                    warnings.append({"path": ["cameras", key, *path], "msg": f"duplicate {field}, also used by {listed}"})
+        return warnings
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from typing import Any, Optional
 
 class Worker(ABC):
     @abstractmethod
@@ -10,3 +11,26 @@ class Worker(ABC):
     def apply_update(self, *args, **kwargs) -> None: ...
     @abstractmethod
     def graceful_restart(self, *args, **kwargs) -> None: ...
+
+
+class CameraState:
+    """Per-camera data compiled from `self.cfg` on first use.
+
+    Workers call `_invalidate(new_cfg)` before taking a new config; only the
+    parts whose inputs changed are dropped and recompiled on next use.
+    """
+    cfg: Any
+    _zones: Optional[Any] = None
+
+    def compiled_zones(self, raster: bool = False) -> Any:
+        """The camera's zones as geometry.CompiledZones (needs numpy)."""
+        if self._zones is None or (raster and self._zones.mask is None):
+            from ..geometry import compile_zones
+            ff = self.cfg.ffmpeg
+            self._zones = compile_zones(self.cfg.zones, ff.width, ff.height, raster)
+        return self._zones
+
+    def _invalidate(self, cfg: Any) -> None:
+        if (cfg.zones != self.cfg.zones or cfg.ffmpeg.width != self.cfg.ffmpeg.width
+                or cfg.ffmpeg.height != self.cfg.ffmpeg.height):
+            self._zones = None
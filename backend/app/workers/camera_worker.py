@@ -1,9 +1,9 @@
 from __future__ import annotations
 import threading, time
-from .base import Worker
+from .base import CameraState, Worker
 from ..config_schema import CameraConfig
 
-class CameraWorker(Worker):
+class CameraWorker(CameraState, Worker):
     def __init__(self, cfg: CameraConfig):
         self.cfg = cfg
         self._t = None
@@ -27,11 +27,14 @@ class CameraWorker(Worker):
             self._t = None
 
     def apply_update(self, cfg: CameraConfig) -> None:
+        self._invalidate(cfg)
+        self.cfg.name = cfg.name
         self.cfg.zones = cfg.zones
         self.cfg.detection = cfg.detection
         self.cfg.retention = cfg.retention
 
     def graceful_restart(self, cfg: CameraConfig) -> None:
         self.stop()
+        self._invalidate(cfg)
         self.cfg = cfg
         self.start()
@@ -0,0 +1,198 @@
+"""Keep one camera worker per enabled camera in sync with the running config.
+
+The reconciler is a ConfigManager listener: every committed version is handed
+to a background thread (bursts coalesce to the newest version) which diffs the
+cameras against what the workers currently run and takes the cheapest action
+per camera:
+
+  start    new (or newly enabled) camera
+  stop     deleted (or disabled) camera
+  update   zones / detection / retention / name changed -> worker.apply_update
+  restart  ffmpeg changed -> worker.graceful_restart
+  (none)   unchanged camera; with snapshot sharing this is an identity check
+
+So the work per version scales with what changed, not with the fleet size.
+Each pass produces a report with per-action counts, keys and timings.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .base import Worker
+from .camera_worker import CameraWorker
+from ..config_schema import CameraConfig
+
+logger = logging.getLogger("hotreload")
+
+ACTIONS = ("start", "stop", "update", "restart")
+MAX_LISTED = 50   # keys listed per action in a report
+
+# camera fields that need the stream reopened; everything else is hot-updated
+RESTART_FIELDS = ("ffmpeg",)
+
+
+def _enabled(cam: Any) -> bool:
+    return isinstance(cam, dict) and cam.get("enabled", True) is not False
+
+
+def plan(running: Dict[str, Any], cameras: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Per-action camera keys to go from `running` (key -> camera config the
+    worker runs) to `cameras` (the new config's cameras)."""
+    out: Dict[str, List[str]] = {a: [] for a in ACTIONS}
+    for key, cam in cameras.items():
+        old = running.get(key)
+        if old is cam:
+            continue
+        if not _enabled(cam):
+            if old is not None:
+                out["stop"].append(key)
+        elif old is None:
+            out["start"].append(key)
+        elif old != cam:
+            restart = any(old.get(f) != cam.get(f) for f in RESTART_FIELDS)
+            out["restart" if restart else "update"].append(key)
+    out["stop"].extend(k for k in running if k not in cameras)
+    return out
+
+
+class Reconciler:
+    def __init__(self, factory: Callable[[CameraConfig], Worker] = CameraWorker) -> None:
+        self.factory = factory
+        self.workers: Dict[str, Worker] = {}
+        self._running: Dict[str, Any] = {}   # key -> camera config the worker was given
+        self._cond = threading.Condition()
+        self._target: Optional[Any] = None   # newest snapshot not reconciled yet
+        self._done_version = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.stats = {"passes": 0, **{a: 0 for a in ACTIONS}, "errors": 0}
+        self._post: Optional[Any] = None
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    @property
+    def postprocessor(self) -> Any:
+        """detection.PostProcessor over these workers (needs numpy); thresholds
+        follow each worker's cfg.detection, so apply_update changes them."""
+        if self._post is None:
+            from ..detection import PostProcessor
+            self._post = PostProcessor(self.workers)
+        return self._post
+
+    @property
+    def version(self) -> int:
+        """Newest config version the workers have been reconciled to."""
+        return self._done_version
+
+    def submit(self, old: Any, new: Any) -> None:
+        """ConfigManager listener: queue `new` (a ConfigSnapshot) for reconciling."""
+        with self._cond:
+            if self._closed:
+                return
+            self._target = new
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="worker-reconciler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def wait(self, version: int, timeout: Optional[float] = 10.0) -> bool:
+        """Block until workers run `version` (or a newer one)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done_version >= version or self._closed, timeout) \
+                and self._done_version >= version
+
+    def reconcile(self, cameras: Dict[str, Any], version: Optional[int] = None) -> Dict[str, Any]:
+        """One pass; normally run by the background thread."""
+        t0 = time.perf_counter()
+        todo = plan(self._running, cameras)
+        plan_ms = (time.perf_counter() - t0) * 1000
+        timings: Dict[str, Dict[str, float]] = {}
+        errors: List[Dict[str, str]] = []
+        for action in ACTIONS:
+            keys = todo[action]
+            if not keys:
+                continue
+            total = worst = 0.0
+            for key in keys:
+                a0 = time.perf_counter()
+                try:
+                    self._do(action, key, cameras.get(key))
+                except Exception as e:
+                    errors.append({"key": key, "action": action, "error": str(e)})
+                    logger.warning("worker %s %s failed: %s", action, key, e)
+                dt = (time.perf_counter() - a0) * 1000
+                total += dt
+                worst = max(worst, dt)
+            timings[action] = {"count": len(keys), "total_ms": round(total, 3), "max_ms": round(worst, 3)}
+        self.stats["passes"] += 1
+        self.stats["errors"] += len(errors)
+        for action in ACTIONS:
+            self.stats[action] += len(todo[action])
+        report = {
+            "version": version,
+            "workers": len(self.workers),
+            "actions": {a: keys[:MAX_LISTED] for a, keys in todo.items() if keys},
+            "timings": timings,
+            "plan_ms": round(plan_ms, 3),
+            "total_ms": round((time.perf_counter() - t0) * 1000, 3),
+            "errors": errors,
+        }
+        self.last_report = report
+        if any(todo.values()):
+            logger.info("workers reconciled to v%s: %s in %.1f ms", version,
+                        ", ".join(f"{a} {t['count']}" for a, t in timings.items()), report["total_ms"])
+        return report
+
+    def close(self) -> None:
+        """Stop the reconciler thread and every worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for key in list(self.workers):
+            try:
+                self._do("stop", key, None)
+            except Exception:
+                logger.exception("stopping worker %s failed", key)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _do(self, action: str, key: str, cam: Any) -> None:
+        if action == "stop":
+            worker = self.workers.pop(key, None)
+            self._running.pop(key, None)
+            if worker:
+                worker.stop()
+            return
+        cfg = CameraConfig.model_validate(cam)
+        if action == "start":
+            worker = self.factory(cfg)
+            worker.start()
+            self.workers[key] = worker
+        elif action == "update":
+            self.workers[key].apply_update(cfg)
+        else:
+            self.workers[key].graceful_restart(cfg)
+        self._running[key] = cam
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._target is not None or self._closed)
+                if self._closed:
+                    return
+                snap, self._target = self._target, None
+            try:
+                self.reconcile(snap.data.get("cameras") or {}, snap.version)
+            except Exception:
+                logger.exception("worker reconcile of version %s failed", snap.version)
+            with self._cond:
+                self._done_version = max(self._done_version, snap.version)
+                self._cond.notify_all()
@@ -0,0 +1,166 @@
+"""Event-driven camera worker runtime.
+
+`CameraWorker` (camera_worker.py) costs one OS thread per camera that polls
+every 0.5 s, and `stop()` waits for the poll to come round. Here every
+worker is an asyncio task on one event loop that owns one thread, no matter
+how many cameras there are. A worker sleeps on an asyncio.Event and only
+wakes for stop / update / restart, so an idle fleet costs no CPU and a stop
+completes within one loop iteration.
+
+The Worker methods stay synchronous (the reconciler thread calls them) and
+return once the loop has carried the action out.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Coroutine, Optional, Set
+
+from .base import CameraState, Worker
+from ..config_schema import CameraConfig
+
+logger = logging.getLogger("hotreload")
+
+
+class WorkerRuntime:
+    """One asyncio loop, on one thread, hosting every camera worker."""
+
+    def __init__(self, call_timeout: float = 10.0) -> None:
+        self.call_timeout = call_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()   # live worker tasks, loop thread only
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def worker(self, cfg: CameraConfig) -> "AsyncCameraWorker":
+        """Worker factory (for Reconciler)."""
+        return AsyncCameraWorker(cfg, self)
+
+    def call(self, fn: Callable[..., Coroutine[Any, Any, Any]], *args: Any) -> Any:
+        """Run coroutine function `fn(*args)` on the runtime loop and wait for it."""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("WorkerRuntime.call from the runtime thread would deadlock")
+        return asyncio.run_coroutine_threadsafe(fn(*args), loop).result(self.call_timeout)
+
+    def close(self) -> None:
+        """Stop every worker task, then the loop and its thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_all(), loop).result(self.call_timeout)
+        except Exception:
+            logger.exception("worker runtime shutdown failed")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout=5)
+        loop.close()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._serve, args=(loop,), name="worker-runtime", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def _spawn(self, coro: Coroutine[Any, Any, None]) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _cancel_all(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncCameraWorker(CameraState, Worker):
+    """CameraWorker semantics on a WorkerRuntime task."""
+
+    def __init__(self, cfg: CameraConfig, runtime: WorkerRuntime) -> None:
+        self.cfg = cfg
+        self.generation = 0   # bumped on every update so the run loop can tell
+        self._runtime = runtime
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._runtime.call(self._start)
+
+    def stop(self) -> None:
+        self._runtime.call(self._stop)
+
+    def apply_update(self, cfg: CameraConfig) -> None:
+        self._runtime.call(self._update, cfg)
+
+    def graceful_restart(self, cfg: CameraConfig) -> None:
+        self._runtime.call(self._restart, cfg)
+
+    # ------------------------------------------------------------------
+    # Loop side
+    # ------------------------------------------------------------------
+    async def _run(self) -> None:
+        wake = self._wake
+        assert wake is not None
+        seen = self.generation
+        while not self._stopping:
+            await wake.wait()
+            wake.clear()
+            if self.generation != seen:
+                seen = self.generation   # new zones/detection/retention take effect here
+
+    async def _start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = self._runtime._spawn(self._run())
+
+    async def _stop(self) -> None:
+        task = self._task
+        if task is None:
+            return
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        await asyncio.gather(task, return_exceptions=True)
+        self._task = None
+
+    async def _update(self, cfg: CameraConfig) -> None:
+        self._invalidate(cfg)
+        self.cfg.name = cfg.name
+        self.cfg.zones = cfg.zones
+        self.cfg.detection = cfg.detection
+        self.cfg.retention = cfg.retention
+        self.generation += 1
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _restart(self, cfg: CameraConfig) -> None:
+        await self._stop()
+        self._invalidate(cfg)
+        self.cfg = cfg
+        await self._start()
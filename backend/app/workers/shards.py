@@ -0,0 +1,381 @@
+"""Camera workers sharded across worker processes.
+
+With in-process workers the API, the WebSocket bus and every camera share one
+interpreter and one GIL. `ShardSupervisor` runs the cameras in a pool of
+`spawn`ed processes instead, each with its own WorkerRuntime + Reconciler
+(runtime.py, reconciler.py), so per-frame work saturates the other cores
+while the API process stays responsive.
+
+- Cameras are assigned to shards by consistent hashing of the camera key
+  (`HashRing`), so resizing the pool moves only ~1/N of the cameras.
+- On each committed version the supervisor sends every shard only the
+  cameras that changed for it (`("apply", version, upserts, removes)` over a
+  Pipe); the shard reconciles locally and answers with its report.
+- A shard that dies (or stops answering) is restarted and re-sent the full
+  state of its own cameras; the other shards are not touched.
+
+It is a drop-in for Reconciler (ConfigManager listener, wait/version/stats/
+last_report/close); everything runs on one supervisor thread.
+"""
+from __future__ import annotations
+import bisect
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .reconciler import ACTIONS, MAX_LISTED, Reconciler
+
+logger = logging.getLogger("hotreload")
+
+Delta = Tuple[Dict[str, Any], List[str]]   # (upserts, removes)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring of shard ids with `vnodes` points per shard."""
+
+    def __init__(self, shards: Iterable[int] = (), vnodes: int = 64) -> None:
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[int] = []
+        self._shards: set = set()
+        for shard in shards:
+            self.add(shard)
+
+    @property
+    def shards(self) -> List[int]:
+        return sorted(self._shards)
+
+    def add(self, shard: int) -> None:
+        if shard in self._shards:
+            return
+        self._shards.add(shard)
+        for v in range(self.vnodes):
+            point = _hash(f"{shard}#{v}")
+            i = bisect.bisect(self._points, point)
+            self._points.insert(i, point)
+            self._owners.insert(i, shard)
+
+    def remove(self, shard: int) -> None:
+        if shard not in self._shards:
+            return
+        self._shards.discard(shard)
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != shard]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def owner(self, key: str) -> int:
+        if not self._points:
+            raise LookupError("hash ring has no shards")
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[i]
+
+
+def _load(path: str) -> Callable[..., Any]:
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _shard_main(conn: Any, shard_id: int, factory_path: Optional[str]) -> None:
+    """Entry point of a shard process."""
+    from .runtime import WorkerRuntime   # imported here: the parent may not need it
+
+    runtime = WorkerRuntime()
+    reconciler = Reconciler(factory=_load(factory_path) if factory_path else runtime.worker)
+    cameras: Dict[str, Any] = {}
+    try:
+        while True:
+            msg = conn.recv()
+            if msg[0] == "apply":
+                _, version, upserts, removes = msg
+                cameras.update(upserts)
+                for key in removes:
+                    cameras.pop(key, None)
+                conn.send(("report", reconciler.reconcile(cameras, version)))
+            elif msg[0] == "stop":
+                break
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass   # supervisor gone
+    finally:
+        reconciler.close()
+        runtime.close()
+
+
+class _Shard:
+    __slots__ = ("id", "proc", "conn", "workers", "restarts")
+
+    def __init__(self, shard_id: int) -> None:
+        self.id = shard_id
+        self.proc: Any = None
+        self.conn: Any = None
+        self.workers = 0
+        self.restarts = 0
+
+
+class ShardSupervisor:
+    def __init__(self, shards: int = 0, factory: Optional[str] = None,
+                 reply_timeout: float = 30.0, check_interval: float = 0.5) -> None:
+        """`shards=0` uses one shard per CPU core but one (left to the API).
+        `factory` is an optional "module:callable" worker factory, resolved in
+        each shard (the default is the shard's WorkerRuntime)."""
+        self.factory = factory
+        self.reply_timeout = reply_timeout
+        self.check_interval = check_interval
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ring = HashRing()
+        self._shards: Dict[int, _Shard] = {}
+        self._cameras: Dict[str, Any] = {}   # cameras of the last dispatched version
+        self._owner: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._target: Optional[Any] = None
+        self._count = max(1, shards or (os.cpu_count() or 2) - 1)
+        self._resize: Optional[int] = self._count
+        self._resize_req = 1   # resize requests so far / handled so far
+        self._resized = 0
+        self._done_version = 0
+        self._closed = False
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.stats = {"passes": 0, **{a: 0 for a in ACTIONS}, "errors": 0, "moved": 0, "shard_restarts": 0}
+        self._thread = threading.Thread(target=self._loop, name="shard-supervisor", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return sum(s.workers for s in list(self._shards.values()))
+
+    @property
+    def version(self) -> int:
+        return self._done_version
+
+    def submit(self, old: Any, new: Any) -> None:
+        """ConfigManager listener: queue `new` (a ConfigSnapshot) for the shards."""
+        with self._cond:
+            if not self._closed:
+                self._target = new
+                self._cond.notify_all()
+
+    def wait(self, version: int, timeout: Optional[float] = 10.0) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done_version >= version or self._closed, timeout) \
+                and self._done_version >= version
+
+    def resize(self, shards: int, timeout: Optional[float] = 30.0) -> bool:
+        """Grow or shrink the pool, moving only the cameras whose owner changes."""
+        with self._cond:
+            self._resize_req += 1
+            mine = self._resize_req
+            self._resize = max(1, shards)
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._resized >= mine or self._closed, timeout)
+
+    def shard_info(self) -> List[Dict[str, Any]]:
+        counts: Dict[int, int] = {}
+        for owner in list(self._owner.values()):
+            counts[owner] = counts.get(owner, 0) + 1
+        return [
+            {"shard": s.id, "pid": s.proc.pid if s.proc else None, "alive": bool(s.proc and s.proc.is_alive()),
+             "cameras": counts.get(s.id, 0), "workers": s.workers, "restarts": s.restarts}
+            for s in sorted(list(self._shards.values()), key=lambda s: s.id)
+        ]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=self.reply_timeout)
+        for shard in list(self._shards.values()):
+            self._stop(shard)
+        self._shards.clear()
+
+    # ------------------------------------------------------------------
+    # Supervisor thread
+    # ------------------------------------------------------------------
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._target is not None or self._resize is not None or self._closed,
+                                    self.check_interval)
+                if self._closed:
+                    return
+                snap, self._target = self._target, None
+                resize, self._resize = self._resize, None
+                req = self._resize_req
+            try:
+                if resize is not None:
+                    self._do_resize(resize)
+                self._check_shards()
+                if snap is not None and not self._shards:
+                    with self._cond:   # no shard could be started; retry on the next pass
+                        self._target = self._target or snap
+                    snap = None
+                if snap is not None:
+                    self._sync(snap)
+            except Exception:
+                logger.exception("shard supervisor pass failed")
+            with self._cond:
+                if resize is not None:
+                    self._resized = req
+                if snap is not None:
+                    self._done_version = max(self._done_version, snap.version)
+                self._cond.notify_all()
+
+    def _sync(self, snap: Any) -> None:
+        cameras = snap.data.get("cameras") or {}
+        deltas: Dict[int, Delta] = {}
+        for key, cam in cameras.items():
+            if self._cameras.get(key) is not cam:
+                owner = self._owner[key] = self._ring.owner(key)
+                deltas.setdefault(owner, ({}, []))[0][key] = cam
+        for key in self._cameras:
+            if key not in cameras:
+                deltas.setdefault(self._owner.pop(key), ({}, []))[1].append(key)
+        self._cameras = cameras
+        self._dispatch(deltas, snap.version)
+
+    def _do_resize(self, count: int) -> None:
+        self._count = count
+        current = sorted(self._shards)
+        added = []
+        removed = [i for i in current if i >= count]
+        for sid in range(count):
+            if sid in self._shards:
+                continue
+            try:
+                self._shards[sid] = self._spawn(_Shard(sid))
+            except Exception:
+                logger.exception("could not start camera shard %d", sid)
+                continue
+            self._ring.add(sid)
+            added.append(sid)
+        for sid in removed:
+            self._ring.remove(sid)
+        deltas: Dict[int, Delta] = {}
+        moved = 0
+        for key, old in list(self._owner.items()):
+            new = self._ring.owner(key)
+            if new == old:
+                continue
+            moved += 1
+            self._owner[key] = new
+            deltas.setdefault(new, ({}, []))[0][key] = self._cameras[key]
+            if old not in removed:
+                deltas.setdefault(old, ({}, []))[1].append(key)
+        self.stats["moved"] += moved
+        if deltas:
+            self._dispatch(deltas, self._done_version)
+        for sid in removed:
+            self._stop(self._shards.pop(sid))
+        logger.info("camera shards: %d (+%d, -%d), %d cameras moved", len(self._shards), len(added), len(removed), moved)
+
+    def _dispatch(self, deltas: Dict[int, Delta], version: int) -> None:
+        t0 = time.perf_counter()
+        sent: List[_Shard] = []
+        reports: Dict[int, Dict[str, Any]] = {}
+        for sid, (upserts, removes) in deltas.items():
+            shard = self._shards[sid]
+            try:
+                shard.conn.send(("apply", version, upserts, removes))
+                sent.append(shard)
+            except (OSError, EOFError, ValueError):
+                reports[sid] = self._restart(shard, version)
+        for shard in sent:   # shards work in parallel; collect afterwards
+            report = self._recv(shard)
+            reports[shard.id] = report if report is not None else self._restart(shard, version)
+        self._merge(reports, version, t0)
+
+    def _check_shards(self) -> None:
+        if len(self._shards) < self._count:
+            self._do_resize(self._count)
+        for shard in list(self._shards.values()):
+            if not shard.proc.is_alive():
+                logger.warning("camera shard %d died (exit code %s); restarting", shard.id, shard.proc.exitcode)
+                self._merge({shard.id: self._restart(shard, self._done_version)}, self._done_version, time.perf_counter())
+
+    # ------------------------------------------------------------------
+    # Shard processes
+    # ------------------------------------------------------------------
+    def _spawn(self, shard: _Shard) -> _Shard:
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_shard_main, args=(child, shard.id, self.factory),
+                                 name=f"camera-shard-{shard.id}", daemon=True)
+        proc.start()
+        child.close()
+        shard.proc, shard.conn, shard.workers = proc, parent, 0
+        return shard
+
+    def _restart(self, shard: _Shard, version: int) -> Dict[str, Any]:
+        """Replace the shard's process and re-send its cameras; other shards are untouched."""
+        self._kill(shard)
+        self._spawn(shard)
+        shard.restarts += 1
+        self.stats["shard_restarts"] += 1
+        mine = {k: self._cameras[k] for k, owner in self._owner.items() if owner == shard.id}
+        try:
+            shard.conn.send(("apply", version, mine, []))
+            report = self._recv(shard)
+        except (OSError, EOFError, ValueError):
+            report = None
+        if report is None:   # the _check_shards pass will try again
+            return {"errors": [{"shard": shard.id, "error": "shard did not come back"}]}
+        return report
+
+    def _recv(self, shard: _Shard) -> Optional[Dict[str, Any]]:
+        try:
+            if not shard.conn.poll(self.reply_timeout):
+                logger.warning("camera shard %d did not answer in %.0fs", shard.id, self.reply_timeout)
+                return None
+            kind, report = shard.conn.recv()
+        except (OSError, EOFError):
+            return None
+        shard.workers = report.get("workers", shard.workers)
+        return report
+
+    def _stop(self, shard: _Shard) -> None:
+        try:
+            shard.conn.send(("stop",))
+        except (OSError, EOFError, ValueError):
+            pass
+        shard.proc.join(timeout=5)
+        self._kill(shard)
+
+    @staticmethod
+    def _kill(shard: _Shard) -> None:
+        if shard.proc is not None and shard.proc.is_alive():
+            shard.proc.kill()
+            shard.proc.join(timeout=5)
+        if shard.conn is not None:
+            shard.conn.close()
+
+    def _merge(self, reports: Dict[int, Dict[str, Any]], version: int, t0: float) -> None:
+        actions: Dict[str, List[str]] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        errors: List[Dict[str, Any]] = []
+        for sid, r in reports.items():
+            for action, keys in (r.get("actions") or {}).items():
+                actions.setdefault(action, []).extend(keys)
+            for action, t in (r.get("timings") or {}).items():
+                m = timings.setdefault(action, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                m["count"] += t["count"]
+                m["total_ms"] = round(m["total_ms"] + t["total_ms"], 3)
+                m["max_ms"] = max(m["max_ms"], t["max_ms"])
+            errors.extend({"shard": sid, **e} for e in r.get("errors") or [])
+        for action, t in timings.items():
+            self.stats[action] += t["count"]
+        self.stats["passes"] += 1
+        self.stats["errors"] += len(errors)
+        self.last_report = {
+            "version": version,
+            "workers": len(self),
+            "actions": {a: keys[:MAX_LISTED] for a, keys in actions.items()},
+            "timings": timings,
+            "shards": {sid: r.get("total_ms") for sid, r in reports.items()},
+            "total_ms": round((time.perf_counter() - t0) * 1000, 3),
+            "errors": errors,
+        }
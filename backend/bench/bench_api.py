@@ -0,0 +1,233 @@
+"""Config API at fleet scale: throughput and latency per endpoint, saved as JSON.
+
+For each fleet size (synthetic configs from synth.py, default 10 / 100 / 1k /
+10k cameras) every operation runs in-process against the ASGI app (Starlette
+TestClient, no server, no network) until it has MIN_REPS samples and
+BUDGET_S seconds of work, or MAX_REPS samples:
+
+  get_config   GET /api/config                 export       GET /api/config/export
+  validate     POST /api/config/validate        import       POST /api/config/import
+  apply_dry    POST /api/config/apply?dry=true  apply        POST /api/config/apply
+  set          POST /api/cameras/set            clone        POST /api/cameras/clone
+  delete       POST /api/cameras/delete         bulk_delete  POST /api/cameras/bulk_delete (2 keys)
+  reorder      POST /api/cameras/reorder (whole order reversed)
+
+Every write changes one field (or key) so each request is a real new version.
+Writes use the default write-behind commit (no ?durable). Setup steps (the
+clones that delete / bulk_delete remove) are not timed.
+
+Results go to bench/results/api-<UTC time>-<commit>.json (--out to override):
+{"meta": {commit, python, platform, ...}, "results": [{cameras, op, reps,
+ops_per_s, mean_ms, p50_ms, p99_ms, max_ms}]}. `--compare OLD.json` prints the
+p50 ratio against an earlier run and flags regressions over --threshold;
+with --fail it exits 1 on any.
+
+Run from backend/:  python -m bench.bench_api [--sizes 10 100 1000 10000] [--compare OLD.json]
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ.setdefault("HOTRELOAD_DATA_DIR", tempfile.mkdtemp(prefix="hotreload-bench-"))
+os.environ.setdefault("HOTRELOAD_HEALTH", "0")              # no probes to synthetic camera URLs
+os.environ.setdefault("HOTRELOAD_RETENTION_INTERVAL", "0")
+
+from fastapi.testclient import TestClient
+
+from app import main
+from .synth import make_camera, make_config, percentile
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("hotreload").setLevel(logging.WARNING)
+
+SIZES = [10, 100, 1000, 10_000]
+MIN_REPS, MAX_REPS, BUDGET_S = 5, 200, 2.0
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+OPS = ["get_config", "export", "validate", "apply_dry", "apply", "import",
+       "set", "clone", "delete", "bulk_delete", "reorder"]
+
+
+def _ok(r: Any) -> None:
+    assert r.status_code == 200, f"{r.request.method} {r.request.url.path}: {r.status_code} {r.text[:300]}"
+
+
+class Fleet:
+    """One config size loaded into the app, and a timed request per operation."""
+
+    def __init__(self, client: TestClient, n: int) -> None:
+        self.client = client
+        self.n = n
+        self.tick = 0
+        main.manager.apply(make_config(n))
+        main.manager.flush()
+
+    def config(self) -> Dict[str, Any]:
+        """A private copy of the running config with one field changed."""
+        self.tick += 1
+        cfg = json.loads(main.manager.snapshot.body)
+        cfg["cameras"]["cam1"]["ffmpeg"]["fps"] = 5 + self.tick % 20
+        return cfg
+
+    def op(self, name: str) -> Callable[[], float]:
+        """Returns a callable doing one rep (untimed setup included) and
+        returning the seconds spent in the timed request."""
+        c = self.client
+
+        def timed(method: str, url: str, body: Any = None) -> float:
+            t0 = time.perf_counter()
+            r = c.request(method, url, json=body) if body is not None else c.request(method, url)
+            elapsed = time.perf_counter() - t0
+            _ok(r)
+            return elapsed
+
+        def clone_tmp(key: str) -> None:
+            _ok(c.post("/api/cameras/clone", json={"source_key": "cam1", "target_key": key, "overwrite": True}))
+
+        if name == "get_config":
+            return lambda: timed("GET", "/api/config")
+        if name == "export":
+            return lambda: timed("GET", "/api/config/export")
+        if name in ("validate", "apply_dry", "apply", "import"):
+            url = {"validate": "/api/config/validate", "apply_dry": "/api/config/apply?dry=true",
+                   "apply": "/api/config/apply", "import": "/api/config/import"}[name]
+            return lambda: timed("POST", url, self.config())
+        if name == "set":
+            def set_() -> float:
+                self.tick += 1
+                value = {**make_camera(1), "ffmpeg": {**make_camera(1)["ffmpeg"], "fps": 5 + self.tick % 20}}
+                return timed("POST", "/api/cameras/set", {"key": "cam1", "value": value})
+            return set_
+        if name == "clone":
+            def clone() -> float:
+                self.tick += 1
+                return timed("POST", "/api/cameras/clone",
+                             {"source_key": "cam1", "target_key": f"bench_{self.tick}", "overwrite": True})
+            return clone
+        if name == "delete":
+            def delete() -> float:
+                clone_tmp("bench_del")
+                return timed("POST", "/api/cameras/delete", {"key": "bench_del"})
+            return delete
+        if name == "bulk_delete":
+            def bulk_delete() -> float:
+                clone_tmp("bench_del_a")
+                clone_tmp("bench_del_b")
+                return timed("POST", "/api/cameras/bulk_delete", {"keys": ["bench_del_a", "bench_del_b"]})
+            return bulk_delete
+        if name == "reorder":
+            def reorder() -> float:
+                order = list(main.manager.get_running_config()["cameras"])[::-1]
+                return timed("POST", "/api/cameras/reorder", {"order": order})
+            return reorder
+        raise ValueError(f"unknown op {name!r}")
+
+    def cleanup(self) -> None:
+        """Drop the cameras `clone` added, so later ops see n cameras again."""
+        cfg = json.loads(main.manager.snapshot.body)
+        extra = [k for k in cfg["cameras"] if k.startswith("bench_")]
+        if extra:
+            _ok(self.client.post("/api/cameras/bulk_delete", json={"keys": extra}))
+
+
+def measure(rep: Callable[[], float]) -> Dict[str, Any]:
+    samples: List[float] = []
+    t_end = time.perf_counter() + BUDGET_S
+    while len(samples) < MAX_REPS and (len(samples) < MIN_REPS or time.perf_counter() < t_end):
+        samples.append(rep())
+    ms = sorted(s * 1000 for s in samples)
+    total = sum(samples)
+    return {"reps": len(ms), "ops_per_s": round(len(ms) / total, 1), "mean_ms": round(total * 1000 / len(ms), 3),
+            "p50_ms": round(percentile(ms, 0.50), 3), "p99_ms": round(percentile(ms, 0.99), 3),
+            "max_ms": round(ms[-1], 3)}
+
+
+def run(sizes: List[int], ops: List[str]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with TestClient(main.app) as client:
+        for n in sizes:
+            fleet = Fleet(client, n)
+            for name in ops:
+                rep = fleet.op(name)
+                rep()   # warm-up: caches, first-use imports
+                gc.collect()
+                row = {"cameras": n, "op": name, **measure(rep)}
+                fleet.cleanup()
+                main.manager.flush()
+                rows.append(row)
+                print(f"{n:>6} {name:<12} {row['reps']:>5} {row['ops_per_s']:>10} {row['p50_ms']:>10} "
+                      f"{row['p99_ms']:>10} {row['max_ms']:>10}", flush=True)
+    return rows
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(rows: List[Dict[str, Any]], old_path: Path, threshold: float) -> int:
+    old = {(r["cameras"], r["op"]): r for r in json.loads(old_path.read_text())["results"]}
+    regressions = 0
+    print(f"\nvs {old_path.name} (p50 ratio, > {threshold} = regression)")
+    print(f"{'cams':>6} {'op':<12} {'old p50':>10} {'new p50':>10} {'ratio':>7}")
+    for r in rows:
+        o = old.get((r["cameras"], r["op"]))
+        if o is None:
+            continue
+        ratio = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{r['cameras']:>6} {r['op']:<12} {o['p50_ms']:>10} {r['p50_ms']:>10} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main_(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.bench_api")
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--ops", nargs="+", default=OPS, choices=OPS)
+    ap.add_argument("--out", type=Path, help="result file (default: bench/results/api-<time>-<commit>.json)")
+    ap.add_argument("--compare", type=Path, help="earlier result file to compare p50 against")
+    ap.add_argument("--threshold", type=float, default=1.25)
+    ap.add_argument("--fail", action="store_true", help="exit 1 if --compare finds a regression")
+    args = ap.parse_args(argv)
+
+    commit = _commit()
+    started = datetime.now(timezone.utc)
+    print(f"{'cams':>6} {'op':<12} {'reps':>5} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    rows = run(args.sizes, args.ops)
+    meta = {
+        "commit": commit,
+        "started": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "budget_s": BUDGET_S, "min_reps": MIN_REPS, "max_reps": MAX_REPS,
+    }
+    out = args.out or RESULTS_DIR / f"api-{started:%Y%m%dT%H%M%SZ}-{commit or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"meta": meta, "results": rows}, indent=1))
+    print(f"results: {out}")
+    if args.compare:
+        if compare(rows, args.compare, args.threshold) and args.fail:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_(sys.argv[1:]))
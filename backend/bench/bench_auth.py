@@ -0,0 +1,83 @@
+"""Auth middleware overhead per request: file read on every request (legacy)
+vs the in-memory TokenCache.
+
+Run from backend/:  python -m bench.bench_auth [N]
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+from typing import Any, Callable, List
+
+os.environ.setdefault("HOTRELOAD_DATA_DIR", tempfile.mkdtemp(prefix="hotreload-bench-"))
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import main
+
+
+async def _legacy_auth(request: Request, call_next):
+    """The pre-cache middleware body: stat + read + parse on every request."""
+    rec = main._load_token_record()
+    if not rec:
+        return await call_next(request)
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        return Response(status_code=403)
+    if not secrets.compare_digest(auth.split(" ", 1)[1].strip(), rec["token"]):
+        return Response(status_code=403)
+    return await call_next(request)
+
+
+def _request(token: str) -> Request:
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/config", "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    return Request(scope)
+
+
+async def _ok(_request: Request) -> Response:
+    return Response(b"{}")
+
+
+def _per_request_us(mw: Callable[..., Any], token: str, n: int) -> float:
+    async def run() -> float:
+        req = _request(token)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            resp = await mw(req, _ok)
+            assert resp.status_code == 200
+        return time.perf_counter() - t0
+
+    base = asyncio.run(_baseline(token, n))
+    return (asyncio.run(run()) - base) / n * 1e6
+
+
+async def _baseline(token: str, n: int) -> float:
+    req = _request(token)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await _ok(req)
+    return time.perf_counter() - t0
+
+
+def main_(argv: List[str]) -> None:
+    n = int(argv[0]) if argv else 20000
+    token = secrets.token_urlsafe(32)
+    main.TOKEN_FILE.write_text(json.dumps({"token": token, "expires": main._now() + main.TOKEN_TTL_SECONDS}))
+    main.token_cache.invalidate()
+    legacy = _per_request_us(_legacy_auth, token, n)
+    cached = _per_request_us(main.auth_middleware, token, n)
+    print(f"requests: {n}")
+    print(f"legacy (read token file per request): {legacy:8.2f} us/request")
+    print(f"TokenCache:                           {cached:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main_(sys.argv[1:])
@@ -0,0 +1,80 @@
+"""Editing one field on N cameras: a loop over /api/cameras/set (what ops
+scripts did) vs a single /api/config/bulk_edit call.
+
+Run from backend/:  python -m bench.bench_bulk_edit [N ...]
+"""
+from __future__ import annotations
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("HOTRELOAD_DATA_DIR", tempfile.mkdtemp(prefix="hotreload-bench-"))
+
+from fastapi.testclient import TestClient
+
+from app import main
+from .synth import make_config
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def _reset(n: int) -> None:
+    main.manager.apply(make_config(n))
+    main.manager.flush()
+
+
+def _per_camera(client: TestClient, n: int, fps: int) -> Dict[str, Any]:
+    _reset(n)
+    backups = len(main.manager.list_backups())
+    v0 = main.manager.version
+    t0 = time.perf_counter()
+    for key, cam in list(main.manager.get_running_config()["cameras"].items()):
+        value = {**cam, "ffmpeg": {**cam["ffmpeg"], "fps": fps}}
+        r = client.post("/api/cameras/set", json={"key": key, "value": value})
+        assert r.status_code == 200, r.text
+    main.manager.flush()
+    elapsed = time.perf_counter() - t0
+    return {
+        "ms": round(elapsed * 1000, 1),
+        "versions": main.manager.version - v0,
+        "backups": len(main.manager.list_backups()) - backups,
+    }
+
+
+def _bulk(client: TestClient, n: int, fps: int) -> Dict[str, Any]:
+    _reset(n)
+    backups = len(main.manager.list_backups())
+    v0 = main.manager.version
+    t0 = time.perf_counter()
+    r = client.post("/api/config/bulk_edit", json={"select": {"all": True}, "set": {"ffmpeg.fps": fps}})
+    assert r.status_code == 200 and len(r.json()["changed"]) == n, r.text
+    main.manager.flush()
+    elapsed = time.perf_counter() - t0
+    return {
+        "ms": round(elapsed * 1000, 1),
+        "versions": main.manager.version - v0,
+        "backups": len(main.manager.list_backups()) - backups,
+    }
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with TestClient(main.app) as client:
+        for n in sizes:
+            rows.append({"cameras": n, "mode": "per-camera set", **_per_camera(client, n, 10)})
+            rows.append({"cameras": n, "mode": "bulk_edit", **_bulk(client, n, 10)})
+    return rows
+
+
+def main_(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [100, 1000]
+    print(f"{'cams':>6} {'mode':<15} {'ms':>10} {'versions':>9} {'backups':>8}")
+    for r in run(sizes):
+        print(f"{r['cameras']:>6} {r['mode']:<15} {r['ms']:>10} {r['versions']:>9} {r['backups']:>8}")
+
+
+if __name__ == "__main__":
+    main_(sys.argv[1:])
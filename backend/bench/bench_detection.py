@@ -0,0 +1,85 @@
+"""Detection post-processing: score threshold + NMS per (camera, class).
+
+  python    per camera: per-box filter and O(n^2) greedy NMS in Python
+  batched   detection.postprocess: one vectorized pass over every camera
+
+Synthetic detector output: clustered boxes (several overlapping proposals per
+object), 3 classes, random per-camera thresholds. Both engines must keep the
+same boxes. The python baseline runs on at most SAMPLE cameras and is
+extrapolated to the batch.
+
+Run from backend/:  python -m bench.bench_detection [BOXES ...]
+"""
+from __future__ import annotations
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.detection import nms_reference, postprocess
+from .synth import best_of
+
+SAMPLE = 50
+BOXES_PER_CAMERA = 200
+
+
+def make_batch(total: int, seed: int = 0) -> Tuple[np.ndarray, ...]:
+    rng = np.random.default_rng(seed)
+    cams = max(1, total // BOXES_PER_CAMERA)
+    camera = np.repeat(np.arange(cams), -(-total // cams))[:total]
+    # each camera sees BOXES_PER_CAMERA / 8 objects, ~8 jittered proposals each
+    per_cam = max(1, BOXES_PER_CAMERA // 8)
+    objects = rng.uniform([0, 0, 20, 40], [1800, 1000, 160, 260], size=(cams * per_cam, 4))
+    obj = camera * per_cam + rng.integers(0, per_cam, total)
+    base = objects[obj]
+    xy = base[:, :2] + rng.normal(0, 6, (total, 2))
+    wh = base[:, 2:] * rng.uniform(0.9, 1.1, (total, 2))
+    boxes = np.hstack([xy, xy + wh])
+    scores = rng.beta(2, 2, total)
+    classes = obj % 3
+    score_t = rng.uniform(0.3, 0.7, cams)
+    iou_t = rng.uniform(0.3, 0.6, cams)
+    return boxes, scores, classes, camera, score_t, iou_t
+
+
+def _python(boxes, scores, classes, camera, score_t, iou_t, cams: List[int]) -> List[int]:
+    kept: List[int] = []
+    for c in cams:
+        ii = np.flatnonzero(camera == c)
+        b, s, k = boxes[ii].tolist(), scores[ii].tolist(), classes[ii].tolist()
+        kept.extend(ii[nms_reference(b, s, iou_t[c], score_t[c], k)].tolist())
+    return kept
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for n in sizes:
+        boxes, scores, classes, camera, score_t, iou_t = make_batch(n)
+        cams = len(score_t)
+        sample = list(range(min(cams, SAMPLE)))
+
+        keep = postprocess(boxes, scores, classes, camera, score_t, iou_t)
+        in_sample = keep[camera[keep] < len(sample)]
+        t0 = time.perf_counter()
+        ref = _python(boxes, scores, classes, camera, score_t, iou_t, sample)
+        py = (time.perf_counter() - t0) * cams / len(sample)
+        assert sorted(ref) == sorted(in_sample.tolist()), "batched NMS disagrees with the python loop"
+
+        best = best_of(lambda: postprocess(boxes, scores, classes, camera, score_t, iou_t), 5)
+        for name, t in (("python", py), ("batched", best)):
+            rows.append({"boxes": n, "cameras": cams, "engine": name, "ms": round(t * 1000, 3),
+                         "boxes_per_s": round(n / t), "speedup": round(py / t, 1), "kept": len(keep)})
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [1000, 100_000]
+    print(f"{'boxes':>7} {'cams':>5} {'engine':<8} {'ms':>10} {'boxes/s':>12} {'speedup':>8} {'kept':>7}")
+    for r in run(sizes):
+        print(f"{r['boxes']:>7} {r['cameras']:>5} {r['engine']:<8} {r['ms']:>10} {r['boxes_per_s']:>12} "
+              f"{r['speedup']:>8} {r['kept']:>7}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
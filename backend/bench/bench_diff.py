@@ -0,0 +1,71 @@
+"""Dry-run diff: legacy {"before", "after"} payload vs path-level ops.
+
+Run from backend/:  python -m bench.bench_diff [N ...]
+"""
+from __future__ import annotations
+import json
+import sys
+from typing import Any, Callable, Dict, List
+
+from app.diff import diff_configs
+from .synth import best_of, make_config
+
+
+def _legacy(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return {"before": old, "after": new}
+
+
+def _scenarios(n: int) -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    def one_field(cfg):
+        out = json.loads(json.dumps(cfg))
+        out["cameras"]["cam1"]["ffmpeg"]["fps"] = 10
+        return out
+
+    def clone(cfg):
+        out = json.loads(json.dumps(cfg))
+        out["cameras"]["cam_clone"] = json.loads(json.dumps(out["cameras"]["cam1"]))
+        return out
+
+    def reorder(cfg):
+        out = json.loads(json.dumps(cfg))
+        keys = list(out["cameras"])
+        keys = keys[-1:] + keys[:-1]
+        out["cameras"] = {k: out["cameras"][k] for k in keys}
+        return out
+
+    def delete(cfg):
+        out = json.loads(json.dumps(cfg))
+        out["cameras"].pop(f"cam{n}")
+        return out
+
+    return {"one_field": one_field, "clone": clone, "reorder": reorder, "delete": delete}
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for n in sizes:
+        base = make_config(n)
+        repeat = 5 if n <= 1000 else 2
+        for name, build in _scenarios(n).items():
+            new = build(base)
+            legacy_t = best_of(lambda: json.dumps(_legacy(base, new)), repeat)
+            legacy_size = len(json.dumps(_legacy(base, new)))
+            ops_t = best_of(lambda: json.dumps(diff_configs(base, new)), repeat)
+            ops_size = len(json.dumps(diff_configs(base, new)))
+            rows.append({
+                "cameras": n, "scenario": name,
+                "legacy_bytes": legacy_size, "ops_bytes": ops_size,
+                "legacy_ms": round(legacy_t * 1000, 3), "ops_ms": round(ops_t * 1000, 3),
+            })
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [10, 1000, 10000]
+    print(f"{'cams':>6} {'scenario':<10} {'before/after B':>15} {'ops B':>8} {'before/after ms':>16} {'ops ms':>8}")
+    for r in run(sizes):
+        print(f"{r['cameras']:>6} {r['scenario']:<10} {r['legacy_bytes']:>15} {r['ops_bytes']:>8} {r['legacy_ms']:>16} {r['ops_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,162 @@
+"""Camera health probing of N RTSP cameras against a local stub RTSP server.
+
+The stub listens on 127.0.0.1..127.0.0.8 (8 "NVRs"), answers OPTIONS and
+DESCRIBE (SDP with a=framerate) after LATENCY_MS and keeps connections open.
+Per camera path:
+
+  /ok/N      healthy, N fps
+  /auth/N    healthy behind Digest auth (credentials in the URL)
+  /slow/N    never answers (probe times out)
+  dead       a port nothing listens on (connection refused)
+
+  sequential   one camera after the other, new connection per probe
+  prober       health.HealthProber: concurrent (global + per-host limits)
+  reprobe      prober again: connections are reused, no new connects
+
+Every run must agree on which cameras are up and on their fps.
+
+Run from backend/:  python -m bench.bench_health [CAMERAS]
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import re
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.health import HealthProber
+
+HOSTS = [f"127.0.0.{i}" for i in range(1, 9)]
+LATENCY_MS = 20
+TIMEOUT = 1.0
+REALM, NONCE = "stub", "abc123"
+
+
+class StubRTSP:
+    def __init__(self) -> None:
+        self.connections = 0
+        self.requests = 0
+        self.port = 0
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._serve, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def _serve(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("0.0.0.0", 0))
+        self.port = sock.getsockname()[1]
+        self.loop.run_until_complete(asyncio.start_server(self._client, sock=sock, backlog=1024))
+        ready.set()
+        self.loop.run_forever()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode()
+                self.requests += 1
+                method, uri, _ = head.split("\r\n")[0].split(" ")
+                cseq = re.search(r"CSeq: (\d+)", head).group(1)
+                path = uri.split("/", 3)[3]
+                kind, fps = path.split("/")
+                if kind == "slow":
+                    await asyncio.sleep(3600)
+                await asyncio.sleep(LATENCY_MS / 1000)
+                if kind == "auth" and not self._authorized(head, method, uri):
+                    writer.write(f'RTSP/1.0 401 Unauthorized\r\nCSeq: {cseq}\r\n'
+                                 f'WWW-Authenticate: Digest realm="{REALM}", nonce="{NONCE}"\r\n\r\n'.encode())
+                    continue
+                body = f"v=0\r\nm=video 0 RTP/AVP 96\r\na=framerate:{fps}\r\n" if method == "DESCRIBE" else ""
+                writer.write(f"RTSP/1.0 200 OK\r\nCSeq: {cseq}\r\nPublic: OPTIONS, DESCRIBE\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n{body}".encode())
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _authorized(head: str, method: str, uri: str) -> bool:
+        m = re.search(r'response="(\w+)"', head)
+        ha1 = hashlib.md5(f"admin:{REALM}:secret".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+        return bool(m) and m.group(1) == hashlib.md5(f"{ha1}:{NONCE}:{ha2}".encode()).hexdigest()
+
+
+def make_cameras(n: int, port: int, dead_port: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    cams, expected = {}, {}
+    for i in range(n):
+        host = HOSTS[i % len(HOSTS)]
+        fps = 5 + i % 25
+        kind = "dead" if i % 20 == 7 else "slow" if i % 20 == 13 else "auth" if i % 5 == 1 else "ok"
+        if kind == "dead":
+            url = f"rtsp://{host}:{dead_port}/ok/{fps}"
+        elif kind == "auth":
+            url = f"rtsp://admin:secret@{host}:{port}/auth/{fps}"
+        else:
+            url = f"rtsp://{host}:{port}/{kind}/{fps}"
+        cams[f"cam{i}"] = {"name": f"cam{i}", "ffmpeg": {"url": url}}
+        expected[f"cam{i}"] = ("down", None) if kind in ("dead", "slow") else ("up", float(fps))
+    return cams, expected
+
+
+def sequential(cams: Dict[str, Any]) -> Dict[str, Tuple[str, Any]]:
+    """The naive loop: per camera a fresh prober (fresh connection), one at a time."""
+    out = {}
+    for key, cam in cams.items():
+        p = HealthProber(timeout=TIMEOUT)
+        p.update({key: cam})
+        r = p.probe_now([key])[key]
+        out[key] = (r["status"], r.get("fps"))
+        p.close()
+    return out
+
+
+def run(n: int) -> List[Dict[str, Any]]:
+    stub = StubRTSP()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        dead_port = s.getsockname()[1]   # closed again: connections are refused
+    cams, expected = make_cameras(n, stub.port, dead_port)
+    rows: List[Dict[str, Any]] = []
+
+    def row(name: str, seconds: float, got: Dict[str, Tuple[str, Any]], connects: int) -> None:
+        assert got == expected, f"{name}: wrong results for {[k for k in got if got[k] != expected[k]][:5]}"
+        rows.append({"engine": name, "cameras": n, "s": round(seconds, 3), "up": sum(v[0] == "up" for v in got.values()),
+                     "connects": connects, "speedup": round(rows[0]["s"] / seconds, 1) if rows else 1.0})
+
+    c0 = stub.connections
+    t0 = time.perf_counter()
+    got = sequential(cams)
+    row("sequential", time.perf_counter() - t0, got, stub.connections - c0)
+
+    prober = HealthProber(timeout=TIMEOUT, concurrency=64, per_host=8)
+    for name in ("prober", "reprobe"):
+        c0 = stub.connections
+        t0 = time.perf_counter()
+        if name == "prober":
+            prober.update(cams)
+        res = prober.probe_now()
+        row(name, time.perf_counter() - t0, {k: (r["status"], r.get("fps")) for k, r in res.items()},
+            stub.connections - c0)
+    intervals = sorted({(r["status"], r["interval"]) for r in prober.results().values()})
+    print(f"adaptive intervals (status, s): {intervals}")
+    prober.close()
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    n = int(argv[0]) if argv else 300
+    rows = run(n)
+    print(f"{'engine':<11} {'cameras':>7} {'s':>9} {'up':>5} {'connects':>9} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['engine']:<11} {r['cameras']:>7} {r['s']:>9} {r['up']:>5} {r['connects']:>9} {r['speedup']:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
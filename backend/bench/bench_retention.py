@@ -0,0 +1,109 @@
+"""Retention on a synthetic catalog of 10M recording segments.
+
+100 cameras x 100k ten-second segments (~11.5 days each), ~30% with motion,
+a detection event every ~10 minutes; policy: motion mode, 2 recording days,
+5 detection days, 3 s pre/post capture. Cycles (retention.RetentionEngine,
+files are not touched):
+
+  first        backlog purge of a never-cleaned catalog
+  steady       next cycle one hour later (the catalog already holds that hour's
+               segments): only rows that crossed a cutoff are read
+  idle         again at the same time: nothing to do
+  policy       recording_days 2 -> 1 via hot reload: next cycle, no rescan
+
+  walk+stat    the naive cycle's floor: scandir + stat of every segment file,
+               measured on WALK_SAMPLE real files and extrapolated
+
+Run from backend/:  python -m bench.bench_retention [SEGMENTS [CAMERAS]]
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.retention import DAY, RetentionEngine, SegmentCatalog
+
+SEGMENT_SEC = 10.0
+WALK_SAMPLE = 50_000
+CHUNK = 500_000
+
+
+def build(catalog: SegmentCatalog, total: int, cameras: int, until: float, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    per_cam = total // cameras
+    t0 = until - per_cam * SEGMENT_SEC
+    for c in range(cameras):
+        cam = f"cam{c}"
+        for lo in range(0, per_cam, CHUNK):
+            i = np.arange(lo, min(per_cam, lo + CHUNK))
+            start = t0 + i * SEGMENT_SEC
+            motion = np.where(rng.random(len(i)) < 0.3, rng.uniform(0.5, SEGMENT_SEC, len(i)), 0.0)
+            size = rng.integers(1_000_000, 3_000_000, len(i))
+            catalog.add_segments(zip([cam] * len(i), start.tolist(), (start + SEGMENT_SEC).tolist(),
+                                     [f"{cam}/{k}.mp4" for k in i.tolist()], size.tolist(), motion.tolist()))
+        n_ev = int(per_cam * SEGMENT_SEC / 600)
+        ev_start = np.sort(rng.uniform(t0, until, n_ev))
+        ev_len = rng.uniform(20, 60, n_ev)
+        catalog.add_events(zip([cam] * n_ev, ev_start.tolist(), (ev_start + ev_len).tolist(), ["person"] * n_ev))
+
+
+def walk_stat(tmp: Path, total: int) -> float:
+    root = tmp / "walk"
+    root.mkdir()
+    for k in range(WALK_SAMPLE):
+        d = root / f"{k // 1000}"
+        if not k % 1000:
+            d.mkdir()
+        (d / f"{k}.mp4").touch()
+    t0 = time.perf_counter()
+    n = 0
+    for d in os.scandir(root):
+        for f in os.scandir(d.path):
+            f.stat()
+            n += 1
+    return (time.perf_counter() - t0) * total / n
+
+
+def run(total: int, cameras: int) -> List[Dict[str, Any]]:
+    policy: Dict[str, Any] = {"mode": "motion", "detection_days": 5, "recording_days": 2,
+                              "pre_capture_sec": 3, "post_capture_sec": 3}
+    now = 1_800_000_000.0
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = SegmentCatalog(Path(tmp) / "recordings.db")
+        t0 = time.perf_counter()
+        build(catalog, total, cameras, now + 3600)
+        print(f"catalog: {total} segments, {cameras} cameras, built in {time.perf_counter() - t0:.1f} s, "
+              f"{os.path.getsize(Path(tmp) / 'recordings.db') / 1e6:.0f} MB")
+        engine = RetentionEngine(catalog, lambda: {f"cam{c}": policy for c in range(cameras)},
+                                 delete_files=False)
+        for name, at in (("first", now), ("steady", now + 3600), ("idle", now + 3600)):
+            r = engine.run_cycle(now=at)
+            rows.append({"cycle": name, **{k: r[k] for k in ("scanned", "deleted", "total_ms", "max_batch_ms")}})
+        policy = {**policy, "recording_days": 1}
+        r = engine.run_cycle(now=now + 3600)
+        rows.append({"cycle": "policy", **{k: r[k] for k in ("scanned", "deleted", "total_ms", "max_batch_ms")}})
+        left = sum(catalog.counts().values())
+        catalog.close()
+        rows.append({"cycle": "walk+stat", "scanned": total, "deleted": 0,
+                     "total_ms": round(walk_stat(Path(tmp), total) * 1000, 1), "max_batch_ms": None})
+    print(f"segments left: {left} (~{left * SEGMENT_SEC / DAY / cameras:.2f} days per camera)")
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    total = int(argv[0]) if argv else 10_000_000
+    cameras = int(argv[1]) if len(argv) > 1 else 100
+    rows = run(total, cameras)
+    print(f"{'cycle':<10} {'scanned':>10} {'deleted':>10} {'ms':>12} {'max batch ms':>13}")
+    for r in rows:
+        print(f"{r['cycle']:<10} {r['scanned']:>10} {r['deleted']:>10} {r['total_ms']:>12} {str(r['max_batch_ms']):>13}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
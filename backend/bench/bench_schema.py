@@ -0,0 +1,52 @@
+"""Validator throughput: the compiled RootConfig checker (schema_check.py)
+vs building the Pydantic model, both doing a full, uncached pass.
+
+Run from backend/:  python -m bench.bench_schema [N ...]
+"""
+from __future__ import annotations
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from app.config_schema import RootConfig
+from app.schema_check import compile_model, errors
+from .synth import make_config
+
+
+def _rate(fn: Callable[[], Any], min_seconds: float = 0.5) -> float:
+    """Calls per second, measured over at least `min_seconds`."""
+    fn()
+    calls = 0
+    t0 = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds:
+            return calls / elapsed
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    check = compile_model(RootConfig, "config")
+    rows: List[Dict[str, Any]] = []
+    for n in sizes:
+        cfg = make_config(n)
+        assert not errors(check, cfg)
+        for name, fn in (
+            ("compiled", lambda: errors(check, cfg)),
+            ("pydantic", lambda: RootConfig.model_validate(cfg)),
+        ):
+            rate = _rate(fn)
+            rows.append({"cameras": n, "validator": name, "configs_per_s": round(rate, 1), "cameras_per_s": round(rate * n)})
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [10, 1000, 10000]
+    print(f"{'cams':>6} {'validator':<10} {'configs/s':>12} {'cameras/s':>12}")
+    for r in run(sizes):
+        print(f"{r['cameras']:>6} {r['validator']:<10} {r['configs_per_s']:>12} {r['cameras_per_s']:>12}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
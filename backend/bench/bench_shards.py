@@ -0,0 +1,107 @@
+"""API responsiveness while camera workers do per-frame CPU work.
+
+  idle     no camera workers
+  threads  workers in the API process (Reconciler, one thread per worker)
+  shards   workers in ShardSupervisor processes, one per spare core
+
+Every BusyWorker burns CPU in pure Python, as frame decoding / detection
+glue would. Meanwhile the main thread serves stand-in requests (serialize a
+50-camera config) and we report their latency and throughput. On a machine
+with a single core the shards have no spare core to run on, so expect little
+difference there.
+
+Run from backend/:  python -m bench.bench_shards [CAMERAS] [SECONDS]
+"""
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from app.snapshot import ConfigSnapshot, freeze
+from app.workers.base import Worker
+from app.workers.reconciler import Reconciler
+from app.workers.shards import ShardSupervisor
+from .synth import make_config, percentile
+
+
+class BusyWorker(Worker):
+    """Worker whose thread never idles: a stand-in for per-frame processing."""
+
+    def __init__(self, cfg: Any) -> None:
+        self.cfg = cfg
+        self._stop = threading.Event()
+        self._t: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            sum(i * i for i in range(20_000))   # one "frame"
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._t = threading.Thread(target=self._run, daemon=True)
+        self._t.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._t:
+            self._t.join()
+            self._t = None
+
+    def apply_update(self, cfg: Any) -> None:
+        self.cfg = cfg
+
+    def graceful_restart(self, cfg: Any) -> None:
+        self.stop()
+        self.cfg = cfg
+        self.start()
+
+
+def _serve(seconds: float) -> Dict[str, Any]:
+    body = make_config(50)
+    lat: List[float] = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        json.dumps(body)
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+    return {
+        "requests_per_s": round(len(lat) / seconds),
+        "p50_ms": round(percentile(lat, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(lat, 0.99) * 1000, 3),
+        "max_ms": round(lat[-1] * 1000, 3),
+    }
+
+
+def _run(mode: str, cameras: int, seconds: float) -> Dict[str, Any]:
+    snap = ConfigSnapshot(1, freeze(make_config(cameras)))
+    runner: Any = None
+    if mode == "threads":
+        runner = Reconciler(factory=BusyWorker)
+    elif mode == "shards":
+        runner = ShardSupervisor(factory="bench.bench_shards:BusyWorker")
+    if runner is not None:
+        runner.submit(None, snap)
+        assert runner.wait(1, 60), "workers did not start"
+    try:
+        return {"mode": mode, "workers": len(runner) if runner is not None else 0, **_serve(seconds)}
+    finally:
+        if runner is not None:
+            runner.close()
+
+
+def main(argv: List[str]) -> None:
+    cameras = int(argv[0]) if argv else 8
+    seconds = float(argv[1]) if len(argv) > 1 else 3.0
+    print(f"cores: {os.cpu_count()}, busy cameras: {cameras}, {seconds:.0f}s per mode")
+    print(f"{'mode':<8} {'workers':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("idle", "threads", "shards"):
+        r = _run(mode, cameras, seconds)
+        print(f"{r['mode']:<8} {r['workers']:>8} {r['requests_per_s']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
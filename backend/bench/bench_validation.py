@@ -0,0 +1,78 @@
+"""Config validation: full walk on every call (legacy) vs the memoised
+ConfigValidator, after a one-camera edit.
+
+  snapshot  the edited config shares unchanged (frozen) cameras with the
+            previous version, as camera endpoints / PATCH / bulk_edit produce
+  import    the edited config arrives as fresh JSON (validate / import),
+            so every camera is hashed but only the changed one is re-checked
+
+Run from backend/:  python -m bench.bench_validation [N ...]
+"""
+from __future__ import annotations
+import json
+import sys
+from typing import Any, Dict, List
+
+from app.snapshot import freeze
+from app.validation import ConfigValidator, validate_camera, validate_rest
+from .synth import best_of, make_config
+
+
+def _legacy(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    errors = validate_rest(cfg)
+    for key, cam in cfg["cameras"].items():
+        errors.extend(validate_camera(key, cam))
+    return errors
+
+
+def _edit(cfg: Dict[str, Any], fps: int) -> Dict[str, Any]:
+    """Copy-on-write one-camera edit, like the API endpoints do."""
+    out = dict(cfg)
+    out["cameras"] = dict(cfg["cameras"])
+    cam = cfg["cameras"]["cam1"]
+    out["cameras"]["cam1"] = {**cam, "ffmpeg": {**cam["ffmpeg"], "fps": fps}}
+    return out
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for n in sizes:
+        repeat = 5 if n <= 1000 else 3
+        base = freeze(make_config(n))
+        raw = json.dumps(base)
+
+        v = ConfigValidator()
+        cold = best_of(lambda: ConfigValidator().validate(base), repeat)
+        v.validate(base)
+        fps = iter(range(1, 10**9))
+        snap = best_of(lambda: v.validate(_edit(base, next(fps) % 240 + 1)), repeat)
+        # fresh JSON for every call; parse cost excluded
+        fresh = [json.loads(raw) for _ in range(repeat)]
+        for i, cfg in enumerate(fresh):
+            cfg["cameras"]["cam1"]["ffmpeg"]["fps"] = 100 + i
+        it = iter(fresh)
+        imp = best_of(lambda: v.validate(next(it)), repeat)
+        legacy = best_of(lambda: _legacy(base), repeat)
+        check = best_of(lambda: v.check(base), repeat)
+
+        rows.append({
+            "cameras": n,
+            "legacy_ms": round(legacy * 1000, 3),
+            "cold_ms": round(cold * 1000, 3),
+            "snapshot_ms": round(snap * 1000, 3),
+            "import_ms": round(imp * 1000, 3),
+            "check_with_dups_ms": round(check * 1000, 3),
+        })
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [1000, 10000]
+    cols = ["legacy_ms", "cold_ms", "snapshot_ms", "import_ms", "check_with_dups_ms"]
+    print(f"{'cams':>6} " + " ".join(f"{c:>19}" for c in cols))
+    for r in run(sizes):
+        print(f"{r['cameras']:>6} " + " ".join(f"{r[c]:>19}" for c in cols))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+"""Camera worker runtimes at 10 / 100 / 1000 cameras.
+
+  thread   CameraWorker: one OS thread per camera, polling every 0.5 s
+  async    WorkerRuntime: one asyncio loop thread, event-driven workers
+
+Start, restart and stop are driven one camera at a time, as the reconciler
+does. Idle CPU is process CPU time over one second of wall time with every
+worker running. A thread-worker stop waits for its poll to come round, so at
+most SAMPLE thread workers are restarted/stopped and the total is projected
+(marked ~).
+
+Run from backend/:  python -m bench.bench_workers [N ...]
+"""
+from __future__ import annotations
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from app.config_schema import CameraConfig
+from app.workers.camera_worker import CameraWorker
+from app.workers.runtime import WorkerRuntime
+from .synth import make_camera
+
+SAMPLE = 20
+IDLE_SECONDS = 1.0
+
+
+def _serial(workers: List[Any], fn: Callable[[Any], None], limit: int) -> Dict[str, Any]:
+    part = workers[:limit]
+    t0 = time.perf_counter()
+    for w in part:
+        fn(w)
+    elapsed = time.perf_counter() - t0
+    projected = elapsed / len(part) * len(workers) if part else 0.0
+    return {"ms": round(projected * 1000, 1), "projected": len(part) < len(workers)}
+
+
+def _idle() -> Dict[str, float]:
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    time.sleep(IDLE_SECONDS)
+    cpu = time.process_time() - cpu0
+    return {"cpu_pct": round(cpu / (time.perf_counter() - wall0) * 100, 2), "threads": threading.active_count()}
+
+
+def _run(kind: str, n: int) -> Dict[str, Any]:
+    cfgs = [CameraConfig.model_validate(make_camera(i)) for i in range(1, n + 1)]
+    restarted = [c.model_copy(update={"ffmpeg": c.ffmpeg.model_copy(update={"fps": 10})}) for c in cfgs]
+    runtime = WorkerRuntime() if kind == "async" else None
+    factory = runtime.worker if runtime is not None else CameraWorker
+    limit = n if runtime is not None else SAMPLE
+
+    t0 = time.perf_counter()
+    workers = [factory(c) for c in cfgs]
+    for w in workers:
+        w.start()
+    start_ms = round((time.perf_counter() - t0) * 1000, 1)
+    idle = _idle()
+    by_worker = dict(zip(map(id, workers), restarted))
+    restart = _serial(workers, lambda w: w.graceful_restart(by_worker[id(w)]), limit)
+    stop = _serial(workers, lambda w: w.stop(), limit)
+
+    # tear down whatever the sampling left running
+    if runtime is not None:
+        runtime.close()
+    else:
+        for w in workers:
+            w._running = False
+        for w in workers:
+            w.stop()
+    return {"cameras": n, "runtime": kind, "start_ms": start_ms, "restart": restart, "stop": stop, **idle}
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    return [_run(kind, n) for n in sizes for kind in ("thread", "async")]
+
+
+def _fmt(r: Dict[str, Any]) -> str:
+    return f"{'~' if r['projected'] else ''}{r['ms']}"
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [10, 100, 1000]
+    print(f"{'cams':>6} {'runtime':<8} {'threads':>8} {'idle cpu %':>11} {'start ms':>10} {'restart ms':>12} {'stop ms':>10}")
+    for r in run(sizes):
+        print(f"{r['cameras']:>6} {r['runtime']:<8} {r['threads']:>8} {r['cpu_pct']:>11} {r['start_ms']:>10} "
+              f"{_fmt(r['restart']):>12} {_fmt(r['stop']):>10}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,133 @@
+"""WebSocket fan-out under load: 1000 simulated clients, some slow and some
+completely stalled, receiving a burst of events.
+
+  legacy   the old WSBus.broadcast: await send_text on each client in turn
+  queued   app.events.WSBus: serialize once, per-client queue + writer task
+
+Reports how long broadcast() blocks the caller and the delivery latency seen
+by the healthy clients, then checks that they got every event, that slow
+clients got an overflow notice, and that stalled clients were evicted.
+
+Run from backend/:  python -m bench.bench_ws_fanout [CLIENTS] [EVENTS]
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from app.events import WSBus
+from .synth import percentile
+
+SLOW_DELAY = 0.05      # seconds per send for slow clients
+STALL_TIMEOUT = 0.5    # bus eviction deadline for the run
+
+logging.getLogger("hotreload").setLevel(logging.ERROR)   # one eviction warning per stalled client
+
+
+class FakeSocket:
+    """Stands in for a starlette WebSocket: records arrival times."""
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self.received: List[float] = []
+        self.events: List[str] = []
+        self.closed = False
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        if self.kind == "stalled":
+            await asyncio.Event().wait()
+        if self.kind == "slow":
+            await asyncio.sleep(SLOW_DELAY)
+        self.received.append(time.perf_counter())
+        self.events.append(json.loads(data)["event"])
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+def _clients(n: int) -> List[FakeSocket]:
+    # 1% stalled, 5% slow, the rest healthy
+    return [FakeSocket("stalled" if i % 100 == 0 else "slow" if i % 20 == 1 else "fast") for i in range(n)]
+
+
+async def _legacy_broadcast(clients: List[FakeSocket], message: Dict[str, Any]) -> None:
+    payload = json.dumps(message)
+    for ws in clients:
+        try:
+            await asyncio.wait_for(ws.send_text(payload), STALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_legacy(n: int, events: int) -> Dict[str, Any]:
+    clients = _clients(n)
+    sent_at: List[float] = []
+    block = []
+    for i in range(events):
+        sent_at.append(time.perf_counter())
+        t0 = time.perf_counter()
+        await _legacy_broadcast(clients, {"event": "applied", "seq": i})
+        block.append(time.perf_counter() - t0)
+    fast = [c for c in clients if c.kind == "fast"]
+    lat = [t - sent_at[j] for c in fast for j, t in enumerate(c.received)]
+    return {"block": block, "lat": lat}
+
+
+async def _run_queued(n: int, events: int, queue_size: int) -> Dict[str, Any]:
+    bus = WSBus(queue_size=queue_size, stall_timeout=STALL_TIMEOUT)
+    clients = _clients(n)
+    for ws in clients:
+        await bus.connect(ws)
+    sent_at: List[float] = []
+    block = []
+    for i in range(events):
+        sent_at.append(time.perf_counter())
+        t0 = time.perf_counter()
+        await bus.broadcast({"event": "applied", "seq": i})
+        block.append(time.perf_counter() - t0)
+        await asyncio.sleep(0)   # let writers run between events, as the event loop would
+    # drain: long enough for slow clients' queues and for stalled ones to be evicted
+    await asyncio.sleep(max(STALL_TIMEOUT, SLOW_DELAY * queue_size) + 0.5)
+
+    fast = [c for c in clients if c.kind == "fast"]
+    slow = [c for c in clients if c.kind == "slow"]
+    stalled = [c for c in clients if c.kind == "stalled"]
+    lat = [t - sent_at[j] for c in fast for j, t in enumerate(c.received)]
+
+    assert all(len(c.received) == events for c in fast), "healthy client missed events"
+    if events > queue_size:
+        assert all("overflow" in c.events for c in slow), "slow client got no overflow notice"
+    assert all(c.closed for c in stalled), "stalled client not evicted"
+    assert len(bus) == len(fast) + len(slow)
+    for ws in clients:
+        bus.disconnect(ws)
+    return {"block": block, "lat": lat, "stats": dict(bus.stats)}
+
+
+def main(argv: List[str]) -> None:
+    n = int(argv[0]) if argv else 1000
+    events = int(argv[1]) if len(argv) > 1 else 100
+    queue_size = 16
+    print(f"clients: {n} (1% stalled, 5% slow at {SLOW_DELAY * 1000:.0f} ms/send), events: {events}, queue: {queue_size}")
+
+    queued = asyncio.run(_run_queued(n, events, queue_size))
+    # the legacy loop waits out every stalled client on every event; keep it short
+    legacy_events = min(events, 3)
+    legacy = asyncio.run(_run_legacy(n, legacy_events))
+
+    print(f"{'bus':<8} {'events':>6} {'broadcast p50 ms':>17} {'max ms':>9} {'fast-client p50 ms':>19} {'p99 ms':>9}")
+    for name, r, ev in (("legacy", legacy, legacy_events), ("queued", queued, events)):
+        print(f"{name:<8} {ev:>6} {statistics.median(r['block']) * 1000:>17.2f} {max(r['block']) * 1000:>9.2f} "
+              f"{percentile(r['lat'], 0.50) * 1000:>19.2f} {percentile(r['lat'], 0.99) * 1000:>9.2f}")
+    print(f"queued bus stats: {queued['stats']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
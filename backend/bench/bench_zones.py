@@ -0,0 +1,110 @@
+"""Zone classification throughput: which of a camera's zones contain each
+detection point / box.
+
+  python    per point, per zone ray casting in a Python loop
+  edges     geometry.CompiledZones: bbox prefilter + vectorized crossing test
+  raster    CompiledZones(raster=True): per-pixel zone bitmask lookup
+
+Zones are random star-shaped polygons on a 1920x1080 frame. The python loop
+runs on at most 20k points and is extrapolated. `edges` must agree with the
+loop exactly; `raster` is pixel-accurate, so its agreement is reported.
+
+Run from backend/:  python -m bench.bench_zones [N ...]
+"""
+from __future__ import annotations
+import math
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.geometry import compile_zones
+from .synth import best_of
+
+W, H = 1920, 1080
+ZONES = 8
+PY_LIMIT = 20_000
+
+
+def make_zones(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    zones = []
+    for i in range(n):
+        cx, cy = rnd.uniform(200, W - 200), rnd.uniform(150, H - 150)
+        k = rnd.randint(4, 16)
+        pts = []
+        for j in range(k):
+            a = 2 * math.pi * j / k
+            r = rnd.uniform(60, 300)
+            pts.append([int(cx + r * math.cos(a)), int(cy + r * math.sin(a))])
+        zones.append({"name": f"zone{i}", "points": pts})
+    return zones
+
+
+def _py_inside(x: float, y: float, poly: List[List[int]]) -> bool:
+    inside = False
+    n = len(poly)
+    for i in range(n):
+        x0, y0 = poly[i]
+        x1, y1 = poly[(i + 1) % n]
+        if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+    return inside
+
+
+def python_loop(points: np.ndarray, zones: List[Dict[str, Any]]) -> np.ndarray:
+    out = np.zeros((len(points), len(zones)), dtype=bool)
+    for n, (x, y) in enumerate(points.tolist()):
+        for z, zone in enumerate(zones):
+            out[n, z] = _py_inside(x, y, zone["points"])
+    return out
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    zones = make_zones(ZONES)
+    t0 = time.perf_counter()
+    edges = compile_zones(zones, W, H)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    raster = compile_zones(zones, W, H, raster=True)
+    raster_ms = (time.perf_counter() - t0) * 1000
+    print(f"{ZONES} zones; compile: edges {compile_ms:.2f} ms, raster {raster_ms:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    rows: List[Dict[str, Any]] = []
+    for n in sizes:
+        pts = np.column_stack([rng.uniform(0, W, n), rng.uniform(0, H, n)])
+        boxes = np.column_stack([pts[:, 0] - 20, pts[:, 1] - 80, pts[:, 0] + 20, pts[:, 1]])
+        sample = pts[:PY_LIMIT]
+        expected = python_loop(sample, zones)
+        assert (edges.contains_points(sample) == expected).all(), "edges disagree with the python loop"
+        agree = (raster.contains_points(sample) == expected).mean() * 100
+        assert (edges.contains_boxes(boxes) == edges.contains_points(pts)).all()
+
+        py = best_of(lambda: python_loop(sample, zones), 1) * n / len(sample)
+        for name, fn in (
+            ("python", None),
+            ("edges", lambda: edges.contains_points(pts)),
+            ("raster", lambda: raster.contains_points(pts)),
+            ("edges boxes", lambda: edges.contains_boxes(boxes)),
+            ("raster boxes", lambda: raster.contains_boxes(boxes)),
+        ):
+            t = py if fn is None else best_of(fn)
+            rows.append({"points": n, "engine": name, "ms": round(t * 1000, 3),
+                         "points_per_s": round(n / t), "speedup": round(py / t, 1),
+                         "agree_pct": round(agree, 3) if name.startswith("raster") else 100.0})
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    sizes = [int(a) for a in argv] or [1000, 100_000, 1_000_000]
+    rows = run(sizes)
+    print(f"{'points':>8} {'engine':<13} {'ms':>10} {'points/s':>13} {'speedup':>8} {'agree %':>8}")
+    for r in rows:
+        print(f"{r['points']:>8} {r['engine']:<13} {r['ms']:>10} {r['points_per_s']:>13} {r['speedup']:>8} {r['agree_pct']:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
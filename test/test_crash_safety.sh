@@ -0,0 +1,82 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Crash safety на ConfigManager: процес пише конфиг в цикъл (durable apply),
+# убиваме го с SIGKILL в случаен момент и проверяваме, че:
+#   - data/config.json е валиден JSON (няма половин файл), index.jsonl се парсва и
+#     всяка версия в него се зарежда през BackupStore.load
+#   - на диска е поне последната потвърдена (durable) версия
+# Не изисква работещ сървър.
+
+ROOT="$(git rev-parse --show-toplevel 2>/dev/null || pwd)"
+cd "$ROOT/backend"
+
+ROUNDS="${ROUNDS:-20}"
+CAMS="${CAMS:-2000}"
+WORK="$(mktemp -d)"
+trap 'rm -rf "$WORK"' EXIT
+
+say() { printf '%s\n' "$*"; }
+fail() { say "✖ $*"; exit 1; }
+
+writer() {
+  # exec: SIGKILL трябва да удари самия python процес, не subshell-а
+  exec python - "$1" "$CAMS" <<'PY'
+import itertools, sys
+from app.config_manager import ConfigManager
+data_dir, cams = sys.argv[1], int(sys.argv[2])
+m = ConfigManager(data_dir, commit_window=0)
+mqtt = dict(m.get_running_config()["mqtt"])
+for n in itertools.count(1):
+    cfg = {"mqtt": mqtt, "cameras": {f"cam{j}": {"name": f"cam{j}", "ffmpeg": {"url": f"rtsp://h/{n}/{j}"}} for j in range(cams)}}
+    res = m.apply(cfg, durable=True)
+    if res.get("persisted"):
+        print(n, flush=True)
+PY
+}
+
+check() {
+  python - "$1" <<'PY'
+import json, pathlib, sys
+from app.backup_store import BackupStore
+d = pathlib.Path(sys.argv[1])
+cfg = json.loads((d / "config.json").read_text())
+index = d / "backups" / "index.jsonl"
+lines = index.read_bytes().split(b"\n") if index.exists() else [b""]
+for line in lines[:-1]:   # the last one may be torn by the kill; the store drops it
+    json.loads(line)
+store = BackupStore(d / "backups")
+assert len(store) >= len(lines) - 1, f"index has {len(lines) - 1} lines, store read {len(store)}"
+for version_id in store.ids():
+    backup = store.load(version_id)
+    assert backup is not None and isinstance(backup.get("cameras"), dict), f"backup {version_id} unreadable"
+acked = (d / "acked").read_text().split()
+assert acked, "no write was acknowledged before the kill"
+url = next(iter(cfg["cameras"].values()))["ffmpeg"]["url"]
+on_disk = int(url.split("/")[3])
+assert on_disk >= int(acked[-1]), f"acked {acked[-1]} but disk has {on_disk}"
+PY
+}
+
+for i in $(seq 1 "$ROUNDS"); do
+  # нова data директория за всеки рунд; SIGKILL идва чак след първия
+  # потвърден запис (стартът не се брои), в случаен момент от следващите
+  dir="$WORK/round$i"
+  mkdir -p "$dir"
+  writer "$dir" >"$dir/acked" &
+  pid=$!
+  for _ in $(seq 1 600); do
+    [ -s "$dir/acked" ] && break
+    kill -0 "$pid" 2>/dev/null || break
+    sleep 0.1
+  done
+  [ -s "$dir/acked" ] || { kill -9 "$pid" 2>/dev/null || true; fail "round $i: no durable write acknowledged within 60 s"; }
+  sleep "0.$((RANDOM % 9 + 1))"
+  kill -9 "$pid" 2>/dev/null || true
+  wait "$pid" 2>/dev/null || true
+  check "$dir" || fail "round $i: corrupt or stale config after SIGKILL"
+  say "✔ round $i (acked: $(wc -l <"$dir/acked"))"
+  rm -rf "$dir"
+done
+
+say "All $ROUNDS crash rounds passed."
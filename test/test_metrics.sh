@@ -0,0 +1,92 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# /metrics: приложението се вдига в процеса (Starlette TestClient, без сървър),
+# прави се apply / validate / грешна заявка и се scrape-ва /metrics. Проверява:
+#   - всеки ред е валиден Prometheus text format (HELP/TYPE/семпъл)
+#   - хистограмите по етап имат растящи bucket-и и _count == +Inf bucket
+#   - броячите по endpoint/статус, етапите apply/validate/persist/backup/auth
+#     и gauge-овете (камери, бекъпи, WS клиенти) отразяват направеното
+
+ROOT="$(git rev-parse --show-toplevel 2>/dev/null || pwd)"
+cd "$ROOT/backend"
+
+WORK="$(mktemp -d)"
+trap 'rm -rf "$WORK"' EXIT
+
+say() { printf '%s\n' "$*"; }
+
+HOTRELOAD_DATA_DIR="$WORK" HOTRELOAD_HEALTH=0 HOTRELOAD_RETENTION_INTERVAL=0 python - <<'PY'
+import json, re, sys
+from fastapi.testclient import TestClient
+from app.main import app, manager
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+def scrape(c):
+    r = c.get("/metrics")
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4"), r.headers["content-type"]
+    samples, types = {}, {}
+    for line in r.text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if line.startswith("#") or not line:
+            continue
+        m = SAMPLE.match(line)
+        assert m, f"bad sample line: {line!r}"
+        key, value = line.rsplit(" ", 1)
+        samples[key] = float(value)
+    return samples, types
+
+
+def value(samples, name, **labels):
+    want = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    hits = [v for k, v in samples.items() if k.split("{")[0] == name and all(f'{k2}="{v2}"' in k for k2, v2 in labels.items())]
+    assert hits, f"missing {name}{{{want}}}"
+    return sum(hits)
+
+
+c = TestClient(app)
+token = c.post("/api/auth/generate").json()["token"]
+c.headers["Authorization"] = f"Bearer {token}"
+
+before, types = scrape(c)
+for name in ("hotreload_stage_duration_seconds", "hotreload_http_requests_total", "hotreload_cameras",
+             "hotreload_config_bytes", "hotreload_backups", "hotreload_ws_clients", "hotreload_workers"):
+    assert name in types, f"{name} not exported"
+assert types["hotreload_stage_duration_seconds"] == "histogram"
+
+cfg = json.loads(c.get("/api/config").content)
+cfg["cameras"]["metrics_cam"] = {"name": "metrics_cam", "ffmpeg": {"url": "rtsp://h/metrics"}}
+with c.websocket_connect("/ws") as ws:
+    ws.receive_json()
+    assert c.post("/api/config/apply?durable=true", json=cfg).status_code == 200
+    ws.receive_json()   # the apply's event went through WSBus
+    assert c.post("/api/config/validate", json=cfg).status_code == 200
+    assert TestClient(app).get("/api/config").status_code == 403   # no token
+    after, _ = scrape(c)
+    assert value(after, "hotreload_ws_clients") == 1
+
+H = "hotreload_stage_duration_seconds"
+for stage in ("apply", "validate", "persist", "backup", "auth", "broadcast"):
+    n = value(after, H + "_count", stage=stage) - value(before, H + "_count", stage=stage)
+    assert n >= 1, f"stage {stage} not observed"
+    buckets = [v for k, v in after.items() if k.startswith(H + "_bucket") and f'stage="{stage}"' in k]
+    assert buckets == sorted(buckets), f"{stage}: buckets not cumulative"
+    assert buckets[-1] == value(after, H + "_count", stage=stage)
+    assert value(after, H + "_sum", stage=stage) > 0
+
+R = "hotreload_http_requests_total"
+assert value(after, R, method="POST", route="/api/config/apply", status="200") == 1
+assert value(after, R, method="POST", route="/api/config/validate", status="200") == 1
+assert value(after, R, method="GET", route="/api/config", status="403") == 1
+assert value(after, "hotreload_cameras") == len(cfg["cameras"])
+assert value(after, "hotreload_config_version") == manager.version
+assert value(after, "hotreload_backups") >= 1
+print(f"{len(after)} samples OK")
+PY
+say "✔ /metrics scrape"